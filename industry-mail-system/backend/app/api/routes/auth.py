@@ -4,50 +4,58 @@ Google Sign-In Authentication
 Endpoint: POST /api/auth/google
 Body: { "id_token": "<google-id-token>" }
 
-Verifies the token using google-auth, then finds or creates a `User` record
-and returns the user object.
+Verifies the token against Google's cached signing certificates, then finds
+or creates a `User` record and returns the user object together with a
+session token. Later requests authenticate with `Authorization: Bearer
+<access_token>` (see `get_current_session`) without calling Google or
+reading the database.
 """
-from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
-from app.schemas.user import UserResponse
+from app.schemas.user import SessionResponse, SignInResponse, UserResponse
+from app.services.auth_service import InsecureSecretError, google_verifier, http_session, session_tokens
 
-import google.auth.transport.requests
-import google.oauth2.id_token
-import requests
 import json
 from fastapi.responses import HTMLResponse
 from app.config import settings
 
 router = APIRouter()
 
+# Upper bound for the OAuth code exchange with Google
+TOKEN_EXCHANGE_TIMEOUT = 10.0
+
+
+def _script_literal(value: str) -> str:
+    """JS string literal that is safe inside an inline <script>"""
+    # A user-controlled name containing "</script>" must not close the block
+    return (json.dumps(value).replace("<", "\\u003c").replace(">", "\\u003e")
+            .replace("&", "\\u0026"))
+
 class TokenRequest(BaseModel):
     id_token: str
 
 
-@router.post("/google", response_model=UserResponse)
-def google_sign_in(request: TokenRequest, db: Session = Depends(get_db)):
-    """Verify Google ID token and return/create user"""
-    if not request.id_token:
-        raise HTTPException(status_code=400, detail="id_token is required")
-
+def _verify_google_token(id_token: str) -> Dict[str, Any]:
     try:
-        # Verify the token
-        request_adapter = google.auth.transport.requests.Request()
-        id_info = google.oauth2.id_token.verify_oauth2_token(request.id_token, request_adapter)
+        return google_verifier.verify(id_token, settings.GOOGLE_CLIENT_ID or None)
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid ID token")
+    except Exception as e:
+        print(f"Auth: could not fetch Google certificates: {e}")
+        raise HTTPException(status_code=503, detail="Could not verify ID token right now; try again")
 
-    # Extract user info
+
+def _find_or_create_user(db: Session, id_info: Dict[str, Any]) -> User:
     email = id_info.get("email")
     name = id_info.get("name") or id_info.get("email")
-
     if not email:
         raise HTTPException(status_code=400, detail="Google token did not contain an email")
 
-    # Find or create user
     db_user = db.query(User).filter(User.email == email).first()
     if db_user:
         return db_user
@@ -59,12 +67,59 @@ def google_sign_in(request: TokenRequest, db: Session = Depends(get_db)):
     return new_user
 
 
+def _issue_token(user: User) -> Tuple[str, int]:
+    try:
+        return session_tokens.issue(user.id, user.email), session_tokens.expire_seconds
+    except InsecureSecretError as e:
+        print(f"Auth: {e}")
+        raise HTTPException(status_code=503, detail="Sign-in is not configured on this server")
+
+
+def get_current_session(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """Claims of the request's session token; no upstream or database access"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not signed in", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return session_tokens.verify(token.strip())
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    except InsecureSecretError:
+        raise HTTPException(status_code=503, detail="Sign-in is not configured on this server")
+
+
+@router.post("/google", response_model=SignInResponse)
+def google_sign_in(request: TokenRequest, db: Session = Depends(get_db)):
+    """Verify Google ID token, return/create user and issue a session token"""
+    if not request.id_token:
+        raise HTTPException(status_code=400, detail="id_token is required")
+
+    id_info = _verify_google_token(request.id_token)
+    user = _find_or_create_user(db, id_info)
+    access_token, expires_in = _issue_token(user)
+    return SignInResponse(
+        **UserResponse.model_validate(user).model_dump(), access_token=access_token, expires_in=expires_in
+    )
+
+
+@router.get("/me", response_model=SessionResponse)
+def current_session(claims: Dict[str, Any] = Depends(get_current_session)):
+    """The signed-in user according to the session token"""
+    return SessionResponse(
+        id=int(claims["sub"]),
+        email=claims["email"],
+        expires_at=datetime.fromtimestamp(claims["exp"], timezone.utc),
+    )
+
+
 @router.get("/google/callback", response_class=HTMLResponse)
 def google_callback(code: str = None, db: Session = Depends(get_db)):
-    """OAuth2 redirect callback: exchange code for tokens, verify id_token, create user and return an HTML page that stores the user to localStorage and redirects to frontend."""
+    """OAuth2 redirect callback: exchange code for tokens, verify id_token, create user and return an HTML page that stores the user and session token to localStorage and redirects to frontend."""
     if not code:
         raise HTTPException(status_code=400, detail="Missing code in callback")
 
+    import requests
+
     # Exchange authorization code for tokens
     token_url = "https://oauth2.googleapis.com/token"
     payload = {
@@ -76,7 +131,7 @@ def google_callback(code: str = None, db: Session = Depends(get_db)):
     }
 
     try:
-        resp = requests.post(token_url, data=payload)
+        resp = http_session().post(token_url, data=payload, timeout=TOKEN_EXCHANGE_TIMEOUT)
         resp.raise_for_status()
         tokens = resp.json()
     except requests.RequestException as e:
@@ -86,57 +141,45 @@ def google_callback(code: str = None, db: Session = Depends(get_db)):
     if not id_token:
         raise HTTPException(status_code=400, detail="No id_token returned by Google")
 
-    try:
-        request_adapter = google.auth.transport.requests.Request()
-        id_info = google.oauth2.id_token.verify_oauth2_token(id_token, request_adapter, settings.GOOGLE_CLIENT_ID)
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid ID token")
-
-    email = id_info.get("email")
-    name = id_info.get("name") or id_info.get("email")
-    if not email:
-        raise HTTPException(status_code=400, detail="Google token did not contain an email")
-
-    # Find or create user
-    db_user = db.query(User).filter(User.email == email).first()
-    if not db_user:
-        db_user = User(email=email, full_name=name)
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+    db_user = _find_or_create_user(db, _verify_google_token(id_token))
+    access_token, _ = _issue_token(db_user)
 
     # Return a small HTML page that stores the user in localStorage and redirects
     # to the frontend app. This avoids the frontend having to call the backend again.
-        user_json = {
-                "id": db_user.id,
-                "email": db_user.email,
-                "full_name": db_user.full_name,
-                "is_active": db_user.is_active
-        }
-
-        # Dump as JSON so JS receives valid literals (true/null) instead of Python's True/None
-        user_json_str = json.dumps(user_json)
-
-        frontend = settings.FRONTEND_URL.rstrip('/')
-        # Store JSON as a string literal in localStorage so frontend can JSON.parse it
-        html = f"""
-        <!doctype html>
-        <html>
-            <head>
-                <meta charset="utf-8" />
-                <title>Signing you in...</title>
-            </head>
-            <body>
-                <script>
-                    try {{
-                        // Insert JSON string into localStorage
-                        localStorage.setItem('ims_user', '{user_json_str}');
-                    }} catch (e) {{ console.error(e); }}
-                    window.location.href = '{frontend}';
-                </script>
-                <p>If you are not redirected, <a href="{frontend}">click here</a>.</p>
-            </body>
-        </html>
-        """
-
-        return HTMLResponse(content=html, status_code=200)
+    user_json = {
+            "id": db_user.id,
+            "email": db_user.email,
+            "full_name": db_user.full_name,
+            "is_active": db_user.is_active
+    }
+
+    # Dump as JSON so JS receives valid literals (true/null) instead of Python's True/None,
+    # then once more so the stored string is a valid JS string literal
+    user_json_str = _script_literal(json.dumps(user_json))
+    token_str = _script_literal(access_token)
+
+    frontend = settings.FRONTEND_URL.rstrip('/')
+    frontend_str = _script_literal(frontend)
+    # Store JSON as a string in localStorage so frontend can JSON.parse it
+    html = f"""
+    <!doctype html>
+    <html>
+        <head>
+            <meta charset="utf-8" />
+            <title>Signing you in...</title>
+        </head>
+        <body>
+            <script>
+                try {{
+                    // Insert JSON string and session token into localStorage
+                    localStorage.setItem('ims_user', {user_json_str});
+                    localStorage.setItem('ims_token', {token_str});
+                }} catch (e) {{ console.error(e); }}
+                window.location.href = {frontend_str};
+            </script>
+            <p>If you are not redirected, <a href="{frontend}">click here</a>.</p>
+        </body>
+    </html>
+    """
+
+    return HTMLResponse(content=html, status_code=200)
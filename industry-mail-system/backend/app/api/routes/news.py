@@ -1,14 +1,29 @@
 """
 News API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.database import get_db
+from app.config import settings
 from app.services.news_service import NewsService
-from app.services.email_service import EmailService
-from pydantic import BaseModel
+from app.services.ai_service import AIService
+from app.services.deadline import Deadline, fetch_deadline
+from app.services.delivery_service import DeliveryTracker
+from app.services.digest_service import DigestService
+from app.services.fair_queue import send_queue
+from app.services.quota_service import news_quota, QuotaExceededError, PRIORITY_INTERACTIVE
+from app.services.job_service import job_manager
+from app.services.outbox_service import outbox
+from app.services.latency_stats import upstream_latency
+from app.services.send_planner import SendPlanner, parse_local_time
+from app.services.simulation_service import MODES, RunSimulator
+from app.services.topic_digest_service import topic_digests, ARTICLE_LIMIT, MaterializedDigest
+from pydantic import BaseModel, field_validator
 
 router = APIRouter()
 
@@ -24,9 +39,46 @@ class NewsResponse(BaseModel):
     articles: List[NewsArticle]
     total_results: int
 
-class SendNewsletterRequest(BaseModel):
+class SendWindow(BaseModel):
+    # Spread deliveries evenly over this many seconds instead of sending at once
+    send_window_seconds: float = 0
+    # "HH:MM": users with a time zone get their window at this local time
+    local_time: Optional[str] = None
+
+    @field_validator('local_time')
+    @classmethod
+    def _check_local_time(cls, value: Optional[str]) -> Optional[str]:
+        try:
+            parse_local_time(value)
+        except ValueError:
+            raise ValueError("local_time must be HH:MM")
+        return value
+
+    def planner(self) -> SendPlanner:
+        return SendPlanner(self.send_window_seconds, parse_local_time(self.local_time))
+
+class SendNewsletterRequest(SendWindow):
     topic_id: int
     days: int = 1
+    # Time budget for the whole send; defaults to SEND_DEADLINE_SECONDS plus the window
+    deadline_seconds: Optional[float] = None
+
+class SendDigestRequest(SendWindow):
+    topic_ids: Optional[List[int]] = None
+    deadline_seconds: Optional[float] = None
+
+class SimulateRunRequest(SendWindow):
+    # "newsletter" (one email per topic subscription) or "digest" (one per user)
+    mode: str = "newsletter"
+    topic_ids: Optional[List[int]] = None
+    days: int = 1
+
+    @field_validator('mode')
+    @classmethod
+    def _check_mode(cls, value: str) -> str:
+        if value not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        return value
 
 @router.get("/fetch", response_model=NewsResponse)
 async def fetch_news(
@@ -37,70 +89,289 @@ async def fetch_news(
     """
     Fetch news articles for a specific topic
     days: 1, 7, or 30
+
+    A topic that names an active topic (by name or keywords) is answered
+    from its materialized digest, the same articles its newsletter sends.
     """
     if days not in [1, 7, 30]:
         raise HTTPException(status_code=400, detail="Days must be 1, 7, or 30")
     
     news_service = NewsService()
-    articles = await news_service.fetch_news(topic, days, limit)
+    known = await asyncio.to_thread(topic_digests.find_topic, topic) if limit <= ARTICLE_LIMIT else None
+    try:
+        digest = None
+        if known:
+            topic_id, name, keywords, description = known
+            digest = await topic_digests.get(topic_id, name, keywords, days, priority=PRIORITY_INTERACTIVE,
+                                             description=description)
+        if digest is not None:
+            articles = digest.articles[:limit]
+        else:
+            articles = await news_service.fetch_news(topic, days, limit)
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     
     return {
-        "articles": articles,
+        "articles": [a.to_dict() for a in articles],
         "total_results": len(articles)
     }
 
-@router.post("/send-newsletter")
+@router.get("/fetch/stream")
+async def stream_news(
+    topic: str,
+    days: int = 1,
+    limit: int = 10
+):
+    """
+    Stream news articles for a topic as NDJSON
+
+    Lines (one JSON object each):
+      {"type": "article", "index": i, "article": {...}}  - with a local fallback summary
+      {"type": "summary", "index": i, "summary": "..."}  - LLM summary replacing the fallback
+      {"type": "done", "total_results": n}
+      {"type": "error", "status": code, "detail": "..."}
+
+    Articles are sent as soon as NewsAPI answers, so time-to-first-article
+    is a single upstream call instead of the sum of all LLM calls.
+    """
+    if days not in [1, 7, 30]:
+        raise HTTPException(status_code=400, detail="Days must be 1, 7, or 30")
+
+    news_service = NewsService()
+
+    def line(payload: dict) -> str:
+        return json.dumps(payload) + "\n"
+
+    async def events():
+        def complete(articles):
+            return [line({"type": "article", "index": idx, "article": a.to_dict()}) for idx, a in enumerate(articles)] + \
+                [line({"type": "done", "total_results": len(articles)})]
+
+        cached = news_service.get_cached(topic, days, limit)
+        if cached is None and limit <= ARTICLE_LIMIT:
+            known = await asyncio.to_thread(topic_digests.find_topic, topic)
+            digest = await asyncio.to_thread(topic_digests.stored, known[0], known[2], days) if known else None
+            cached = digest.articles[:limit] if digest is not None else None
+        if cached is not None:
+            for chunk in complete(cached):
+                yield chunk
+            return
+
+        try:
+            articles = await news_service.search_ranked(topic, days, limit)
+        except QuotaExceededError as e:
+            stale = news_service.get_cached(topic, days, limit, settings.NEWS_CACHE_MAX_STALE_SECONDS)
+            for chunk in complete(stale) if stale is not None else [line({"type": "error", "status": 429, "detail": str(e)})]:
+                yield chunk
+            return
+        except Exception as e:
+            yield line({"type": "error", "status": 502, "detail": str(e)})
+            return
+
+        ai = AIService()
+        summarized = ai.fallback_summaries(articles)
+        for idx, article in enumerate(summarized):
+            yield line({"type": "article", "index": idx, "article": article.to_dict()})
+
+        async for idx, summary in ai.iter_summaries(articles):
+            summarized[idx] = summarized[idx].with_summary(summary)
+            yield line({"type": "summary", "index": idx, "summary": summary})
+
+        news_service.store(topic, days, limit, summarized)
+        yield line({"type": "done", "total_results": len(summarized)})
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _topic_digest(topic_id: int, days: int, rebuild: bool, db: Session) -> MaterializedDigest:
+    from app.models.topic import Topic
+
+    if days not in [1, 7, 30]:
+        raise HTTPException(status_code=400, detail="Days must be 1, 7, or 30")
+    topic = await asyncio.to_thread(lambda: db.query(Topic).filter(Topic.id == topic_id).first())
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    try:
+        digest = await topic_digests.get(topic.id, topic.name, topic.keywords, days,
+                                         priority=PRIORITY_INTERACTIVE, rebuild=rebuild,
+                                         description=topic.description)
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if digest is None:
+        raise HTTPException(status_code=404, detail="No articles found for this topic")
+    return digest
+
+@router.get("/digests/{topic_id}")
+async def get_topic_digest(topic_id: int, days: int = 1, rebuild: bool = False, db: Session = Depends(get_db)):
+    """
+    Today's materialized digest of a topic: the articles its newsletter sends
+
+    Built on first request; `rebuild=true` fetches it again.
+    """
+    return (await _topic_digest(topic_id, days, rebuild, db)).to_dict()
+
+@router.get("/digests/{topic_id}/html", response_class=HTMLResponse)
+async def get_topic_digest_html(topic_id: int, days: int = 1, rebuild: bool = False, db: Session = Depends(get_db)):
+    """
+    Rendered newsletter of a topic's materialized digest, as subscribers receive it
+    """
+    return HTMLResponse((await _topic_digest(topic_id, days, rebuild, db)).html_body)
+
+@router.get("/quota")
+def get_quota():
+    """
+    Remaining NewsAPI request budget for the current rolling window
+    """
+    return news_quota.status()
+
+@router.get("/latencies")
+def get_latencies():
+    """
+    Recorded upstream latencies (NewsAPI, LLM, SMTP) used by dry-run estimates
+    """
+    return upstream_latency.status()
+
+@router.post("/simulate")
+def simulate_run(request: SimulateRunRequest, db: Session = Depends(get_db)):
+    """
+    Dry run: predicted upstream calls, messages and duration of a send run
+
+    Uses the real subscribers and delivery planning; nothing is fetched or sent.
+    """
+    return RunSimulator().simulate(db, request.mode, request.topic_ids, request.days, request.planner())
+
+@router.get("/send-queue")
+def get_send_queue():
+    """
+    SMTP send queue: in-flight batches, and per-topic queue wait and completion latency
+    """
+    return send_queue.status()
+
+@router.get("/suppressions")
+def get_suppressions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """
+    Addresses excluded from sends after a permanent failure or repeated transient ones
+    """
+    return [
+        {
+            "email": row.email,
+            "consecutive_failures": row.consecutive_failures,
+            "last_error_class": row.last_error_class,
+            "last_error": row.last_error,
+            "last_failure_at": row.last_failure_at,
+            "suppressed_at": row.suppressed_at,
+        }
+        for row in DeliveryTracker().suppressed(db, skip, limit)
+    ]
+
+@router.delete("/suppressions/{email}", status_code=204)
+def delete_suppression(email: str, db: Session = Depends(get_db)):
+    """
+    Clear an address's delivery state so it receives newsletters again
+    """
+    if not DeliveryTracker().unsuppress(db, email):
+        raise HTTPException(status_code=404, detail="Address has no delivery state")
+
+@router.post("/send-newsletter", status_code=202)
 async def send_newsletter(
     request: SendNewsletterRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
-    Send newsletter to all subscribers of a topic
+    Enqueue a newsletter send to all subscribers of a topic
+
+    Returns immediately with a job ID; poll `/jobs/{job_id}` or stream
+    `/jobs/{job_id}/events` for progress.
     """
     from app.models.topic import Topic
-    from app.models.subscription import Subscription
-    
-    # Get topic
-    topic = db.query(Topic).filter(Topic.id == request.topic_id).first()
+
+    # Get topic; sync SQLAlchemy, so it runs in a worker thread
+    topic = await asyncio.to_thread(lambda: db.query(Topic).filter(Topic.id == request.topic_id).first())
     if not topic:
         raise HTTPException(status_code=404, detail="Topic not found")
-    
-    # Get subscribers
-    subscriptions = db.query(Subscription).filter(
-        Subscription.topic_id == request.topic_id
-    ).all()
-    
+
+    job = job_manager.submit_newsletter(topic.id, request.days, request.deadline_seconds, request.planner())
+
+    return {
+        "message": f"Newsletter for {topic.name} queued",
+        "job_id": job.id,
+        "status_url": f"/api/news/jobs/{job.id}",
+        "events_url": f"/api/news/jobs/{job.id}/events"
+    }
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Stage, sent/failed counts and per-stage timings of a newsletter job
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str, request: Request):
+    """
+    Server-sent events stream of job progress; ends when the job finishes
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        while True:
+            version = job.version
+            yield f"event: progress\ndata: {json.dumps(job.snapshot())}\n\n"
+            if job.done or await request.is_disconnected():
+                return
+            await job.wait_for_change(version, timeout=15.0)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/send-digest")
+async def send_digest(
+    request: SendDigestRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Send one combined digest per user covering all of their due subscriptions
+
+    Digests go to the outbox with their delivery slots; those due now are
+    sent in the background and the rest by the scheduler's outbox job.
+    Subscriptions are marked as sent once their digest is delivered; users
+    not reached before the deadline stay due for the next run.
+    """
+    planner = request.planner()
+    deadline = Deadline(
+        request.deadline_seconds if request.deadline_seconds is not None
+        else settings.SEND_DEADLINE_SECONDS + planner.horizon()
+    )
+    digest_service = DigestService()
+
+    # The database calls are sync SQLAlchemy; they run in a worker thread
+    subscriptions = await asyncio.to_thread(digest_service.due_subscriptions, db, request.topic_ids)
     if not subscriptions:
-        return {"message": "No subscribers found for this topic"}
-    
-    # Fetch news
-    news_service = NewsService()
-    try:
-        articles = await news_service.fetch_news(topic.keywords, request.days, 10)
-    except Exception as e:
-        # Surface the error from the news provider for easier debugging
-        raise HTTPException(status_code=502, detail=str(e))
+        return {"message": "No due subscriptions found"}
+
+    # Fetch news once per topic/window and share it across users
+    sections = await digest_service.fetch_sections(subscriptions, deadline=fetch_deadline(deadline))
+    digests = digest_service.build_digests(subscriptions, sections)
+
+    deliveries = digest_service.prepare_deliveries(digests, planner)
+    await asyncio.to_thread(digest_service.schedule, deliveries, planner, deadline)
+    background_tasks.add_task(outbox.deliver_due)
 
-    if not articles:
-        raise HTTPException(status_code=404, detail="No news articles found for the requested topic/days")
-    
-    # Send emails in background
-    email_service = EmailService()
-    for subscription in subscriptions:
-        background_tasks.add_task(
-            email_service.send_newsletter,
-            subscription.user.email,
-            topic.name,
-            articles
-        )
-        
-        # Update last_sent_at
-        subscription.last_sent_at = datetime.now()
-    
-    db.commit()
-    
     return {
-        "message": f"Newsletter scheduled to be sent to {len(subscriptions)} subscribers",
-        "articles_count": len(articles)
+        "message": f"Digest scheduled to be sent to {len(digests)} users",
+        "users_count": len(digests),
+        "subscriptions_count": sum(len(ids) for _, (_, _, ids) in deliveries),
+        "topics_fetched": len(sections)
     }
@@ -1,7 +1,8 @@
 """
 Subscription API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
@@ -9,9 +10,13 @@ from app.models.subscription import Subscription
 from app.models.user import User
 from app.models.topic import Topic
 from app.schemas.subscription import SubscriptionCreate, SubscriptionResponse, SubscriptionUpdate
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
+_subscription = TypeAdapter(SubscriptionResponse)
+_subscriptions = TypeAdapter(List[SubscriptionResponse])
+
 @router.post("/", response_model=SubscriptionResponse, status_code=201)
 def create_subscription(subscription: SubscriptionCreate, db: Session = Depends(get_db)):
     """Create a new subscription"""
@@ -40,24 +45,32 @@ def create_subscription(subscription: SubscriptionCreate, db: Session = Depends(
     return new_subscription
 
 @router.get("/", response_model=List[SubscriptionResponse])
-def get_subscriptions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_subscriptions(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Get all subscriptions"""
-    subscriptions = db.query(Subscription).offset(skip).limit(limit).all()
-    return subscriptions
+    return response_cache.respond(
+        request, db, ("subscriptions",), _subscriptions,
+        lambda: db.query(Subscription).offset(skip).limit(limit).all(),
+        cache=True,
+    )
 
 @router.get("/user/{user_id}", response_model=List[SubscriptionResponse])
-def get_user_subscriptions(user_id: int, db: Session = Depends(get_db)):
+def get_user_subscriptions(user_id: int, request: Request, db: Session = Depends(get_db)):
     """Get all subscriptions for a specific user"""
-    subscriptions = db.query(Subscription).filter(Subscription.user_id == user_id).all()
-    return subscriptions
+    return response_cache.respond(
+        request, db, ("subscriptions",), _subscriptions,
+        lambda: db.query(Subscription).filter(Subscription.user_id == user_id).all(),
+    )
 
 @router.get("/{subscription_id}", response_model=SubscriptionResponse)
-def get_subscription(subscription_id: int, db: Session = Depends(get_db)):
+def get_subscription(subscription_id: int, request: Request, db: Session = Depends(get_db)):
     """Get a specific subscription"""
-    subscription = db.query(Subscription).filter(Subscription.id == subscription_id).first()
-    if not subscription:
-        raise HTTPException(status_code=404, detail="Subscription not found")
-    return subscription
+    def load():
+        subscription = db.query(Subscription).filter(Subscription.id == subscription_id).first()
+        if not subscription:
+            raise HTTPException(status_code=404, detail="Subscription not found")
+        return subscription
+
+    return response_cache.respond(request, db, ("subscriptions",), _subscription, load)
 
 @router.put("/{subscription_id}", response_model=SubscriptionResponse)
 def update_subscription(subscription_id: int, subscription_update: SubscriptionUpdate, db: Session = Depends(get_db)):
@@ -1,15 +1,20 @@
 """
 Topic API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
 from app.models.topic import Topic
 from app.schemas.topic import TopicCreate, TopicResponse, TopicUpdate
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
+_topic = TypeAdapter(TopicResponse)
+_topics = TypeAdapter(List[TopicResponse])
+
 @router.post("/", response_model=TopicResponse, status_code=201)
 def create_topic(topic: TopicCreate, db: Session = Depends(get_db)):
     """Create a new topic"""
@@ -24,18 +29,24 @@ def create_topic(topic: TopicCreate, db: Session = Depends(get_db)):
     return new_topic
 
 @router.get("/", response_model=List[TopicResponse])
-def get_topics(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_topics(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Get all topics"""
-    topics = db.query(Topic).filter(Topic.is_active == True).offset(skip).limit(limit).all()
-    return topics
+    return response_cache.respond(
+        request, db, ("topics",), _topics,
+        lambda: db.query(Topic).filter(Topic.is_active == True).offset(skip).limit(limit).all(),
+        cache=True,
+    )
 
 @router.get("/{topic_id}", response_model=TopicResponse)
-def get_topic(topic_id: int, db: Session = Depends(get_db)):
+def get_topic(topic_id: int, request: Request, db: Session = Depends(get_db)):
     """Get a specific topic"""
-    topic = db.query(Topic).filter(Topic.id == topic_id).first()
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    return topic
+    def load():
+        topic = db.query(Topic).filter(Topic.id == topic_id).first()
+        if not topic:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        return topic
+
+    return response_cache.respond(request, db, ("topics",), _topic, load)
 
 @router.put("/{topic_id}", response_model=TopicResponse)
 def update_topic(topic_id: int, topic_update: TopicUpdate, db: Session = Depends(get_db)):
@@ -1,15 +1,20 @@
 """
 User API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
+_user = TypeAdapter(UserResponse)
+_users = TypeAdapter(List[UserResponse])
+
 @router.post("/", response_model=UserResponse, status_code=201)
 def create_user(user: UserCreate, response: Response, db: Session = Depends(get_db)):
     """Create a new user. If email already exists, return the existing user instead of error."""
@@ -27,18 +32,22 @@ def create_user(user: UserCreate, response: Response, db: Session = Depends(get_
     return new_user
 
 @router.get("/", response_model=List[UserResponse])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_users(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Get all users"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    return response_cache.respond(
+        request, db, ("users",), _users, lambda: db.query(User).offset(skip).limit(limit).all(), cache=True
+    )
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, request: Request, db: Session = Depends(get_db)):
     """Get a specific user"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    def load():
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    return response_cache.respond(request, db, ("users",), _user, load)
 
 @router.put("/{user_id}", response_model=UserResponse)
 def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
@@ -7,10 +7,20 @@ from functools import lru_cache
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./industry_mailer.db"
+    MIGRATE_ON_STARTUP: bool = True  # Apply pending schema migrations when the app starts
     
     # News API
     NEWS_API_KEY: str
     NEWS_API_URL: str = "https://newsapi.org/v2/everything"
+    NEWS_API_QUOTA: int = 100  # Requests allowed per rolling window
+    NEWS_API_QUOTA_WINDOW_HOURS: int = 24
+    NEWS_API_INTERACTIVE_RESERVE: int = 20  # Requests kept back for scheduled sends
+    NEWS_CACHE_TTL_SECONDS: int = 900
+    NEWS_CACHE_MAX_STALE_SECONDS: int = 86400  # Served when the budget runs low
+    NEWS_LOCAL_SEARCH: bool = True  # Answer covered searches from stored articles (FTS5 on SQLite)
+    NEWS_STORE_FRESHNESS_SECONDS: int = 900  # Local coverage older than this is topped up from NewsAPI
+    NEWS_QUERY_MAX_CHARS: int = 500  # NewsAPI `q` limit when merging topics into one query (0 disables)
+    NEWS_RERANK_POOL: int = 50  # Candidates fetched and re-ranked locally per search (0 keeps NewsAPI's order)
     
     # Email Configuration
     SMTP_HOST: str = "smtp.gmail.com"
@@ -18,6 +28,9 @@ class Settings(BaseSettings):
     SMTP_USER: str = "your_email@gmail.com"
     SMTP_PASSWORD: str = "your_app_password"
     EMAIL_FROM: str = "your_email@gmail.com"
+    SEND_DEADLINE_SECONDS: int = 600  # End-to-end budget for one send run (fetch, summarize, deliver)
+    SMTP_CONCURRENCY: int = 4  # SMTP batches in flight per process, shared fairly between topics
+    OUTBOX_POLL_SECONDS: int = 30  # How often planned deliveries (digest windows) are checked for due sends
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
@@ -26,10 +39,26 @@ class Settings(BaseSettings):
     
     # AI (Optional - for future enhancements)
     GEMINI_API_KEY: str = ""
-    # (OAuth removed) any Google OAuth config removed
+    SUMMARIZER: str = "llm"  # "llm" or "extractive" (local, milliseconds per digest)
+    AI_CIRCUIT_FAILURES: int = 5  # Consecutive provider failures before the circuit opens
+    AI_CIRCUIT_COOLDOWN_SECONDS: int = 60
+    # Google Sign-In; ID tokens are checked against GOOGLE_CLIENT_ID when it is set
+    GOOGLE_CLIENT_ID: str = ""
+    GOOGLE_CLIENT_SECRET: str = ""
+    GOOGLE_REDIRECT_URI: str = "http://localhost:8000/api/auth/google/callback"
+    FRONTEND_URL: str = "http://localhost:5173"
     
     # Application
     DEBUG: bool = False
+    RESPONSE_CACHE_ENTRIES: int = 256  # Serialized list responses kept per process (0 disables)
+
+    # Profiling (off unless a rate or token is set)
+    PROFILE_SAMPLE_RATE: float = 0.0  # Fraction of API requests to profile
+    PROFILE_SCHEDULER_RATE: float = 0.0  # Fraction of scheduler runs to profile
+    PROFILE_SCHEDULER_MAX_SECONDS: int = 120  # Scheduler profiles stop after this long, freeing the slot
+    PROFILE_TOKEN: str = ""  # Requests sent with "X-Profile: <token>" are always profiled
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL_MS: int = 5
     
     class Config:
         env_file = ".env"
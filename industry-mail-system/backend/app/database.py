@@ -24,3 +24,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def init_db():
+    """
+    Create any missing tables and bring existing ones up to date
+
+    Called from the application lifespan (or a migration script) rather than
+    at import time, so importing the app has no database side effects.
+    Pending migrations (`app.migrations`) are applied unless
+    MIGRATE_ON_STARTUP is off; then startup fails while any are pending,
+    rather than serving queries against columns that do not exist yet.
+    """
+    import app.models  # noqa: F401  register all models on Base.metadata
+    from app.migrations import MigrationRunner, MIGRATIONS
+
+    runner = MigrationRunner(engine, MIGRATIONS)
+    # Workers starting together would race on CREATE TABLE and the migrations
+    with runner.lock():
+        Base.metadata.create_all(bind=engine)
+        if settings.MIGRATE_ON_STARTUP:
+            runner.apply()
+        else:
+            runner.check()
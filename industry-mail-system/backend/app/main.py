@@ -1,19 +1,39 @@
 """
 Main FastAPI Application Entry Point
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import init_db
+from app.services.profiler import ProfilingMiddleware
 from app.api.routes import users, subscriptions, news, topics, auth
-from app.scheduler import start_scheduler, stop_scheduler
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema creation, pending migrations and the scheduler run when the server starts, not at import
+    init_db()
+
+    from app.services.auth_service import session_tokens
+    if not session_tokens.configured:
+        print("Auth: SECRET_KEY is unset or a sample value; sign-in is disabled until it is set")
+
+    # Imported lazily: APScheduler is only needed when the scheduler runs
+    from app.scheduler import start_scheduler, stop_scheduler
+
+    # Start scheduler if enabled via env
+    start_scheduler(app)
+    try:
+        yield
+    finally:
+        stop_scheduler()
+
 
 app = FastAPI(
     title="Industry Mailer System API",
     description="API for managing industry news subscriptions and email delivery",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -23,8 +43,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id", "ETag", "Last-Modified"],
 )
 
+# Opt-in request profiling (see PROFILE_* settings)
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(subscriptions.router, prefix="/api/subscriptions", tags=["subscriptions"])
@@ -33,16 +57,6 @@ app.include_router(topics.router, prefix="/api/topics", tags=["topics"])
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 
 
-@app.on_event("startup")
-async def _startup():
-    # Start scheduler if enabled via env
-    start_scheduler(app)
-
-
-@app.on_event("shutdown")
-async def _shutdown():
-    stop_scheduler()
-
 @app.get("/")
 async def root():
     return {
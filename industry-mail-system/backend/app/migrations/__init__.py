@@ -0,0 +1,7 @@
+"""
+Database Migrations
+"""
+from app.migrations.runner import Migration, MigrationContext, MigrationRunner, PendingMigrationsError
+from app.migrations.versions import MIGRATIONS
+
+__all__ = ["Migration", "MigrationContext", "MigrationRunner", "PendingMigrationsError", "MIGRATIONS"]
@@ -0,0 +1,226 @@
+"""
+Migration runner
+
+Applies numbered migrations (see `app.migrations.versions`) in order and
+records them in `schema_migrations`. Long data steps run in id-range chunks,
+each in its own short transaction together with a progress row in
+`schema_migration_progress`, so a migration can be interrupted and resumed
+without redoing finished chunks and without holding a table lock for the
+whole run.
+
+The app applies pending migrations at startup (`app.database.init_db`).
+Several workers may start at once, so a run holds a migration lock:
+a PostgreSQL advisory lock, or a file lock next to a SQLite database.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+DEFAULT_CHUNK_SIZE = 5000
+# pg_advisory_lock key taken while migrations run
+ADVISORY_LOCK_KEY = 7310042
+
+
+class PendingMigrationsError(RuntimeError):
+    """Raised at startup when the database schema is behind the code"""
+
+
+class Migration:
+    def __init__(self, version: int, name: str, up: Callable[["MigrationContext"], None]):
+        self.version = version
+        self.name = name
+        self.up = up
+
+
+class MigrationContext:
+    """Helpers available to a migration's `up` function"""
+
+    def __init__(self, engine: Engine, version: int, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.engine = engine
+        self.version = version
+        self.chunk_size = chunk_size
+        self.dialect = engine.dialect.name
+
+    def execute(self, sql: str, **params):
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), params)
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.engine).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return any(c['name'] == column for c in inspect(self.engine).get_columns(table))
+
+    def has_index(self, table: str, columns: Sequence[str], unique: Optional[bool] = None) -> bool:
+        """True if an index (or unique constraint) covers exactly these columns"""
+        inspector = inspect(self.engine)
+        candidates = [(i['column_names'], bool(i.get('unique'))) for i in inspector.get_indexes(table)]
+        candidates += [(c['column_names'], True) for c in inspector.get_unique_constraints(table)]
+        for cols, is_unique in candidates:
+            if list(cols) == list(columns) and (unique is None or unique == is_unique):
+                return True
+        return False
+
+    def _progress(self, step: str) -> Optional[int]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT last_id FROM schema_migration_progress WHERE version = :v AND step = :s"),
+                {"v": self.version, "s": step},
+            ).first()
+        return row[0] if row else None
+
+    def for_each_chunk(self, step: str, table: str, fn: Callable[[Connection, int, int], None], key: str = 'id'):
+        """
+        Call fn(conn, lo, hi) for each id range (lo, hi] of `table`
+
+        Each chunk commits together with its progress row, so a rerun resumes
+        after the last committed chunk. The upper bound is re-read every
+        chunk, which also covers rows inserted while the step is running.
+        """
+        last = self._progress(step)
+        with self.engine.connect() as conn:
+            if last is None:
+                last = (conn.execute(text(f"SELECT MIN({key}) FROM {table}")).scalar() or 1) - 1
+            start = last
+            max_id = conn.execute(text(f"SELECT MAX({key}) FROM {table}")).scalar() or 0
+
+        started = time.time()
+        while last < max_id:
+            hi = last + self.chunk_size
+            with self.engine.begin() as conn:
+                fn(conn, last, hi)
+                updated = conn.execute(
+                    text("UPDATE schema_migration_progress SET last_id = :hi WHERE version = :v AND step = :s"),
+                    {"hi": hi, "v": self.version, "s": step},
+                ).rowcount
+                if not updated:
+                    conn.execute(
+                        text("INSERT INTO schema_migration_progress (version, step, last_id) VALUES (:v, :s, :hi)"),
+                        {"hi": hi, "v": self.version, "s": step},
+                    )
+                # Never shrink the bound: deletions must not end the step early
+                max_id = max(max_id, conn.execute(text(f"SELECT MAX({key}) FROM {table}")).scalar() or 0)
+            last = hi
+            done = min(last, max_id) - start
+            span = max(max_id - start, 1)
+            print(f"  {step}: {table} {key} <= {min(last, max_id)} ({100 * done / span:.1f}%, {time.time() - started:.1f}s)")
+
+    def create_index(self, name: str, table: str, columns: Sequence[str], unique: bool = False):
+        """
+        Build an index without a long exclusive lock where the backend allows
+
+        PostgreSQL uses CREATE INDEX CONCURRENTLY (outside a transaction, so
+        reads and writes continue). SQLite has no concurrent build; the write
+        lock lasts only for the index build, not for a table rebuild.
+        """
+        cols = ", ".join(columns)
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        if self.dialect == 'postgresql':
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                # A failed concurrent build leaves an INVALID index behind; drop it and retry
+                invalid = conn.execute(text(
+                    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name AND NOT i.indisvalid"
+                ), {"name": name}).first()
+                if invalid:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols})"))
+        else:
+            self.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({cols})")
+
+
+class MigrationRunner:
+    def __init__(self, engine: Engine, migrations: List[Migration], chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.engine = engine
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self.chunk_size = chunk_size
+
+    def _ensure_tables(self):
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migration_progress ("
+                "version INTEGER NOT NULL, step VARCHAR NOT NULL, last_id INTEGER NOT NULL, "
+                "PRIMARY KEY (version, step))"
+            ))
+
+    def applied(self) -> List[int]:
+        self._ensure_tables()
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+    def pending(self, target: Optional[int] = None) -> List[Migration]:
+        done = set(self.applied())
+        return [m for m in self.migrations if m.version not in done and (target is None or m.version <= target)]
+
+    def check(self):
+        """
+        Raise PendingMigrationsError when migrations are pending
+
+        Raises:
+            PendingMigrationsError: lists the pending versions and how to apply them
+        """
+        pending = self.pending()
+        if pending:
+            names = ", ".join(f"{m.version} ({m.name})" for m in pending)
+            raise PendingMigrationsError(
+                f"Database schema is out of date; pending migrations: {names}. "
+                f"Run `python -m app.scripts.migrate` or set MIGRATE_ON_STARTUP=true."
+            )
+
+    @contextmanager
+    def lock(self):
+        """Serialize schema changes (table creation, migrations) of concurrently starting workers"""
+        if self.engine.dialect.name == 'postgresql':
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                try:
+                    yield
+                finally:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                    conn.commit()
+            return
+        database = self.engine.url.database if self.engine.dialect.name == 'sqlite' else None
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        if not database or database == ':memory:' or fcntl is None:
+            # Single process (in-memory database) or no file locking available
+            yield
+            return
+        with open(f"{os.path.abspath(database)}.migrate.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def run(self, target: Optional[int] = None) -> List[int]:
+        """Apply pending migrations up to `target` (inclusive); returns applied versions"""
+        with self.lock():
+            return self.apply(target)
+
+    def apply(self, target: Optional[int] = None) -> List[int]:
+        """Like `run`, for callers already holding `lock()`"""
+        applied = []
+        # Read under the lock: a worker that waited sees what the first one applied
+        for migration in self.pending(target):
+            print(f"Applying migration {migration.version}: {migration.name}")
+            started = time.time()
+            migration.up(MigrationContext(self.engine, migration.version, self.chunk_size))
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, CURRENT_TIMESTAMP)"),
+                    {"v": migration.version, "n": migration.name},
+                )
+                conn.execute(text("DELETE FROM schema_migration_progress WHERE version = :v"), {"v": migration.version})
+            print(f"Applied migration {migration.version} in {time.time() - started:.1f}s")
+            applied.append(migration.version)
+        return applied
@@ -0,0 +1,54 @@
+"""
+Schema migrations, applied in version order by `MigrationRunner`
+
+Tables created from scratch by `init_db()` already have the final shape
+defined on the models; these migrations bring existing databases up to date.
+"""
+from sqlalchemy import text
+from app.migrations.runner import Migration, MigrationContext
+
+
+def _subscriptions_unique(ctx: MigrationContext):
+    """Enforce UNIQUE(user_id, topic_id) on subscriptions"""
+    if not ctx.has_table('subscriptions') or ctx.has_index('subscriptions', ['user_id', 'topic_id'], unique=True):
+        return
+
+    # Remove duplicates chunk by chunk, keeping the oldest row of each pair,
+    # instead of rebuilding the whole table in one transaction
+    dedupe = text(
+        "DELETE FROM subscriptions WHERE id > :lo AND id <= :hi AND EXISTS ("
+        "SELECT 1 FROM subscriptions s2 WHERE s2.user_id = subscriptions.user_id "
+        "AND s2.topic_id = subscriptions.topic_id AND s2.id < subscriptions.id)"
+    )
+    ctx.for_each_chunk('dedupe', 'subscriptions', lambda conn, lo, hi: conn.execute(dedupe, {"lo": lo, "hi": hi}))
+    ctx.create_index('uq_subscriptions_user_topic', 'subscriptions', ['user_id', 'topic_id'], unique=True)
+
+
+def _subscription_lookup_indexes(ctx: MigrationContext):
+    """Composite indexes used by due-subscription selection and per-user lookups"""
+    if not ctx.has_table('subscriptions'):
+        return
+    ctx.create_index('ix_subscriptions_topic_last_sent', 'subscriptions', ['topic_id', 'last_sent_at'])
+    ctx.create_index('ix_subscriptions_user_id', 'subscriptions', ['user_id'])
+
+
+def _user_timezone(ctx: MigrationContext):
+    """Optional per-user time zone for local-time delivery"""
+    if not ctx.has_table('users') or ctx.has_column('users', 'timezone'):
+        return
+    ctx.execute("ALTER TABLE users ADD COLUMN timezone VARCHAR")
+
+
+def _topic_priority(ctx: MigrationContext):
+    """Per-topic weight for fair scheduling of sends"""
+    if not ctx.has_table('topics') or ctx.has_column('topics', 'priority'):
+        return
+    ctx.execute("ALTER TABLE topics ADD COLUMN priority INTEGER NOT NULL DEFAULT 1")
+
+
+MIGRATIONS = [
+    Migration(1, 'subscriptions_unique_user_topic', _subscriptions_unique),
+    Migration(2, 'subscription_lookup_indexes', _subscription_lookup_indexes),
+    Migration(3, 'user_timezone', _user_timezone),
+    Migration(4, 'topic_priority', _topic_priority),
+]
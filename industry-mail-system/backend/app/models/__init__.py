@@ -4,5 +4,12 @@ Database Models
 from app.models.user import User
 from app.models.topic import Topic
 from app.models.subscription import Subscription
+from app.models.scheduler_claim import SchedulerClaim
+from app.models.delivery_status import DeliveryStatus
+from app.models.stored_article import StoredArticle, SearchCoverage
+from app.models.table_version import TableVersion
+from app.models.topic_digest import TopicDigest
+from app.models.outbox import OutboxMessage, OutboxDelivery
+from app.models.quota_slot import NewsApiQuotaSlot
 
-__all__ = ["User", "Topic", "Subscription"]
+__all__ = ["User", "Topic", "Subscription", "SchedulerClaim", "DeliveryStatus", "StoredArticle", "SearchCoverage", "TableVersion", "TopicDigest", "OutboxMessage", "OutboxDelivery", "NewsApiQuotaSlot"]
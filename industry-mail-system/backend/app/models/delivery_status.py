@@ -0,0 +1,27 @@
+"""
+Delivery Status Database Model
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class DeliveryStatus(Base):
+    """Delivery state of one address; suppressed addresses are excluded from sends"""
+    __tablename__ = "delivery_status"
+    __table_args__ = (
+        # Subscriber selection excludes suppressed addresses and those waiting for a retry
+        Index('ix_delivery_status_suppressed', 'suppressed'),
+        Index('ix_delivery_status_next_retry_at', 'next_retry_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True, nullable=False)
+    consecutive_failures = Column(Integer, nullable=False, default=0)
+    last_error_class = Column(String, nullable=True)  # "permanent" or "transient"
+    last_error = Column(String, nullable=True)
+    last_failure_at = Column(DateTime(timezone=True), nullable=True)
+    next_retry_at = Column(DateTime(timezone=True), nullable=True)  # transient failures only
+    suppressed = Column(Boolean, nullable=False, default=False)
+    suppressed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,38 @@
+"""
+Outbox Database Models
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class OutboxMessage(Base):
+    """Subject and body shared by the planned deliveries of one run"""
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    subject = Column(String, nullable=False)
+    html_body = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class OutboxDelivery(Base):
+    """
+    One email planned for later: a digest slotted into a delivery window,
+    or a retry after a transient failure (see `app.services.outbox_service`)
+    """
+    __tablename__ = "outbox_deliveries"
+    __table_args__ = (
+        Index('ix_outbox_deliveries_status_send_at', 'status', 'send_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, ForeignKey("outbox_messages.id"), nullable=False, index=True)
+    email = Column(String, nullable=False)
+    subscription_ids = Column(Text, nullable=False)  # JSON list; stamped as sent on delivery
+    send_at = Column(DateTime(timezone=True), nullable=False)  # UTC
+    expires_at = Column(DateTime(timezone=True), nullable=True)  # UTC; dropped if not sent by then
+    run_at = Column(DateTime(timezone=True), nullable=False)  # UTC start of the planning run
+    status = Column(String, nullable=False, default="pending")  # pending, sending, sent, failed, expired
+    owner = Column(String, nullable=True)  # Claim token of the node sending it
+    claimed_at = Column(DateTime(timezone=True), nullable=True)  # UTC
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
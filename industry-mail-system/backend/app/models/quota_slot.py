@@ -0,0 +1,22 @@
+"""
+NewsAPI Quota Slot Database Model
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from app.database import Base
+
+class NewsApiQuotaSlot(Base):
+    """
+    One unit of the shared NewsAPI request budget (see `app.services.quota_service`)
+
+    There are NEWS_API_QUOTA slots; a request takes a slot that was last
+    used before the rolling window, so every process and node draws from
+    the same budget.
+    """
+    __tablename__ = "news_api_quota_slots"
+    __table_args__ = (
+        Index('ix_news_api_quota_slots_used_at', 'used_at'),
+    )
+
+    id = Column(Integer, primary_key=True)  # 1..NEWS_API_QUOTA
+    used_at = Column(DateTime(timezone=True), nullable=True)  # UTC; null if never used
+    priority = Column(String, nullable=True)  # priority of the request that last used it
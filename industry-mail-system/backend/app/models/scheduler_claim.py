@@ -0,0 +1,17 @@
+"""
+Scheduler Claim Database Model
+"""
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class SchedulerClaim(Base):
+    """A unit of scheduled work (one topic, or a whole digest run) claimed by one node"""
+    __tablename__ = "scheduler_claims"
+    __table_args__ = (UniqueConstraint('run_key', 'shard', name='uq_run_shard'),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_key = Column(String, nullable=False, index=True)  # job id and UTC fire time, e.g. "daily_send:2024-01-01T09:00"
+    shard = Column(String, nullable=False)  # e.g. "topic:3" or "digest"
+    owner = Column(String, nullable=False)  # hostname:pid of the claiming node
+    claimed_at = Column(DateTime(timezone=True), server_default=func.now())  # UTC
@@ -0,0 +1,70 @@
+"""
+Stored Article Database Models
+
+Articles pulled from NewsAPI are kept so searches already covered can be
+answered locally (see `app.services.article_store`). On SQLite an FTS5
+index over titles and descriptions is created together with the table and
+kept in sync by triggers.
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, DDL, event
+from app.database import Base
+
+class StoredArticle(Base):
+    """One article as fetched from NewsAPI, with its summary once one was made"""
+    __tablename__ = "articles"
+    __table_args__ = (
+        Index('ix_articles_published_at', 'published_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, unique=True, index=True, nullable=False)
+    title = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    source = Column(String, nullable=True)
+    published_at = Column(DateTime, nullable=False)  # UTC
+    image_url = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)
+    fetched_at = Column(DateTime, nullable=False)  # UTC
+
+
+class SearchCoverage(Base):
+    """A NewsAPI query and the publication window it was fetched for"""
+    __tablename__ = "search_coverage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    query = Column(String, index=True, nullable=False)  # normalized NewsAPI `q`
+    covered_from = Column(DateTime, nullable=False)  # UTC
+    covered_to = Column(DateTime, nullable=False)  # UTC, when the fetch ran
+
+
+FTS_TABLE = "articles_fts"
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, content='articles', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    f"VALUES ('delete', old.id, old.title, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, description ON articles BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    f"VALUES ('delete', old.id, old.title, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+
+
+def _fts5_supported(ddl, target, bind, **kw) -> bool:
+    """SQLite built with FTS5; other databases search with LIKE instead"""
+    if bind.dialect.name != 'sqlite':
+        return False
+    try:
+        bind.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+        bind.exec_driver_sql("DROP TABLE temp.fts5_probe")
+        return True
+    except Exception:
+        return False
+
+
+for _statement in FTS_DDL:
+    event.listen(StoredArticle.__table__, "after_create", DDL(_statement).execute_if(callable_=_fts5_supported))
@@ -2,7 +2,7 @@
 Subscription Database Model
 """
 from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -15,7 +15,11 @@ class FrequencyEnum(str, enum.Enum):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
-    __table_args__ = (UniqueConstraint('user_id', 'topic_id', name='uq_user_topic'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'topic_id', name='uq_user_topic'),
+        Index('ix_subscriptions_topic_last_sent', 'topic_id', 'last_sent_at'),
+        Index('ix_subscriptions_user_id', 'user_id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
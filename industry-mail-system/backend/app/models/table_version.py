@@ -0,0 +1,75 @@
+"""
+Table Version Database Model
+
+One row per tracked table, with a counter that every write to that table
+bumps in the same transaction. Read endpoints derive ETag and
+Last-Modified from these rows (see `app.services.response_cache`), so a
+conditional request is answered with one primary-key lookup. This works
+across worker processes and nodes because the counters live in the
+database.
+
+Writes are noticed through session events: flushes of new, changed or
+deleted objects, and bulk `query(...).update()` / `.delete()` calls.
+Statements run directly on a connection bypass the session and do not
+bump the counters.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Integer, DateTime, event, insert, select, update
+from sqlalchemy.orm import Session
+from app.database import Base
+
+TRACKED_TABLES = ("users", "topics", "subscriptions")
+
+
+class TableVersion(Base):
+    """Change counter of one table"""
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    changed_at = Column(DateTime(timezone=True), nullable=False)  # UTC
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_versions(target, connection, **kw):
+    now = datetime.now(timezone.utc)
+    connection.execute(insert(target), [
+        {"table_name": name, "version": 0, "changed_at": now} for name in TRACKED_TABLES
+    ])
+
+
+def _bump(session: Session, tables):
+    tables = sorted(set(tables))
+    if not tables:
+        return
+    table = TableVersion.__table__
+    now = datetime.now(timezone.utc)
+    # Straight on the connection, so the bump joins the transaction without firing session events again
+    connection = session.connection()
+    result = connection.execute(
+        update(table).where(table.c.table_name.in_(tables)).values(version=table.c.version + 1, changed_at=now)
+    )
+    if result.rowcount < len(tables):
+        # A row is missing (e.g. deleted by hand); recreate it rather than keep serving one ETag forever
+        present = {name for (name,) in connection.execute(
+            select(table.c.table_name).where(table.c.table_name.in_(tables)))}
+        connection.execute(insert(table), [
+            {"table_name": name, "version": 1, "changed_at": now} for name in tables if name not in present
+        ])
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed(session, flush_context):
+    changed = [obj for obj in session.new] + [obj for obj in session.deleted]
+    changed += [obj for obj in session.dirty if session.is_modified(obj)]
+    _bump(session, (obj.__table__.name for obj in changed
+                    if getattr(obj, "__table__", None) is not None and obj.__table__.name in TRACKED_TABLES))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_bulk(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None and table.name in TRACKED_TABLES:
+        _bump(orm_execute_state.session, [table.name])
@@ -14,6 +14,7 @@ class Topic(Base):
     description = Column(Text, nullable=True)
     keywords = Column(String, nullable=False)  # Comma-separated keywords for news search
     is_active = Column(Boolean, default=True)
+    priority = Column(Integer, nullable=False, default=1, server_default="1")  # Send-queue weight; higher gets more SMTP time
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -0,0 +1,32 @@
+"""
+Topic Digest Database Model
+"""
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class TopicDigest(Base):
+    """
+    A topic's finished article set and rendered newsletter for one period
+
+    One row per (topic, look-back days, UTC day). The articles are
+    deduplicated and summarized, and the body is rendered. Previews, sends,
+    re-sends and weekly/monthly rollups of that period all reuse the row
+    (see `app.services.topic_digest_service`).
+    """
+    __tablename__ = "topic_digests"
+    __table_args__ = (
+        UniqueConstraint('topic_id', 'days', 'period', name='uq_topic_digests_topic_days_period'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: digests of deleted topics are simply pruned with age
+    topic_id = Column(Integer, nullable=False, index=True)
+    days = Column(Integer, nullable=False)  # 1, 7 or 30
+    period = Column(Date, nullable=False)  # UTC day the digest was built for
+    keywords = Column(String, nullable=False)  # Topic keywords at build time; a change rebuilds
+    source = Column(String, nullable=False)  # "fetched" or "rollup"
+    articles = Column(Text, nullable=False)  # JSON list of article dicts
+    subject = Column(String, nullable=False)
+    html_body = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -13,6 +13,7 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     full_name = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    timezone = Column(String, nullable=True)  # IANA name, e.g. "Europe/Berlin"; used for local-time delivery
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
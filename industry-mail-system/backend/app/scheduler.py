@@ -5,28 +5,93 @@ and triggers the existing `/api/news/send-newsletter` endpoint for each
 topic (so the existing send flow, AI summarization and email sending are
 reused).
 
+Every app process runs its own scheduler, so with several uvicorn workers or
+replicas each run fires once per process. Each node claims a topic in the
+database (see `app.services.coordination_service`) before sending it, so
+topics are sharded across nodes and every subscriber gets one email. Nodes
+identify a run by the fire time its trigger scheduled, so a node that
+starts a little late still claims shards of the same run.
+
+Every process also runs an outbox job every OUTBOX_POLL_SECONDS. It sends
+planned deliveries whose slot has come (digests spread over a window or
+sent at local times; see `app.services.outbox_service`). It runs whether
+or not scheduled sends are enabled.
+
 Control with environment variables:
- - SCHEDULER_ENABLED=1 to enable
+ - SCHEDULER_ENABLED=1 to enable scheduled sends
  - SCHEDULE_CRON_HOUR (0-23) default 9
  - SCHEDULE_CRON_MINUTE (0-59) default 0
  - SCHEDULER_TEST=1 to also enable a short-interval test job (every 5 minutes)
+ - SCHEDULER_DIGEST=1 to send one combined digest per user (via
+   `/api/news/send-digest`) instead of one email per topic subscription
+ - SEND_WINDOW_MINUTES (default 0) to spread each run's deliveries evenly
+   over this many minutes instead of sending everything at the cron time;
+   topic starts (and so NewsAPI/LLM calls) are staggered over the first
+   part of the window
+ - SCHEDULER_LOCAL_TIME=1 to deliver at SCHEDULE_CRON_HOUR:MINUTE in each
+   user's own time zone (users without one get the run's time)
+ - SCHEDULER_DRY_RUN=1 to only log what each run would cost (upstream calls,
+   messages, estimated duration; see `/api/news/simulate`) without fetching
+   or sending anything
+
+Before topics are sent, the query planner (`app.services.query_planner`)
+fetches articles for all active topics with as few combined NewsAPI queries
+as possible, so each topic's send is answered from the article store. One
+node per run does this (it claims the 'prefetch' shard); topics another
+node reaches before the prefetch is done fetch on their own.
+
+A PROFILE_SCHEDULER_RATE fraction of runs is profiled (see
+`app.services.profiler`).
+
+Each run gets a SEND_DEADLINE_SECONDS budget. The time left is passed to
+every send request, and topics not started before it runs out wait for
+the next run.
 """
 import os
 import asyncio
-from typing import Optional
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, TYPE_CHECKING
 import httpx
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
 
 from app.config import settings
+from app.services.coordination_service import SchedulerCoordinator, run_key, scheduled_fire_time
+from app.services.deadline import Deadline
+from app.services.outbox_service import outbox
+from app.services.profiler import profiler
+from app.services.query_planner import query_planner
+from app.services.simulation_service import format_report
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+scheduler: Optional["AsyncIOScheduler"] = None
+
 
-scheduler: Optional[AsyncIOScheduler] = None
+# Upper bound for one call to the local API
+API_TIMEOUT = 30.0
+# Topic starts are spread over this share of the send window
+TOPIC_START_SHARE = 0.1
+# A run may start this late and still count as its scheduled run
+MISFIRE_GRACE_SECONDS = 300
+# Interval jobs count from a fixed start so every node fires at the same times
+INTERVAL_ANCHOR = datetime(2000, 1, 1, tzinfo=timezone.utc)
 
 
-async def _send_for_topic(topic_id: int):
+def _send_window() -> dict:
+    """Delivery window settings passed to the send endpoints"""
+    window = {"send_window_seconds": int(os.environ.get('SEND_WINDOW_MINUTES', '0')) * 60}
+    if os.environ.get('SCHEDULER_LOCAL_TIME', '0') == '1':
+        hour = int(os.environ.get('SCHEDULE_CRON_HOUR', '9'))
+        minute = int(os.environ.get('SCHEDULE_CRON_MINUTE', '0'))
+        window["local_time"] = f"{hour:02d}:{minute:02d}"
+    return window
+
+
+async def _send_for_topic(topic_id: int, deadline: Deadline, window: dict):
     url = f"http://127.0.0.1:8000/api/news/send-newsletter"
-    payload = {"topic_id": topic_id, "days": 1}
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    payload = {"topic_id": topic_id, "days": 1, "deadline_seconds": deadline.remaining(), **window}
+    async with httpx.AsyncClient(timeout=deadline.timeout(API_TIMEOUT)) as client:
         try:
             resp = await client.post(url, json=payload)
             # rely on the endpoint to log results
@@ -36,10 +101,74 @@ async def _send_for_topic(topic_id: int):
             return None
 
 
-async def send_news_for_all_topics():
+async def _simulate(window: dict):
+    url = "http://127.0.0.1:8000/api/news/simulate"
+    mode = "digest" if os.environ.get('SCHEDULER_DIGEST', '0') == '1' else "newsletter"
+    async with httpx.AsyncClient(timeout=API_TIMEOUT) as client:
+        try:
+            resp = await client.post(url, json={"mode": mode, **window})
+            resp.raise_for_status()
+        except Exception as e:
+            print(f"Scheduler: dry run failed: {e}")
+            return
+    print(format_report(resp.json()))
+
+
+async def _send_digest(deadline: Deadline, window: dict):
+    url = "http://127.0.0.1:8000/api/news/send-digest"
+    # The digest endpoint fetches news before answering, so allow the whole budget
+    async with httpx.AsyncClient(timeout=deadline.remaining()) as client:
+        try:
+            resp = await client.post(url, json={"deadline_seconds": deadline.remaining(), **window})
+            return resp.status_code
+        except Exception as e:
+            print(f"Scheduler: failed to call send-digest: {e}")
+            return None
+
+
+def _fire_time(job_id: str) -> datetime:
+    """When the trigger scheduled the run that is starting now"""
+    job = scheduler.get_job(job_id) if scheduler else None
+    fired = scheduled_fire_time(job.trigger, timedelta(seconds=MISFIRE_GRACE_SECONDS + 60)) if job else None
+    # Started by hand: there is no scheduled time to agree on
+    return fired or datetime.now(timezone.utc)
+
+
+async def send_news_for_all_topics(job_id: str = 'daily_send'):
+    key = run_key(job_id, _fire_time(job_id))
+    # PROFILE_SCHEDULER_RATE of runs are profiled, including the API work they trigger,
+    # for at most PROFILE_SCHEDULER_MAX_SECONDS
+    run = profiler.start("scheduler", profiler.scheduler_rate, label=f"scheduler {job_id}",
+                         max_seconds=profiler.scheduler_max_seconds)
+    try:
+        await _send_run(key)
+    finally:
+        if run is not None:
+            await asyncio.to_thread(run.finish)
+
+
+async def _send_run(key: str):
+    window = _send_window()
+    if os.environ.get('SCHEDULER_DRY_RUN', '0') == '1':
+        await _simulate(window)
+        return
+    window_seconds = window["send_window_seconds"]
+    window_end = time.time() + window_seconds
+    # The run may last as long as its delivery window (up to a day later with local times)
+    deadline = Deadline(settings.SEND_DEADLINE_SECONDS + window_seconds + (86400 if "local_time" in window else 0))
+    coordinator = SchedulerCoordinator()
+
+    if os.environ.get('SCHEDULER_DIGEST', '0') == '1':
+        # Digests span topics, so the whole run goes to a single node
+        if await asyncio.to_thread(coordinator.claim, key, 'digest'):
+            await _send_digest(deadline, window)
+        else:
+            print(f"Scheduler: digest run {key} already claimed by another node")
+        return
+
     # Fetch topics from local API
     topics_url = "http://127.0.0.1:8000/api/topics/"
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with httpx.AsyncClient(timeout=deadline.timeout(API_TIMEOUT)) as client:
         try:
             r = await client.get(topics_url)
             r.raise_for_status()
@@ -48,32 +177,71 @@ async def send_news_for_all_topics():
             print(f"Scheduler: failed to fetch topics: {e}")
             return
 
-    for t in topics:
-        tid = t.get('id')
-        if not tid:
+    # Combined NewsAPI queries for all topics, made by one node; each send then reads the article store
+    if await asyncio.to_thread(coordinator.claim, key, 'prefetch'):
+        await query_planner.prefetch([t['keywords'] for t in topics if t.get('keywords')], days=1, deadline=deadline)
+    else:
+        print(f"Scheduler: prefetch for {key} already claimed by another node")
+
+    # Higher-priority topics start first; rotation still spreads nodes within a priority tier
+    priorities = {t['id']: t.get('priority') or 1 for t in topics if t.get('id')}
+    topic_ids = sorted(coordinator.rotate(list(priorities)), key=lambda tid: -priorities[tid])
+    start_interval = window_seconds * TOPIC_START_SHARE / max(1, len(topic_ids))
+    sent = 0
+    for idx, tid in enumerate(topic_ids):
+        if idx and start_interval:
+            await asyncio.sleep(start_interval)
+        if deadline.expired:
+            print(f"Scheduler: run {key} out of time; remaining topics wait for the next run")
+            break
+        # Claim right before sending so idle nodes pick up remaining topics
+        if not await asyncio.to_thread(coordinator.claim_topic, key, tid):
             continue
-        await _send_for_topic(tid)
+        # Later topics spread their subscribers over what is left of the window
+        await _send_for_topic(tid, deadline, {**window, "send_window_seconds": max(0, window_end - time.time())})
+        sent += 1
+    print(f"Scheduler: node {coordinator.owner} handled {sent}/{len(topic_ids)} topics for {key}")
+    await asyncio.to_thread(coordinator.prune)
+
+
+async def deliver_outbox():
+    """Send planned deliveries that are due; SMTP and the database block, so this runs in a thread"""
+    try:
+        await asyncio.to_thread(outbox.deliver_due)
+    except Exception as e:
+        print(f"Scheduler: outbox delivery failed: {e}")
 
 
 def start_scheduler(app):
     global scheduler
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    scheduler = AsyncIOScheduler()
+    # Planned deliveries go out whether or not scheduled sends are enabled
+    scheduler.add_job(deliver_outbox, IntervalTrigger(seconds=settings.OUTBOX_POLL_SECONDS), id='outbox',
+                      coalesce=True, max_instances=1)
+
     enabled = os.environ.get('SCHEDULER_ENABLED', '0') == '1'
     if not enabled:
-        print("Scheduler disabled (SCHEDULER_ENABLED!=1)")
+        scheduler.start()
+        print("Scheduled sends disabled (SCHEDULER_ENABLED!=1); outbox delivery running")
         return
 
     hour = int(os.environ.get('SCHEDULE_CRON_HOUR', '9'))
     minute = int(os.environ.get('SCHEDULE_CRON_MINUTE', '0'))
 
-    scheduler = AsyncIOScheduler()
-
     # Daily cron at configured hour/minute
     trigger = CronTrigger(hour=hour, minute=minute)
-    scheduler.add_job(lambda: asyncio.create_task(send_news_for_all_topics()), trigger, id='daily_send')
+    scheduler.add_job(send_news_for_all_topics, trigger, args=['daily_send'], id='daily_send',
+                      misfire_grace_time=MISFIRE_GRACE_SECONDS, coalesce=True)
 
     # Optional short-interval test job
     if os.environ.get('SCHEDULER_TEST', '0') == '1':
-        scheduler.add_job(lambda: asyncio.create_task(send_news_for_all_topics()), 'interval', minutes=5, id='test_interval')
+        scheduler.add_job(send_news_for_all_topics, IntervalTrigger(minutes=5, start_date=INTERVAL_ANCHOR),
+                          args=['test_interval'], id='test_interval',
+                          misfire_grace_time=MISFIRE_GRACE_SECONDS, coalesce=True)
 
     scheduler.start()
     print(f"Scheduler started. Daily job at {hour:02d}:{minute:02d}")
@@ -1,12 +1,12 @@
 """
 Pydantic Schemas
 """
-from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.schemas.user import UserCreate, UserResponse, UserUpdate, SignInResponse, SessionResponse
 from app.schemas.topic import TopicCreate, TopicResponse, TopicUpdate
 from app.schemas.subscription import SubscriptionCreate, SubscriptionResponse, SubscriptionUpdate
 
 __all__ = [
-    "UserCreate", "UserResponse", "UserUpdate",
+    "UserCreate", "UserResponse", "UserUpdate", "SignInResponse", "SessionResponse",
     "TopicCreate", "TopicResponse", "TopicUpdate",
     "SubscriptionCreate", "SubscriptionResponse", "SubscriptionUpdate"
 ]
@@ -1,7 +1,7 @@
 """
 Topic Schemas
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 
@@ -9,6 +9,7 @@ class TopicBase(BaseModel):
     name: str
     description: Optional[str] = None
     keywords: str
+    priority: int = Field(1, ge=1, le=100)
 
 class TopicCreate(TopicBase):
     pass
@@ -18,6 +19,7 @@ class TopicUpdate(BaseModel):
     description: Optional[str] = None
     keywords: Optional[str] = None
     is_active: Optional[bool] = None
+    priority: Optional[int] = Field(None, ge=1, le=100)
 
 class TopicResponse(TopicBase):
     id: int
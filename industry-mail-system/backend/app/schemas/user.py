@@ -1,13 +1,25 @@
 """
 User Schemas
 """
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from datetime import datetime
 from typing import Optional
+from zoneinfo import ZoneInfo
+
+def _check_timezone(value: Optional[str]) -> Optional[str]:
+    if value:
+        try:
+            ZoneInfo(value)
+        except Exception:
+            raise ValueError(f"Unknown time zone: {value}")
+    return value or None
 
 class UserBase(BaseModel):
     email: EmailStr
     full_name: str
+    timezone: Optional[str] = None
+
+    _timezone = field_validator('timezone')(_check_timezone)
 
 class UserCreate(UserBase):
     pass
@@ -15,6 +27,9 @@ class UserCreate(UserBase):
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     is_active: Optional[bool] = None
+    timezone: Optional[str] = None
+
+    _timezone = field_validator('timezone')(_check_timezone)
 
 class UserResponse(UserBase):
     id: int
@@ -23,3 +38,15 @@ class UserResponse(UserBase):
     
     class Config:
         from_attributes = True
+
+class SignInResponse(UserResponse):
+    """The signed-in user plus a session token for `Authorization: Bearer`"""
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
+class SessionResponse(BaseModel):
+    """Who a session token belongs to, read from the token alone"""
+    id: int
+    email: str
+    expires_at: datetime
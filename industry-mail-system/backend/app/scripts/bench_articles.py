@@ -0,0 +1,136 @@
+"""Memory benchmark: article dicts vs the slotted `Article` through the pipeline.
+
+Builds a synthetic NewsAPI response per topic, then runs both article
+representations through the same steps as a digest send: parse, attach
+summaries, keep the summarized lists in the article cache and assemble
+per-user digests that reference them. Reports the memory held by the
+cached articles and by the digests, and the peak during the run, all
+measured with tracemalloc. It also reports the pickled size that
+campaign worker processes receive:
+
+    python -m app.scripts.bench_articles
+    python -m app.scripts.bench_articles --topics 100 --articles 100 --users 50000
+"""
+import argparse
+import gc
+import json
+import pickle
+import random
+import re
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.services.article import Article
+
+SOURCES = ['Reuters', 'Bloomberg', 'TechCrunch', 'The Verge', 'Financial Times', 'BBC News',
+           'Associated Press', 'Wired', 'CNBC', 'The Guardian', 'Ars Technica', 'Forbes']
+WORDS = ('market growth supply chain energy software platform launch regulators investors quarter '
+         'revenue industry analysts production demand startup funding research hospital network').split()
+_FIRST_SENTENCE = re.compile(r'(?<=[.!?])\s+')
+
+
+def newsapi_payload(rng: random.Random, topic: int, count: int) -> str:
+    """A NewsAPI `everything` response body with `count` articles"""
+    def sentence(words: int) -> str:
+        return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+    articles = [
+        {
+            "source": {"id": None, "name": rng.choice(SOURCES)},
+            "author": "Staff",
+            "title": sentence(10)[:-1],
+            "description": ' '.join(sentence(rng.randint(12, 20)) for _ in range(3)),
+            "url": f"https://news.example.com/{topic}/{idx}/{rng.getrandbits(40):x}",
+            "urlToImage": f"https://img.example.com/{topic}/{idx}.jpg" if rng.random() < 0.7 else None,
+            "publishedAt": f"2024-05-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z",
+            "content": sentence(30),
+        }
+        for idx in range(count)
+    ]
+    return json.dumps({"status": "ok", "totalResults": count, "articles": articles})
+
+
+def summary_of(description: str) -> str:
+    return _FIRST_SENTENCE.split(description.strip(), 1)[0][:200]
+
+
+def dict_pipeline(payload: str) -> List[Dict[str, Any]]:
+    """The previous representation: a dict per article, copied to attach the summary"""
+    articles = []
+    for article in json.loads(payload)["articles"]:
+        articles.append({
+            "title": article.get("title", ""),
+            "description": article.get("description", ""),
+            "url": article.get("url", ""),
+            "source": article.get("source", {}).get("name", "Unknown"),
+            "published_at": article.get("publishedAt", ""),
+            "image_url": article.get("urlToImage")
+        })
+    return [{**a, 'summary': summary_of(a['description'])} for a in articles]
+
+
+def article_pipeline(payload: str) -> List[Article]:
+    articles = [Article.from_newsapi(raw) for raw in json.loads(payload)["articles"]]
+    return [a.with_summary(summary_of(a.description)) for a in articles]
+
+
+def run(pipeline: Callable[[str], list], payloads: List[str], users: int,
+        topics_per_user: int, seed: int) -> Tuple[int, int, int, float, list]:
+    """Returns (cached article bytes, digest bytes, peak bytes, seconds to build the cache, cache)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    cache = [pipeline(payload) for payload in payloads]
+    elapsed = time.perf_counter() - started
+    cached, _ = tracemalloc.get_traced_memory()
+
+    # Per-user digests hold (topic name, articles) sections pointing at the cached lists
+    rng = random.Random(seed)
+    digests = [
+        [(f"Topic {t}", cache[t]) for t in rng.sample(range(len(cache)), topics_per_user)]
+        for _ in range(users)
+    ]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del digests
+    return cached, retained - cached, peak, elapsed, cache
+
+
+def mb(n: int) -> str:
+    return f"{n / 1e6:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Article representation memory benchmark')
+    parser.add_argument('--topics', type=int, default=50)
+    parser.add_argument('--articles', type=int, default=100, help='articles per topic')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--topics-per-user', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = [newsapi_payload(rng, t, args.articles) for t in range(args.topics)]
+    total = args.topics * args.articles
+    print(f"{args.topics} topics x {args.articles} articles = {total} articles, "
+          f"{args.users} users with {args.topics_per_user} topics each\n")
+
+    print(f"{'representation':<16} {'articles':>10} {'per article':>12} {'digests':>10} {'peak':>10} {'pickled':>10} {'parse':>8}")
+    results = {}
+    for name, pipeline in (('dict', dict_pipeline), ('Article', article_pipeline)):
+        cached, digest_bytes, peak, elapsed, cache = run(
+            pipeline, payloads, args.users, args.topics_per_user, args.seed
+        )
+        pickled = sum(len(pickle.dumps(articles)) for articles in cache)
+        results[name] = cached
+        print(f"{name:<16} {mb(cached):>10} {cached / total:>10.0f} B {mb(digest_bytes):>10} "
+              f"{mb(peak):>10} {mb(pickled):>10} {elapsed:>7.2f}s")
+        del cache
+
+    print(f"\nCached articles: Article uses {(1 - results['Article'] / results['dict']) * 100:.0f}% less memory than dicts. "
+          f"Digests only reference the cached lists, so their cost grows with users, not articles.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Startup-time benchmark: import time of `app.main`, broken down by module.
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters and
+reports the total plus the slowest modules by cumulative import time. Save a
+run with --save and pass it to --compare to track regressions:
+
+    python -m app.scripts.bench_startup --save startup.json
+    python -m app.scripts.bench_startup --compare startup.json
+
+Absolute times swing with machine load by a third or more; compare runs
+taken back to back on the same machine rather than quoting a single figure.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+from typing import Dict
+
+
+def measure_once(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds per module for one cold import"""
+    env = {**os.environ}
+    env.setdefault('NEWS_API_KEY', 'bench')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=env,
+        cwd=os.path.join(os.path.dirname(__file__), '..', '..'),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    times: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line.split(':', 1)[1].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, runs: int) -> Dict[str, int]:
+    """Median cumulative import time per module across several runs"""
+    samples = [measure_once(module) for _ in range(runs)]
+    names = set().union(*samples)
+    return {name: int(median(s.get(name, 0) for s in samples)) for name in names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time of the app')
+    parser.add_argument('--module', default='app.main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against a previously saved JSON file')
+    args = parser.parse_args()
+
+    times = measure(args.module, args.runs)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    total = times.get(args.module, 0)
+    print(f"{args.module}: {total / 1000:.1f} ms (median of {args.runs} runs)")
+    if baseline:
+        before = baseline.get(args.module, 0)
+        print(f"  baseline: {before / 1000:.1f} ms ({(total - before) / 1000:+.1f} ms)")
+
+    print(f"\n{'cumulative ms':>14}  {'delta':>8}  module")
+    for name, us in sorted(times.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        delta = f"{(us - baseline[name]) / 1000:+.1f}" if name in baseline else ''
+        print(f"{us / 1000:>14.1f}  {delta:>8}  {name}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(times, f, indent=2, sort_keys=True)
+        print(f"\nSaved to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
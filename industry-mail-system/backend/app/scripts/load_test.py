@@ -0,0 +1,379 @@
+"""HTTP load test for the CRUD API with per-route latency percentiles.
+
+Seeds a throwaway database, starts the app under uvicorn against it and
+drives a weighted mix of reads and writes on `/api/users`, `/api/topics`
+and `/api/subscriptions` from concurrent clients. Reports throughput and
+p50/p95/p99 latency per route. Save a run with --save and pass it to
+--compare to see the effect of a change:
+
+    python -m app.scripts.load_test --save before.json
+    python -m app.scripts.load_test --compare before.json
+
+Options of note:
+    --database-url URL   seed and serve this database instead of a temporary
+                         SQLite file (e.g. a scratch Postgres database; its
+                         users/topics/subscriptions tables are emptied first)
+    --url URL            load an already running server instead (no seeding)
+    --mix name=weight,…  operation weights, e.g. "get_user=50,create_subscription=5"
+    --workers N          uvicorn worker processes
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', '..')
+
+DEFAULT_MIX = {
+    'list_users': 5,
+    'get_user': 20,
+    'list_topics': 15,
+    'get_topic': 10,
+    'list_subscriptions': 5,
+    'user_subscriptions': 20,
+    'get_subscription': 10,
+    'create_user': 4,
+    'update_user': 2,
+    'create_subscription': 4,
+    'update_subscription': 3,
+    'delete_subscription': 2,
+}
+
+
+class LoadState:
+    """IDs known to exist, shared by all clients so writes feed later reads"""
+
+    def __init__(self, user_ids: List[int], topic_ids: List[int], subscription_ids: List[int]):
+        self.user_ids = user_ids
+        self.topic_ids = topic_ids
+        self.subscription_ids = subscription_ids
+        self.counter = 0
+
+    def next_email(self) -> str:
+        self.counter += 1
+        return f"load-{os.getpid()}-{time.time_ns()}-{self.counter}@loadtest.dev"
+
+
+# Each operation returns (route label, response)
+Operation = Callable[[httpx.AsyncClient, LoadState], Awaitable[Tuple[str, httpx.Response]]]
+
+
+async def list_users(client, state):
+    return 'GET /api/users/', await client.get('/api/users/', params={'limit': 50})
+
+
+async def get_user(client, state):
+    return 'GET /api/users/{id}', await client.get(f'/api/users/{random.choice(state.user_ids)}')
+
+
+async def list_topics(client, state):
+    return 'GET /api/topics/', await client.get('/api/topics/')
+
+
+async def get_topic(client, state):
+    return 'GET /api/topics/{id}', await client.get(f'/api/topics/{random.choice(state.topic_ids)}')
+
+
+async def list_subscriptions(client, state):
+    return 'GET /api/subscriptions/', await client.get('/api/subscriptions/', params={'limit': 50})
+
+
+async def user_subscriptions(client, state):
+    return 'GET /api/subscriptions/user/{id}', await client.get(f'/api/subscriptions/user/{random.choice(state.user_ids)}')
+
+
+async def get_subscription(client, state):
+    if not state.subscription_ids:
+        return await list_subscriptions(client, state)
+    return 'GET /api/subscriptions/{id}', await client.get(f'/api/subscriptions/{random.choice(state.subscription_ids)}')
+
+
+async def create_user(client, state):
+    resp = await client.post('/api/users/', json={'email': state.next_email(), 'full_name': 'Load Test'})
+    if resp.status_code == 201:
+        state.user_ids.append(resp.json()['id'])
+    return 'POST /api/users/', resp
+
+
+async def update_user(client, state):
+    user_id = random.choice(state.user_ids)
+    return 'PUT /api/users/{id}', await client.put(f'/api/users/{user_id}', json={'full_name': f'Load Test {user_id}'})
+
+
+async def create_subscription(client, state):
+    payload = {
+        'user_id': random.choice(state.user_ids),
+        'topic_id': random.choice(state.topic_ids),
+        'frequency': random.choice(['1', '7', '30']),
+    }
+    resp = await client.post('/api/subscriptions/', json=payload)
+    if resp.status_code == 201:
+        state.subscription_ids.append(resp.json()['id'])
+    return 'POST /api/subscriptions/', resp
+
+
+async def update_subscription(client, state):
+    if not state.subscription_ids:
+        return await create_subscription(client, state)
+    sub_id = random.choice(state.subscription_ids)
+    resp = await client.put(f'/api/subscriptions/{sub_id}', json={'frequency': random.choice(['1', '7', '30'])})
+    return 'PUT /api/subscriptions/{id}', resp
+
+
+async def delete_subscription(client, state):
+    if not state.subscription_ids:
+        return await create_subscription(client, state)
+    sub_id = state.subscription_ids.pop(random.randrange(len(state.subscription_ids)))
+    return 'DELETE /api/subscriptions/{id}', await client.delete(f'/api/subscriptions/{sub_id}')
+
+
+OPERATIONS: Dict[str, Operation] = {
+    name: globals()[name] for name in DEFAULT_MIX
+}
+
+# Expected non-2xx answers that are not errors (e.g. a random pair already subscribed)
+EXPECTED_STATUS = {'POST /api/subscriptions/': {400}}
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, int]:
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in value.split(','):
+        name, weight = part.split('=')
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def seed(database_url: str, users: int, topics: int, subscriptions: int) -> LoadState:
+    """Fill the database with users, topics and subscriptions via bulk inserts"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('NEWS_API_KEY', 'loadtest')
+
+    from app.database import SessionLocal, init_db
+    from app.models import Subscription, Topic, User
+    from app.models.subscription import FrequencyEnum
+
+    init_db()
+    db = SessionLocal()
+    try:
+        for model in (Subscription, Topic, User):
+            db.query(model).delete()
+        db.commit()
+
+        db.bulk_insert_mappings(User, [
+            {'email': f'user{i}@loadtest.dev', 'full_name': f'User {i}', 'is_active': True} for i in range(users)
+        ])
+        db.bulk_insert_mappings(Topic, [
+            {'name': f'Topic {i}', 'description': 'Load test topic', 'keywords': f'topic{i},news', 'is_active': True}
+            for i in range(topics)
+        ])
+        db.commit()
+        user_ids = [row[0] for row in db.query(User.id)]
+        topic_ids = [row[0] for row in db.query(Topic.id)]
+
+        pairs = set()
+        target = min(subscriptions, len(user_ids) * len(topic_ids))
+        while len(pairs) < target:
+            pairs.add((random.choice(user_ids), random.choice(topic_ids)))
+        db.bulk_insert_mappings(Subscription, [
+            {'user_id': u, 'topic_id': t, 'frequency': random.choice(list(FrequencyEnum))} for u, t in pairs
+        ])
+        db.commit()
+        subscription_ids = [row[0] for row in db.query(Subscription.id)]
+    finally:
+        db.close()
+    return LoadState(user_ids, topic_ids, subscription_ids)
+
+
+def discover(url: str) -> LoadState:
+    """IDs from an already running server"""
+    with httpx.Client(base_url=url, timeout=30.0) as client:
+        user_ids = [u['id'] for u in client.get('/api/users/', params={'limit': 1000}).json()]
+        topic_ids = [t['id'] for t in client.get('/api/topics/', params={'limit': 1000}).json()]
+        subscription_ids = [s['id'] for s in client.get('/api/subscriptions/', params={'limit': 1000}).json()]
+    if not user_ids or not topic_ids:
+        raise SystemExit("The server needs at least one user and one topic")
+    return LoadState(user_ids, topic_ids, subscription_ids)
+
+
+def start_server(database_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, 'DATABASE_URL': database_url, 'SCHEDULER_ENABLED': '0'}
+    env.setdefault('NEWS_API_KEY', 'loadtest')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        if proc.poll() is not None:
+            raise SystemExit("uvicorn exited during startup")
+        try:
+            if httpx.get(f'{url}/health', timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("uvicorn did not become healthy in time")
+
+
+async def run_load(url: str, state: LoadState, mix: Dict[str, int], clients: int,
+                   duration: float, warmup: float) -> Tuple[Dict[str, List[float]], Dict[str, int], float]:
+    """Drive the mix for `duration` seconds; returns (latencies per route, errors per route, elapsed)"""
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, timeout=30.0, limits=limits) as client:
+        async def worker():
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    return
+                op = OPERATIONS[random.choices(names, weights)[0]]
+                t0 = time.perf_counter()
+                try:
+                    route, resp = await op(client, state)
+                    ok = resp.status_code < 400 or resp.status_code in EXPECTED_STATUS.get(route, ())
+                except httpx.HTTPError:
+                    route, ok = f'{op.__name__} (transport)', False
+                elapsed = time.perf_counter() - t0
+                if t0 >= measure_from:
+                    latencies[route].append(elapsed)
+                    if not ok:
+                        errors[route] += 1
+
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    return latencies, errors, time.perf_counter() - measure_from
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict[str, Dict[str, float]]:
+    report = {}
+    all_values = []
+    for route, values in latencies.items():
+        values.sort()
+        all_values.extend(values)
+        report[route] = {
+            'requests': len(values),
+            'errors': errors.get(route, 0),
+            'rps': len(values) / elapsed,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000,
+        }
+    all_values.sort()
+    report['TOTAL'] = {
+        'requests': len(all_values),
+        'errors': sum(errors.values()),
+        'rps': len(all_values) / elapsed,
+        'p50_ms': percentile(all_values, 50) * 1000,
+        'p95_ms': percentile(all_values, 95) * 1000,
+        'p99_ms': percentile(all_values, 99) * 1000,
+        'max_ms': (all_values[-1] if all_values else 0.0) * 1000,
+    }
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]):
+    def delta(route: str, key: str) -> str:
+        before = baseline.get(route, {}).get(key)
+        if not before:
+            return ''
+        return f"({(report[route][key] - before) / before * 100:+.0f}%)"
+
+    print(f"{'route':<36} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    routes = sorted(r for r in report if r != 'TOTAL') + ['TOTAL']
+    for route in routes:
+        r = report[route]
+        print(f"{route:<36} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f}")
+        if baseline.get(route):
+            print(f"{'  vs baseline':<36} {'':>7} {'':>5} {delta(route, 'rps'):>8} "
+                  f"{delta(route, 'p50_ms'):>8} {delta(route, 'p95_ms'):>8} {delta(route, 'p99_ms'):>8} {delta(route, 'max_ms'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the CRUD API')
+    parser.add_argument('--url', help='load an already running server instead of starting one')
+    parser.add_argument('--database-url', help='database to seed and serve (default: temporary SQLite file)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='seconds before measuring starts')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--topics', type=int, default=50)
+    parser.add_argument('--subscriptions', type=int, default=10000)
+    parser.add_argument('--mix', help='operation weights, e.g. "get_user=50,create_user=5"')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for data and request mix')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against a previously saved JSON file')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    mix = parse_mix(args.mix)
+
+    server = None
+    if args.url:
+        url = args.url.rstrip('/')
+        state = discover(url)
+    else:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+        state = seed(database_url, args.users, args.topics, args.subscriptions)
+        print(f"Seeded {len(state.user_ids)} users, {len(state.topic_ids)} topics, "
+              f"{len(state.subscription_ids)} subscriptions into {database_url}")
+        server = start_server(database_url, args.port, args.workers)
+        url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        print(f"Running {args.clients} clients for {args.duration:.0f}s (+{args.warmup:.0f}s warmup) against {url}\n")
+        latencies, errors, elapsed = asyncio.run(
+            run_load(url, state, mix, args.clients, args.duration, args.warmup)
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = summarize(latencies, errors, elapsed)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['routes']
+    print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'args': vars(args), 'routes': report}, f, indent=2, sort_keys=True)
+        print(f"\nSaved to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Apply pending schema migrations.
+
+Uses DATABASE_URL from the environment/.env unless --database-url is given.
+Data steps run in resumable chunks; if a run is interrupted, running the
+command again continues from the last committed chunk.
+
+Usage (from the backend directory):
+    python -m app.scripts.migrate [--status] [--target N] [--chunk-size 5000]
+"""
+import argparse
+
+from sqlalchemy import create_engine
+
+from app.migrations import MigrationRunner, MIGRATIONS
+from app.migrations.runner import DEFAULT_CHUNK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations')
+    parser.add_argument('--database-url', help='defaults to DATABASE_URL from settings')
+    parser.add_argument('--target', type=int, help='apply migrations up to this version')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from app.database import engine
+
+    runner = MigrationRunner(engine, MIGRATIONS, chunk_size=args.chunk_size)
+    if args.status:
+        applied = set(runner.applied())
+        for m in runner.migrations:
+            print(f"{'applied' if m.version in applied else 'pending':>8}  {m.version:>4}  {m.name}")
+        return
+
+    applied = runner.run(args.target)
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Send one topic's newsletter using the multi-process campaign runner.
+
+Articles come from the topic's materialized digest for today, built in the
+parent if needed. Subscribers are partitioned across worker processes, each
+with its own DB session and SMTP connection.
+
+Usage (from the backend directory):
+    python -m app.scripts.run_campaign <topic_id> [--days 1] [--workers 4]
+"""
+import argparse
+import asyncio
+
+from app.database import SessionLocal, init_db
+from app.models.topic import Topic
+from app.services.campaign_service import CampaignRunner
+from app.services.topic_digest_service import topic_digests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('topic_id', type=int)
+    parser.add_argument('--days', type=int, default=1, choices=[1, 7, 30])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    # Same schema gate as app startup: the topic query reads migrated columns (priority)
+    init_db()
+    db = SessionLocal()
+    try:
+        topic = db.query(Topic).filter(Topic.id == args.topic_id).first()
+        if not topic:
+            print(f"Topic {args.topic_id} not found")
+            return
+        topic_name, keywords, description = topic.name, topic.keywords, topic.description
+    finally:
+        db.close()
+
+    digest = asyncio.run(topic_digests.get(args.topic_id, topic_name, keywords, args.days,
+                                                  description=description))
+    articles = digest.articles if digest else []
+    if not articles:
+        print(f"No news articles found for {topic_name}")
+        return
+
+    def on_progress(totals):
+        print(f"\rsent={totals['sent']} failed={totals['failed']}", end='', flush=True)
+
+    result = CampaignRunner(args.workers).run(args.topic_id, topic_name, articles, on_progress)
+    print()
+    print(f"Campaign for {topic_name}: {result['sent']}/{result['total']} sent, "
+          f"{result['failed']} failed in {result['seconds']}s using {result['workers']} workers")
+    for email, error in list(result['failures'].items())[:20]:
+        print(f"  {email}: {error}")
+    for error in result['worker_errors']:
+        print(f"  worker error: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Dry run: predict what a scheduler run would cost without sending anything.
+
+Selects topics and subscribers from the configured database and plans
+deliveries exactly like a real run. It then reports per-topic and total
+NewsAPI calls, LLM calls, messages, SMTP connections and the estimated
+duration. Nothing is fetched or sent.
+
+Locally, default upstream latencies are used. With --url the running
+server does the simulation, using the latencies it has recorded from
+real traffic:
+
+    python -m app.scripts.simulate_run
+    python -m app.scripts.simulate_run --mode digest --window-minutes 60
+    python -m app.scripts.simulate_run --url http://localhost:8000 --json
+"""
+import argparse
+import json
+
+import httpx
+
+from app.services.send_planner import SendPlanner, parse_local_time
+from app.services.simulation_service import MODES, RunSimulator, format_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dry-run cost simulation of a scheduler run')
+    parser.add_argument('--mode', choices=MODES, default='newsletter')
+    parser.add_argument('--topic', type=int, action='append', dest='topic_ids', help='limit to this topic (repeatable)')
+    parser.add_argument('--days', type=int, default=1, choices=[1, 7, 30])
+    parser.add_argument('--window-minutes', type=float, default=0, help='delivery window (SEND_WINDOW_MINUTES)')
+    parser.add_argument('--local-time', help='HH:MM local delivery time (SCHEDULER_LOCAL_TIME)')
+    parser.add_argument('--url', help='ask this running server, which has recorded latencies')
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args()
+
+    if args.url:
+        body = {
+            "mode": args.mode,
+            "topic_ids": args.topic_ids,
+            "days": args.days,
+            "send_window_seconds": args.window_minutes * 60,
+            "local_time": args.local_time,
+        }
+        resp = httpx.post(f"{args.url.rstrip('/')}/api/news/simulate", json=body, timeout=60.0)
+        resp.raise_for_status()
+        report = resp.json()
+    else:
+        from app.database import SessionLocal, init_db
+
+        init_db()
+        planner = SendPlanner(args.window_minutes * 60, parse_local_time(args.local_time))
+        db = SessionLocal()
+        try:
+            report = RunSimulator().simulate(db, args.mode, args.topic_ids, args.days, planner)
+        finally:
+            db.close()
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
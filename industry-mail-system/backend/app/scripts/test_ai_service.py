@@ -9,31 +9,45 @@ It will print summaries for sample articles.
 import asyncio
 import os
 import sys
+import time
 
 from app.services.ai_service import AIService
+from app.services.article import Article
 
 
 async def main():
     service = AIService()
     samples = [
-        {
-            "title": "Test Article: New AI Tool Released",
-            "description": "Today a new AI tool was released. It helps engineers write tests and ship features faster. The tool integrates with existing editors and cloud services. More details to follow.",
-            "url": "https://example.com/article1"
-        },
-        {
-            "title": "Another Story",
-            "description": "An overview of recent events. It covers multiple topics and includes opinion. The first sentence is the most important.",
-            "url": "https://example.com/article2"
-        }
+        Article(
+            title="Test Article: New AI Tool Released",
+            description="Today a new AI tool was released. It helps engineers write tests and ship features faster. The tool integrates with existing editors and cloud services. More details to follow.",
+            url="https://example.com/article1",
+            source="Example",
+            published_at="",
+        ),
+        Article(
+            title="Another Story",
+            description="An overview of recent events. It covers multiple topics and includes opinion. The first sentence is the most important.",
+            url="https://example.com/article2",
+            source="Example",
+            published_at="",
+        )
     ]
 
     res = await service.summarize_articles(samples)
     for r in res:
-        print('TITLE:', r.get('title'))
-        print('SUMMARY:', r.get('summary'))
+        print('TITLE:', r.title)
+        print('SUMMARY:', r.summary)
         print('---')
 
+    # Local batch summarizer on a digest-sized input
+    digest = samples * 25
+    service.extractive_summaries(samples)  # the first call imports NumPy
+    started = time.perf_counter()
+    service.extractive_summaries(digest)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f'Extractive summarizer: {len(digest)} articles in {elapsed:.1f} ms')
+
 
 if __name__ == '__main__':
     asyncio.run(main())
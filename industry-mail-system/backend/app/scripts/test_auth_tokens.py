@@ -0,0 +1,174 @@
+"""Quick test harness for Google ID token verification and session tokens.
+
+Signs Google-style ID tokens with a locally generated RSA key, so nothing
+is fetched from Google:
+
+    python -m app.scripts.test_auth_tokens
+
+It checks that certificates are fetched once and reused, that an unknown
+key id refetches them (at most once a minute), that bad tokens are
+rejected before any fetch, that a placeholder SECRET_KEY issues no session
+tokens, and that session tokens round-trip through `GET /api/auth/me`
+without a database. Sign-in runs against a throwaway SQLite database, and
+the settings it changes are restored afterwards.
+"""
+import os
+import tempfile
+import time
+
+import google.auth.crypt
+import google.auth.jwt
+import rsa
+
+AUDIENCE = "test-client-id.apps.googleusercontent.com"
+
+
+def make_key(kid):
+    public, private = rsa.newkeys(2048)
+    signer = google.auth.crypt.RSASigner.from_string(private.save_pkcs1().decode(), key_id=kid)
+    return signer, public.save_pkcs1().decode()
+
+
+def id_token(signer, **overrides):
+    now = int(time.time())
+    claims = {
+        "iss": "https://accounts.google.com",
+        "aud": AUDIENCE,
+        "sub": "1234567890",
+        "email": "reader@example.com",
+        "name": "Test Reader",
+        "iat": now,
+        "exp": now + 3600,
+        **overrides,
+    }
+    return google.auth.jwt.encode(signer, claims).decode()
+
+
+def expect_invalid(verify, token, label):
+    try:
+        verify(token)
+    except ValueError as e:
+        print(f'rejected {label}: {e}')
+        return
+    raise AssertionError(f'{label} was accepted')
+
+
+def main():
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'auth.db')}"
+    os.environ.setdefault('NEWS_API_KEY', 'unused')
+    try:
+        run()
+    finally:
+        from app.database import engine
+        engine.dispose()
+        tmp.cleanup()
+
+
+def run():
+    from fastapi.testclient import TestClient
+
+    from app.config import settings
+    from app.services import auth_service
+    from app.services.auth_service import (GoogleCertCache, GoogleTokenVerifier, InsecureSecretError, SessionTokens,
+                                           google_verifier)
+
+    signer, public_pem = make_key('key-1')
+    published = {'key-1': public_pem}
+    fetches = []
+
+    def fetch():
+        fetches.append(time.time())
+        return dict(published), 3600
+
+    verifier = GoogleTokenVerifier(GoogleCertCache(fetch=fetch))
+    started = time.perf_counter()
+    for _ in range(100):
+        claims = verifier.verify(id_token(signer), AUDIENCE)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert claims['email'] == 'reader@example.com'
+    assert len(fetches) == 1, fetches
+    print(f'100 ID tokens signed and verified in {elapsed:.1f} ms with {len(fetches)} certificate fetch')
+
+    # Google rotates keys; a new key id triggers one refetch
+    verifier.certs._fetched_at -= auth_service.MIN_REFRESH_INTERVAL
+    rotated, rotated_pem = make_key('key-2')
+    published['key-2'] = rotated_pem
+    verifier.verify(id_token(rotated), AUDIENCE)
+    assert len(fetches) == 2, fetches
+    print('rotated key accepted after one refetch')
+
+    # Unknown key ids right after a fetch do not refetch again
+    unknown, _ = make_key('key-3')
+    for _ in range(20):
+        expect_invalid(lambda t: verifier.verify(t, AUDIENCE), id_token(unknown), 'unknown key id')
+    assert len(fetches) == 2, fetches
+    print(f'20 unknown key ids within {auth_service.MIN_REFRESH_INTERVAL}s: no extra fetch')
+
+    # Garbage is rejected before the certificates are even loaded
+    cold_fetches = []
+    cold = GoogleTokenVerifier(GoogleCertCache(fetch=lambda: (cold_fetches.append(1), (dict(published), 3600))[1]))
+    expect_invalid(lambda t: cold.verify(t, AUDIENCE), 'not-a-token', 'malformed token')
+    unsigned_header = auth_service._b64encode(b'{"alg":"none","typ":"JWT"}')
+    claims_part = id_token(signer).split('.')[1]
+    expect_invalid(lambda t: cold.verify(t, AUDIENCE), f'{unsigned_header}.{claims_part}.', 'alg none')
+    assert not cold_fetches, cold_fetches
+    print('malformed tokens rejected without a certificate fetch')
+
+    expect_invalid(lambda t: verifier.verify(t, AUDIENCE), id_token(signer, aud='someone-else'), 'wrong audience')
+    expect_invalid(lambda t: verifier.verify(t, AUDIENCE), id_token(signer, iss='https://evil.example'), 'wrong issuer')
+    expect_invalid(lambda t: verifier.verify(t, AUDIENCE), id_token(signer, exp=int(time.time()) - 3600), 'expired token')
+    stranger, _ = make_key('key-1')
+    expect_invalid(lambda t: verifier.verify(t, AUDIENCE), id_token(stranger), 'foreign signature')
+
+    tokens = SessionTokens(secret='local-test-secret', expire_minutes=5)
+    token = tokens.issue(42, 'reader@example.com')
+    assert tokens.verify(token)['sub'] == '42'
+    expect_invalid(tokens.verify, token[:-2] + ('AA' if not token.endswith('AA') else 'BB'), 'tampered session token')
+    expect_invalid(SessionTokens(secret='other-secret').verify, token, 'session token from another secret')
+    expect_invalid(SessionTokens(secret='local-test-secret', expire_minutes=-1).verify,
+                   SessionTokens(secret='local-test-secret', expire_minutes=-1).issue(42, 'x@example.com'),
+                   'expired session token')
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        tokens.verify(token)
+    print(f'session token check: {(time.perf_counter() - started) * 100:.1f} us each')
+
+    for placeholder in auth_service.PLACEHOLDER_SECRETS:
+        try:
+            SessionTokens(secret=placeholder).issue(42, 'x@example.com')
+        except InsecureSecretError:
+            continue
+        raise AssertionError(f'session token issued with placeholder secret {placeholder!r}')
+    print('placeholder SECRET_KEY issues no session tokens')
+
+    # Sign in through the API with the local key, then use the session token
+    from app.api.routes import auth
+    from app.main import app
+    saved = (settings.GOOGLE_CLIENT_ID, google_verifier.certs, auth.session_tokens)
+    google_verifier.certs = GoogleCertCache(fetch=fetch)
+    settings.GOOGLE_CLIENT_ID = AUDIENCE
+    auth.session_tokens = SessionTokens(secret='local-test-secret')
+    try:
+        with TestClient(app) as client:
+            resp = client.post('/api/auth/google', json={'id_token': id_token(signer)})
+            assert resp.status_code == 200, resp.text
+            signed_in = resp.json()
+            print('POST /api/auth/google ->', {k: signed_in[k] for k in ('id', 'email', 'token_type', 'expires_in')})
+            resp = client.get('/api/auth/me', headers={'Authorization': f"Bearer {signed_in['access_token']}"})
+            assert resp.status_code == 200 and resp.json()['id'] == signed_in['id'], resp.text
+            print('GET /api/auth/me ->', resp.json())
+            assert client.get('/api/auth/me').status_code == 401
+            print('GET /api/auth/me without a token -> 401')
+
+            auth.session_tokens = SessionTokens(secret=next(iter(auth_service.PLACEHOLDER_SECRETS)))
+            resp = client.post('/api/auth/google', json={'id_token': id_token(signer)})
+            assert resp.status_code == 503, resp.text
+            print('POST /api/auth/google with a placeholder SECRET_KEY ->', resp.status_code, resp.json())
+    finally:
+        settings.GOOGLE_CLIENT_ID, google_verifier.certs, auth.session_tokens = saved
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Multi-process check for scheduler topic sharding.
+
+Starts several worker processes against a throwaway SQLite database. Each
+worker behaves like one uvicorn worker's scheduler firing the same run: it
+walks all topics and claims them before "sending". The script verifies that
+every topic was handled exactly once across all workers.
+
+Run from the backend directory:
+
+    python -m app.scripts.test_scheduler_sharding [workers] [topics]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+def _worker(topic_ids, key, results):
+    from app.services.coordination_service import SchedulerCoordinator
+
+    coordinator = SchedulerCoordinator()
+    claimed = []
+    for tid in coordinator.rotate(topic_ids):
+        if coordinator.claim_topic(key, tid):
+            claimed.append(tid)
+            time.sleep(0.01)  # simulate sending
+    results.put((coordinator.owner, claimed))
+
+
+def main(workers: int = 4, topics: int = 50):
+    db_path = os.path.join(tempfile.mkdtemp(), 'sharding.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ.setdefault('NEWS_API_KEY', 'unused')
+
+    from app.database import Base, engine
+    from app.models.scheduler_claim import SchedulerClaim  # noqa: F401
+    from app.services.coordination_service import run_key
+
+    Base.metadata.create_all(bind=engine)
+
+    topic_ids = list(range(1, topics + 1))
+    key = run_key('daily_send', datetime.now(timezone.utc))
+    # spawn gives each worker its own interpreter, engine and connections,
+    # like separate uvicorn workers
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(topic_ids, key, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    handled = [results.get(timeout=60) for _ in procs]
+    for p in procs:
+        p.join()
+
+    all_claimed = []
+    for owner, claimed in handled:
+        print(f"{owner}: {len(claimed)} topics")
+        all_claimed.extend(claimed)
+
+    assert sorted(all_claimed) == topic_ids, "every topic must be handled exactly once"
+    print(f"OK: {topics} topics sharded across {workers} workers without duplicates")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
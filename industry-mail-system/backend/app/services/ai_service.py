@@ -3,13 +3,53 @@ AI Service: lightweight summarization with optional external LLM integration.
 
 Behavior:
 - If `GEMINI_API_KEY` (or `GEMINI_API_KEY`) is configured, the service will attempt to call an external LLM.
-- On failure or when no key is present, it falls back to a safe, local extractive summarizer.
+- On failure or when no key is present, it falls back to each description's first sentence.
+- With `SUMMARIZER=extractive` the batch TF-IDF/TextRank summarizer is used as
+  the primary path and for the fallbacks (no network, milliseconds per digest).
 """
 import re
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, AsyncIterator, Optional, Tuple
 import asyncio
 import httpx
 from app.config import settings
+from app.services.article import Article
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.deadline import Deadline, timeout_for
+from app.services.extractive_summarizer import summarize_batch
+from app.services.latency_stats import LLM, upstream_latency
+
+# Concurrent LLM calls when streaming summaries
+STREAM_CONCURRENCY = 5
+# Upper bound for one LLM call
+LLM_TIMEOUT = 15.0
+
+
+# Gemini/Generative Language endpoints to try, in order; the first one that
+# answers is remembered for the life of the process
+GEMINI_MODEL = 'text-bison-001'
+GEMINI_ENDPOINTS = [
+    f"https://generativelanguage.googleapis.com/v1/models/{GEMINI_MODEL}:generate",
+    f"https://generativelanguage.googleapis.com/v1beta2/models/{GEMINI_MODEL}:generate",
+    f"https://generativeai.googleapis.com/v1/models/{GEMINI_MODEL}:generate",
+    f"https://generativeai.googleapis.com/v1beta2/models/{GEMINI_MODEL}:generate",
+]
+_gemini_endpoint: Optional[str] = None
+
+# One breaker per provider, shared by every AIService in the process
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def provider_breaker(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            provider,
+            failure_threshold=settings.AI_CIRCUIT_FAILURES,
+            cooldown_seconds=settings.AI_CIRCUIT_COOLDOWN_SECONDS,
+        )
+        _breakers[provider] = breaker
+    return breaker
 
 
 class AIService:
@@ -19,111 +59,206 @@ class AIService:
         # Track which provider we're going to call for clearer logs
         self.provider = 'openai' if getattr(settings, 'OPENAI_API_KEY', '') else ('gemini' if getattr(settings, 'GEMINI_API_KEY', '') else None)
 
-    async def summarize_articles(self, articles: List[Dict[str, Any]], max_length: int = 200) -> List[Dict[str, Any]]:
+    def _llm_available(self) -> bool:
+        """An LLM is configured, selected and its circuit is not open"""
+        return bool(self.api_key) and settings.SUMMARIZER != 'extractive' and not provider_breaker(self.provider).is_open()
+
+    async def _call_gemini(self, client: httpx.AsyncClient, prompt: str) -> str:
+        global _gemini_endpoint
+        payload = {
+            'prompt': {'text': prompt},
+            'maxOutputTokens': 60,
+            'temperature': 0.2
+        }
+
+        # Try the remembered endpoint first, then discover one
+        endpoints = GEMINI_ENDPOINTS
+        if _gemini_endpoint:
+            endpoints = [_gemini_endpoint] + [e for e in GEMINI_ENDPOINTS if e != _gemini_endpoint]
+
+        last_error: Optional[Exception] = None
+        for endpoint in endpoints:
+            try:
+                resp = await client.post(endpoint, params={'key': self.api_key}, json=payload)
+                if resp.status_code == 404:
+                    # try next endpoint
+                    if endpoint == _gemini_endpoint:
+                        _gemini_endpoint = None
+                    continue
+                resp.raise_for_status()
+                data = resp.json()
+            except Exception as e:
+                # A known-good endpoint failing means the provider is down, not misrouted
+                if endpoint == _gemini_endpoint:
+                    raise
+                last_error = e
+                continue
+
+            if _gemini_endpoint != endpoint:
+                print(f"AI provider (gemini): using endpoint {endpoint}")
+                _gemini_endpoint = endpoint
+            # parse possible response shapes
+            if isinstance(data.get('candidates'), list) and data['candidates']:
+                cand = data['candidates'][0]
+                return cand.get('output') or cand.get('content') or cand.get('text') or ''
+            if isinstance(data.get('choices'), list) and data['choices']:
+                return data['choices'][0].get('text') or data['choices'][0].get('message', {}).get('content', '')
+            # try common fields
+            return data.get('output') or data.get('content') or ''
+
+        raise last_error or RuntimeError('No Gemini endpoint available (all returned 404)')
+
+    async def _call_provider(self, client: httpx.AsyncClient, a: Article) -> str:
+        """Ask the configured provider for a summary; raises on failure"""
+        prompt = (
+            "Summarize the following news article in one short sentence (no more than 30 words):\n"
+            f"Title: {a.title or ''}\nDescription: {a.description or ''}\n\nSummary:"
+        )
+
+        if self.provider == 'openai':
+            headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+            payload = {
+                'model': 'gpt-4o-mini',
+                'prompt': prompt,
+                'max_tokens': 60,
+                'temperature': 0.2
+            }
+            resp = await client.post('https://api.openai.com/v1/completions', json=payload, headers=headers)
+            resp.raise_for_status()
+            data = resp.json()
+            if isinstance(data.get('choices'), list) and data['choices']:
+                return data['choices'][0].get('text') or data['choices'][0].get('message', {}).get('content', '')
+            return ''
+
+        if self.provider == 'gemini':
+            return await self._call_gemini(client, prompt)
+
+        # Unknown provider, fall back
+        raise RuntimeError('No AI provider configured')
+
+    async def _summarize_one(self, client: httpx.AsyncClient, a: Article, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """
+        LLM summary for one article, or None when the provider is unavailable
+
+        Failures feed the provider's circuit breaker; while it is open no call
+        is made and callers use the local summarizer instead. The same
+        happens once `deadline` has run out.
+        """
+        if deadline is not None and deadline.expired:
+            return None
+        breaker = provider_breaker(self.provider)
+        if not breaker.allow():
+            return None
+        timeout = timeout_for(deadline, LLM_TIMEOUT)
+        started = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(self._call_provider(client, a), timeout)
+        except asyncio.TimeoutError:
+            # Cut short by the run deadline rather than a slow provider: not the provider's fault
+            if timeout >= LLM_TIMEOUT:
+                breaker.record_failure()
+            print(f"AI provider ({self.provider}) timed out after {timeout:.1f}s for article '{(a.title or '')[:60]}'")
+            return None
+        except Exception as e:
+            breaker.record_failure()
+            print(f"AI provider ({self.provider}) call failed for article '{(a.title or '')[:60]}': {e}")
+            return None
+        breaker.record_success()
+        upstream_latency.record(LLM, time.perf_counter() - started)
+        return text.strip() or None
+
+    async def summarize_articles(self, articles: List[Article], max_length: int = 200, mode: str = None,
+                                 deadline: Optional[Deadline] = None) -> List[Article]:
+        """
+        Args:
+            mode: "llm" or "extractive"; defaults to the SUMMARIZER setting
+            deadline: Time budget for LLM calls; articles not summarized in
+                time get local summaries
+        """
         if not articles:
             return articles
 
-        # If no API key available, use local fallback
-        if not self.api_key:
-            return [self._fallback_summary(a, max_length) for a in articles]
+        if mode == 'extractive':
+            return self.extractive_summaries(articles, max_length)
+        # Local summaries: no API key, SUMMARIZER=extractive, or provider circuit open
+        if (mode != 'llm' and not self._llm_available()) or not self.api_key:
+            return self.fallback_summaries(articles, max_length)
 
         # Try to call provider per-article (keeps it simple and robust)
         try:
-            summarized = []
-            async with httpx.AsyncClient(timeout=15.0) as client:
+            summaries: List[Optional[str]] = []
+            async with httpx.AsyncClient(timeout=LLM_TIMEOUT) as client:
                 for a in articles:
-                    prompt = (
-                        "Summarize the following news article in one short sentence (no more than 30 words):\n"
-                        f"Title: {a.get('title','')}\nDescription: {a.get('description','')}\n\nSummary:"
-                    )
-
-                    headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
-
-                    # Choose provider-specific endpoint and payload
-                    try:
-                        if self.provider == 'openai':
-                            payload = {
-                                'model': 'gpt-4o-mini',
-                                'prompt': prompt,
-                                'max_tokens': 60,
-                                'temperature': 0.2
-                            }
-                            endpoint = 'https://api.openai.com/v1/completions'
-                            resp = await client.post(endpoint, json=payload, headers=headers)
-                            resp.raise_for_status()
-                            data = resp.json()
-                            text = ''
-                            if isinstance(data.get('choices'), list) and data['choices']:
-                                text = data['choices'][0].get('text') or data['choices'][0].get('message', {}).get('content', '')
-
-                        elif self.provider == 'gemini':
-                            # Use Google Generative Language (Gemini) via API key query param
-                            model = 'text-bison-001'
-                            payload = {
-                                'prompt': {'text': prompt},
-                                'maxOutputTokens': 60,
-                                'temperature': 0.2
-                            }
-
-                            # Try a list of possible Gemini/Generative Language endpoints
-                            endpoints = [
-                                f"https://generativelanguage.googleapis.com/v1/models/{model}:generate?key={self.api_key}",
-                                f"https://generativelanguage.googleapis.com/v1beta2/models/{model}:generate?key={self.api_key}",
-                                f"https://generativeai.googleapis.com/v1/models/{model}:generate?key={self.api_key}",
-                                f"https://generativeai.googleapis.com/v1beta2/models/{model}:generate?key={self.api_key}",
-                            ]
-
-                            data = None
-                            text = ''
-                            for endpoint in endpoints:
-                                try:
-                                    resp = await client.post(endpoint, json=payload)
-                                    if resp.status_code == 404:
-                                        # try next endpoint
-                                        continue
-                                    resp.raise_for_status()
-                                    data = resp.json()
-                                    # parse possible response shapes
-                                    if isinstance(data.get('candidates'), list) and data['candidates']:
-                                        cand = data['candidates'][0]
-                                        text = cand.get('output') or cand.get('content') or cand.get('text') or ''
-                                    elif isinstance(data.get('choices'), list) and data['choices']:
-                                        text = data['choices'][0].get('text') or data['choices'][0].get('message', {}).get('content', '')
-                                    else:
-                                        # try common fields
-                                        text = data.get('output') or data.get('content') or ''
-                                    if text:
-                                        break
-                                except Exception:
-                                    # try next endpoint
-                                    continue
-
-                        else:
-                            # Unknown provider, fall back
-                            raise RuntimeError('No AI provider configured')
-
-                        summary = text.strip() if text else self._fallback_summary(a, max_length)['summary']
-                    except Exception as e:
-                        print(f"AI provider ({self.provider}) call failed for article '{a.get('title','')[:60]}': {e}")
-                        summary = self._fallback_summary(a, max_length)['summary']
-
-                    summarized.append({**a, 'summary': summary})
-
-            return summarized
+                    summaries.append(await self._summarize_one(client, a, deadline))
         except Exception as e:
             print(f"AI summarization overall failed: {e}")
+            return self.fallback_summaries(articles, max_length)
+
+        # Articles the LLM could not summarize get local summaries
+        missing = [idx for idx, summary in enumerate(summaries) if summary is None]
+        if missing:
+            local = self.fallback_summaries([articles[idx] for idx in missing], max_length)
+            for idx, article in zip(missing, local):
+                summaries[idx] = article.summary
+        return [a.with_summary(summary) for a, summary in zip(articles, summaries)]
+
+    async def iter_summaries(self, articles: List[Article], max_length: int = 200) -> AsyncIterator[Tuple[int, str]]:
+        """
+        Yield (index, summary) pairs from the LLM as each one completes
+
+        Calls run concurrently, so callers can show fallback summaries right
+        away and replace them as results arrive. Yields nothing when no
+        provider is configured or its circuit is open.
+        """
+        if not articles or not self._llm_available():
+            return
+
+        semaphore = asyncio.Semaphore(STREAM_CONCURRENCY)
+        async with httpx.AsyncClient(timeout=LLM_TIMEOUT) as client:
+            async def run(idx: int, a: Article) -> Tuple[int, Optional[str]]:
+                async with semaphore:
+                    return idx, await self._summarize_one(client, a)
+
+            tasks = [asyncio.create_task(run(idx, a)) for idx, a in enumerate(articles)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    idx, summary = await next_done
+                    if summary is not None:
+                        yield idx, summary
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def extractive_summaries(self, articles: List[Article], max_length: int = 200) -> List[Article]:
+        """Summarize all articles at once with the local TF-IDF/TextRank scorer"""
+        try:
+            summaries = summarize_batch(articles, max_length)
+        except Exception as e:
+            print(f"Extractive summarization failed: {e}")
             return [self._fallback_summary(a, max_length) for a in articles]
+        return [a.with_summary(summary) for a, summary in zip(articles, summaries)]
+
+    def fallback_summaries(self, articles: List[Article], max_length: int = 200) -> List[Article]:
+        """
+        Local summaries for all articles, with no network calls
+
+        The first sentence of each description, which in news copy is
+        usually the lead; TextRank only with SUMMARIZER=extractive.
+        """
+        if settings.SUMMARIZER == 'extractive':
+            return self.extractive_summaries(articles, max_length)
+        return [self._fallback_summary(a, max_length) for a in articles]
 
-    def _fallback_summary(self, article: Dict[str, Any], max_length: int = 200) -> Dict[str, Any]:
+    def _fallback_summary(self, article: Article, max_length: int = 200) -> Article:
         # Extract first sentence from description or use title as fallback
-        desc = (article.get('description') or '')
+        desc = (article.description or '')
         if desc:
             parts = re.split(r'(?<=[.!?])\s+', desc.strip())
             summary = parts[0] if parts and parts[0] else desc
         else:
-            summary = article.get('title', '')
+            summary = article.title or ''
 
         if len(summary) > max_length:
             summary = summary[:max_length].rsplit(' ', 1)[0] + '...'
 
-        return {**article, 'summary': summary}
+        return article.with_summary(summary)
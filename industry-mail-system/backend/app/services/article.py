@@ -0,0 +1,71 @@
+"""
+Article: the news item passed from NewsService through AIService to EmailService
+
+Slotted and immutable, so one instance can be shared by reference between
+the article cache, every digest that includes it and worker processes,
+without anyone having to copy it defensively. Attaching a summary makes a
+new instance that reuses the original field values rather than copying a
+whole dict. Source names are interned because a handful of outlets cover
+most articles.
+"""
+import sys
+from typing import Any, Dict, Optional
+
+FIELDS = ('title', 'description', 'url', 'source', 'published_at', 'image_url', 'summary')
+
+
+class Article:
+    __slots__ = FIELDS
+
+    def __init__(self, title: str, description: Optional[str], url: str, source: str,
+                 published_at: str, image_url: Optional[str] = None, summary: Optional[str] = None):
+        init = object.__setattr__
+        init(self, 'title', title)
+        init(self, 'description', description)
+        init(self, 'url', url)
+        init(self, 'source', sys.intern(source) if isinstance(source, str) else source)
+        init(self, 'published_at', published_at)
+        init(self, 'image_url', image_url)
+        init(self, 'summary', summary)
+
+    @classmethod
+    def from_newsapi(cls, raw: Dict[str, Any]) -> "Article":
+        """Build from one entry of a NewsAPI `articles` list"""
+        return cls(
+            raw.get("title", ""),
+            raw.get("description", ""),
+            raw.get("url", ""),
+            (raw.get("source") or {}).get("name", "Unknown"),
+            raw.get("publishedAt", ""),
+            raw.get("urlToImage"),
+        )
+
+    def with_summary(self, summary: str) -> "Article":
+        """The same article with `summary` attached; other fields are shared, not copied"""
+        return Article(self.title, self.description, self.url, self.source,
+                       self.published_at, self.image_url, summary)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready representation for API responses"""
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Article is immutable; use with_summary()")
+
+    def __delattr__(self, name):
+        raise AttributeError("Article is immutable")
+
+    def __reduce__(self):
+        # Campaign workers receive articles by pickle; the default protocol would call __setattr__
+        return (Article, tuple(getattr(self, name) for name in FIELDS))
+
+    def __eq__(self, other):
+        if not isinstance(other, Article):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in FIELDS)
+
+    def __hash__(self):
+        return hash((self.url, self.title, self.summary))
+
+    def __repr__(self):
+        return f"Article(title={self.title!r}, source={self.source!r}, url={self.url!r})"
@@ -0,0 +1,212 @@
+"""
+Article store: local full-text search over articles already pulled from NewsAPI
+
+Every article NewsAPI returns is stored, and each fetch records which query
+and publication window it covered. A search whose window is covered by
+fetches of the same query, the latest no older than
+NEWS_STORE_FRESHNESS_SECONDS, is answered locally in milliseconds. Otherwise
+NewsAPI is asked only for the gap, from the end of local coverage up to now.
+
+SQLite searches through the FTS5 index on titles and descriptions, ranked by
+bm25. Other databases (or SQLite builds without FTS5) fall back to LIKE
+matching, newest first.
+
+Coverage follows NewsAPI's answer: a covered window holds the articles
+NewsAPI returned for the query, fetched STORE_PAGE_SIZE at a time. It is not
+every article ever published. Local ranking can also differ from NewsAPI's
+relevancy order.
+"""
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional, Sequence
+from sqlalchemy import DateTime, and_, bindparam, or_, text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.stored_article import FTS_TABLE, SearchCoverage, StoredArticle
+from app.services.article import Article
+
+# Articles requested per NewsAPI call when filling gaps; quota counts requests, not articles
+STORE_PAGE_SIZE = 100
+# NewsAPI searches at most a month back, so older articles and coverage are dropped
+RETENTION = timedelta(days=31)
+PRUNE_INTERVAL = 3600
+# Coverage that starts this little after the requested window still counts
+COVERAGE_SLACK = timedelta(minutes=5)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_OPERATORS = {"AND", "OR", "NOT"}
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def query_terms(parts: Sequence[str]) -> List[List[str]]:
+    """Keyword groups -> word lists; a group matches when all of its words do"""
+    groups = []
+    for part in parts:
+        words = [w for w in _WORD.findall(part) if w not in _OPERATORS]
+        if words:
+            groups.append(words)
+    return groups
+
+
+def _fts_query(groups: List[List[str]]) -> str:
+    """FTS5 MATCH expression: any group, all words within a group"""
+    return " OR ".join("(" + " ".join('"' + w.replace('"', '""') + '"' for w in words) + ")" for words in groups)
+
+
+def _parse_published(value: Optional[str], default: datetime) -> datetime:
+    """NewsAPI timestamps ("2024-05-01T10:00:00Z") -> naive UTC"""
+    if not value:
+        return default
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return default
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _to_article(row: StoredArticle) -> Article:
+    return Article(row.title, row.description, row.url, row.source,
+                   row.published_at.strftime("%Y-%m-%dT%H:%M:%SZ"), row.image_url, row.summary)
+
+
+class ArticleStore:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._has_fts: Optional[bool] = None
+        self._pruned_at = 0.0
+
+    def _fts(self, db: Session) -> bool:
+        if self._has_fts is None:
+            self._has_fts = db.get_bind().dialect.name == "sqlite" and db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+            ).first() is not None
+        return self._has_fts
+
+    def coverage_gap(self, query: str, since: datetime, now: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Start of the window NewsAPI still has to be asked for, or None when
+        local coverage of [since, now] is complete
+        """
+        now = now or utcnow()
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(SearchCoverage.covered_from, SearchCoverage.covered_to)
+                .filter(SearchCoverage.query == query, SearchCoverage.covered_to >= since)
+                .order_by(SearchCoverage.covered_from)
+                .all()
+            )
+        finally:
+            db.close()
+        cursor = since
+        for covered_from, covered_to in rows:
+            if covered_from > cursor + COVERAGE_SLACK:
+                break
+            cursor = max(cursor, covered_to)
+        if cursor >= now - timedelta(seconds=settings.NEWS_STORE_FRESHNESS_SECONDS):
+            return None
+        return cursor
+
+    def search(self, parts: Sequence[str], since: datetime, limit: int) -> List[Article]:
+        """Best local matches for any of the keyword `parts` published since `since`"""
+        groups = query_terms(parts)
+        if not groups:
+            return []
+        db = self.session_factory()
+        try:
+            if self._fts(db):
+                rows = db.execute(
+                    text(
+                        f"SELECT a.id FROM {FTS_TABLE} f JOIN articles a ON a.id = f.rowid "
+                        f"WHERE {FTS_TABLE} MATCH :match AND a.published_at >= :since "
+                        f"ORDER BY bm25({FTS_TABLE}) LIMIT :limit"
+                    ).bindparams(bindparam("since", type_=DateTime)),
+                    {"match": _fts_query(groups), "since": since, "limit": limit},
+                ).all()
+                ids = [row[0] for row in rows]
+                by_id = {a.id: a for a in db.query(StoredArticle).filter(StoredArticle.id.in_(ids))}
+                return [_to_article(by_id[i]) for i in ids if i in by_id]
+
+            def word(w):
+                return or_(StoredArticle.title.ilike(f"%{w}%"), StoredArticle.description.ilike(f"%{w}%"))
+
+            rows = (
+                db.query(StoredArticle)
+                .filter(StoredArticle.published_at >= since,
+                        or_(*[and_(*[word(w) for w in words]) for words in groups]))
+                .order_by(StoredArticle.published_at.desc())
+                .limit(limit)
+                .all()
+            )
+            return [_to_article(row) for row in rows]
+        finally:
+            db.close()
+
+    def add(self, query: str, articles: Iterable[Article], covered_from: Optional[datetime], covered_to: datetime):
+        """
+        Store fetched articles and record that `query` is covered for the
+        window; without `covered_from` the articles are kept but no coverage
+        is recorded
+        """
+        now = utcnow()
+        articles = [a for a in articles if a.url]
+        db = self.session_factory()
+        try:
+            existing = {
+                url for (url,) in db.query(StoredArticle.url).filter(StoredArticle.url.in_([a.url for a in articles]))
+            } if articles else set()
+            for a in articles:
+                if a.url in existing:
+                    continue
+                existing.add(a.url)
+                db.add(StoredArticle(
+                    url=a.url, title=a.title, description=a.description, source=a.source,
+                    published_at=_parse_published(a.published_at, now), image_url=a.image_url,
+                    summary=a.summary, fetched_at=now,
+                ))
+            if covered_from is not None:
+                db.add(SearchCoverage(query=query, covered_from=covered_from, covered_to=covered_to))
+            db.commit()
+            self._prune(db, now)
+        except Exception as e:
+            db.rollback()
+            print(f"Article store: failed to store articles for q={query}: {e}")
+        finally:
+            db.close()
+
+    def save_summaries(self, articles: Iterable[Article]):
+        """Keep summaries made for stored articles so later searches reuse them"""
+        summaries = {a.url: a.summary for a in articles if a.summary}
+        if not summaries:
+            return
+        db = self.session_factory()
+        try:
+            for row in db.query(StoredArticle).filter(
+                StoredArticle.url.in_(list(summaries)), StoredArticle.summary.is_(None)
+            ):
+                row.summary = summaries[row.url]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Article store: failed to save summaries: {e}")
+        finally:
+            db.close()
+
+    def _prune(self, db: Session, now: datetime):
+        if time.time() - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = time.time()
+        cutoff = now - RETENTION
+        db.query(StoredArticle).filter(StoredArticle.published_at < cutoff).delete(synchronize_session=False)
+        db.query(SearchCoverage).filter(SearchCoverage.covered_to < cutoff).delete(synchronize_session=False)
+        db.commit()
+
+
+article_store = ArticleStore()
@@ -0,0 +1,209 @@
+"""
+Authentication: Google ID token verification and our own session tokens
+
+Google signs ID tokens with keys it rotates every few days and publishes
+as certificates at GOOGLE_CERTS_URL, with a Cache-Control max-age. The
+certificates are fetched through one pooled HTTP session (`http_session`,
+also used for the OAuth code exchange) and kept until that max-age runs
+out. A token signed with an unknown key id refetches them once, in case
+Google rotated early; such refetches happen at most every
+MIN_REFRESH_INTERVAL seconds, so garbage key ids cannot hammer Google.
+The token header is checked before any certificates are fetched.
+
+After sign-in the API issues its own session token: a JWT signed with
+SECRET_KEY (ALGORITHM, HS256 by default) that carries the user's id and
+email and expires after ACCESS_TOKEN_EXPIRE_MINUTES. Later requests send
+it as `Authorization: Bearer <token>`, and it is checked with the secret
+alone, without calling Google or reading the database. While SECRET_KEY
+is still a placeholder from the sample config, anyone could forge such a
+token, so none are issued or accepted.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from app.config import settings
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Used when Google's response carries no max-age
+DEFAULT_CERTS_TTL = 3600
+# Upper bound for fetching certificates
+CERTS_TIMEOUT = 10.0
+# Tolerated clock difference when checking `iat`/`exp`
+CLOCK_SKEW_SECONDS = 10
+# Refetches forced by an unknown key id happen at most this often
+MIN_REFRESH_INTERVAL = 60
+# Google signs ID tokens with RSA keys only
+GOOGLE_ALGORITHMS = ("RS256",)
+# SECRET_KEY values shipped in config.py and .env.example; they are public
+PLACEHOLDER_SECRETS = {
+    "your-secret-key-change-this-in-production",
+    "your-super-secret-key-change-this-in-production",
+}
+
+_HMAC_ALGORITHMS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class InsecureSecretError(RuntimeError):
+    """Raised when session tokens would be signed with a missing or placeholder SECRET_KEY"""
+
+
+def http_session():
+    """Process-wide `requests.Session`, so calls to Google reuse connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is imported on first use to keep app startup fast
+            import requests
+            _session = requests.Session()
+        return _session
+
+
+def _max_age(cache_control: str) -> Optional[int]:
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() == "max-age" and value.isdigit():
+            return int(value)
+    return None
+
+
+class GoogleCertCache:
+    """Google's signing certificates, refetched when their max-age runs out"""
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL,
+                 fetch: Optional[Callable[[], Tuple[Dict[str, str], Optional[int]]]] = None):
+        self.url = url
+        self._fetch = fetch or self._fetch_http
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch_http(self) -> Tuple[Dict[str, str], Optional[int]]:
+        resp = http_session().get(self.url, timeout=CERTS_TIMEOUT)
+        resp.raise_for_status()
+        return resp.json(), _max_age(resp.headers.get("Cache-Control", ""))
+
+    def get(self, refresh: bool = False) -> Dict[str, str]:
+        """
+        Current certificates by key id
+
+        `refresh` asks for a refetch before the max-age runs out; it is
+        ignored if the last fetch was less than MIN_REFRESH_INTERVAL ago.
+        """
+        with self._lock:
+            now = time.time()
+            if refresh and now - self._fetched_at < MIN_REFRESH_INTERVAL:
+                refresh = False
+            if refresh or not self._certs or now >= self._expires_at:
+                certs, max_age = self._fetch()
+                self._certs = certs
+                self._fetched_at = time.time()
+                self._expires_at = self._fetched_at + (DEFAULT_CERTS_TTL if max_age is None else max_age)
+            return self._certs
+
+
+class GoogleTokenVerifier:
+    def __init__(self, certs: Optional[GoogleCertCache] = None):
+        self.certs = certs or GoogleCertCache()
+
+    def verify(self, token: str, audience: Optional[str] = None) -> Mapping[str, Any]:
+        """
+        Claims of a valid Google ID token
+
+        Raises:
+            ValueError: bad signature, expired, wrong audience or issuer
+        """
+        # google-auth is imported on first use to keep app startup fast
+        import google.auth.jwt
+
+        # Rejected before touching the certificates, so junk costs no fetch
+        try:
+            header = google.auth.jwt.decode_header(token)
+        except Exception as e:
+            raise ValueError(f"Malformed ID token: {e}")
+        if not isinstance(header, dict) or header.get("alg") not in GOOGLE_ALGORITHMS:
+            raise ValueError("Unexpected ID token algorithm")
+        if not isinstance(header.get("kid"), str) or not header["kid"]:
+            raise ValueError("ID token has no key id")
+
+        certs = self.certs.get()
+        if header["kid"] not in certs:
+            # Google may have rotated its keys before our copy expired
+            certs = self.certs.get(refresh=True)
+        claims = google.auth.jwt.decode(token, certs=certs, audience=audience,
+                                        clock_skew_in_seconds=CLOCK_SKEW_SECONDS)
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+        return claims
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SessionTokens:
+    """HMAC-signed JWTs identifying a signed-in user"""
+
+    def __init__(self, secret: Optional[str] = None, algorithm: Optional[str] = None,
+                 expire_minutes: Optional[int] = None):
+        secret = secret or settings.SECRET_KEY
+        self.configured = bool(secret) and secret not in PLACEHOLDER_SECRETS
+        self.secret = (secret or "").encode()
+        self.algorithm = algorithm or settings.ALGORITHM
+        if self.algorithm not in _HMAC_ALGORITHMS:
+            raise ValueError(f"Unsupported ALGORITHM {self.algorithm}; use one of {', '.join(_HMAC_ALGORITHMS)}")
+        self.expire_seconds = 60 * (settings.ACCESS_TOKEN_EXPIRE_MINUTES if expire_minutes is None else expire_minutes)
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        if not self.configured:
+            raise InsecureSecretError("SECRET_KEY is unset or a sample value; set a random secret to enable sign-in")
+        return hmac.new(self.secret, signing_input, _HMAC_ALGORITHMS[self.algorithm]).digest()
+
+    def issue(self, user_id: int, email: str) -> str:
+        now = int(time.time())
+        header = {"alg": self.algorithm, "typ": "JWT"}
+        claims = {"sub": str(user_id), "email": email, "iat": now, "exp": now + self.expire_seconds}
+        signing_input = ".".join(
+            _b64encode(json.dumps(part, separators=(",", ":")).encode()) for part in (header, claims)
+        )
+        return f"{signing_input}.{_b64encode(self._sign(signing_input.encode()))}"
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Claims of a token this API issued
+
+        Raises:
+            ValueError: malformed, bad signature or expired
+            InsecureSecretError: SECRET_KEY is a placeholder
+        """
+        try:
+            header_b64, claims_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64decode(header_b64))
+            signature = _b64decode(signature_b64)
+        except Exception:
+            raise ValueError("Malformed session token")
+        # The algorithm is ours to choose, never the token's
+        if header.get("alg") != self.algorithm:
+            raise ValueError("Unexpected token algorithm")
+        if not hmac.compare_digest(signature, self._sign(f"{header_b64}.{claims_b64}".encode())):
+            raise ValueError("Bad token signature")
+        claims = json.loads(_b64decode(claims_b64))
+        if time.time() > claims.get("exp", 0) + CLOCK_SKEW_SECONDS:
+            raise ValueError("Session token expired")
+        return claims
+
+
+google_verifier = GoogleTokenVerifier()
+session_tokens = SessionTokens()
@@ -0,0 +1,149 @@
+"""
+Campaign Service: send one topic's newsletter from a pool of processes
+
+Rendering and MIME encoding are CPU work serialized under the GIL, so large
+campaigns are split across processes. Subscribers are partitioned by
+`Subscription.id % shards`; each worker opens its own DB session and SMTP
+connection, sends its partition and reports progress back to the parent
+through a queue.
+"""
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+from app.services.article import Article
+
+# Recipients per progress event sent back to the parent
+PROGRESS_BATCH = 50
+
+
+def _send_partition(
+    topic_id: int,
+    topic_name: str,
+    articles: List[Article],
+    shard: int,
+    shards: int,
+    progress_queue,
+    run_at: float,
+) -> Dict[str, Any]:
+    """
+    Worker entry point: send to every subscriber in one partition
+
+    Each batch is stamped as sent (with the campaign's start, `run_at`) as
+    soon as it goes out, so a worker killed mid-partition leaves only its
+    unsent subscribers due for a re-run.
+    """
+    # Imported here so each spawned process builds its own engine and session
+    from app.database import SessionLocal
+    from app.services.delivery_service import mark_sent, newsletter_recipients
+    from app.services.email_service import EmailService
+    from app.services.outbox_service import outbox
+
+    started = time.time()
+    db = SessionLocal()
+    try:
+        rows = [(sub_id, email) for sub_id, email, _ in newsletter_recipients(db, topic_id, (shard, shards))]
+    finally:
+        db.close()
+
+    email_service = EmailService()
+    prepared = email_service.prepare_newsletter(topic_name, articles)
+
+    failures: Dict[str, str] = {}
+    sent_ids: List[int] = []
+    # One SMTP connection for the whole partition; re-opened only if the server drops it
+    with email_service.connection() as connection:
+        for start in range(0, len(rows), PROGRESS_BATCH):
+            batch = rows[start:start + PROGRESS_BATCH]
+            batch_failures = email_service.send_prepared_batch([email for _, email in batch], prepared,
+                                                               connection=connection)
+            failures.update(batch_failures)
+            batch_sent = [sub_id for sub_id, email in batch if email not in batch_failures]
+            mark_sent(batch_sent, datetime.fromtimestamp(run_at))
+            sent_ids.extend(batch_sent)
+            # Transient failures are re-sent from the outbox once their backoff has passed
+            outbox.enqueue_retries(
+                [(email, prepared, [sub_id]) for sub_id, email in batch if email in batch_failures], run_at
+            )
+            progress_queue.put((shard, len(batch) - len(batch_failures), len(batch_failures)))
+
+    return {
+        "shard": shard,
+        "total": len(rows),
+        "sent": len(sent_ids),
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": round(time.time() - started, 3),
+    }
+
+
+class CampaignRunner:
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or multiprocessing.cpu_count()
+
+    def run(
+        self,
+        topic_id: int,
+        topic_name: str,
+        articles: List[Article],
+        on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send a topic's newsletter to all of its subscribers using a process pool
+
+        Args:
+            topic_id: Topic whose subscribers receive the campaign
+            topic_name: Display name used in the subject and heading
+            articles: Already fetched and summarized articles
+            on_progress: Called in the parent with running sent/failed totals
+
+        Returns:
+            Aggregated totals plus per-shard results and failed addresses
+        """
+        started = time.time()
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Manager() as manager:
+            progress_queue = manager.Queue()
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx) as pool:
+                futures = [
+                    pool.submit(_send_partition, topic_id, topic_name, articles, shard, self.workers, progress_queue,
+                                started)
+                    for shard in range(self.workers)
+                ]
+
+                totals = {"sent": 0, "failed": 0}
+                while not all(f.done() for f in futures) or not progress_queue.empty():
+                    try:
+                        _, sent, failed = progress_queue.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+                    totals["sent"] += sent
+                    totals["failed"] += failed
+                    if on_progress:
+                        on_progress(dict(totals))
+
+                shard_results = []
+                for f in futures:
+                    try:
+                        shard_results.append(f.result())
+                    except Exception as e:
+                        print(f"Campaign: worker failed for topic {topic_name}: {e}")
+                        shard_results.append({"error": str(e), "total": 0, "sent": 0, "failed": 0, "failures": {}})
+
+        failures: Dict[str, str] = {}
+        for result in shard_results:
+            failures.update(result.get("failures", {}))
+
+        return {
+            "topic_id": topic_id,
+            "workers": self.workers,
+            "total": sum(r["total"] for r in shard_results),
+            "sent": sum(r["sent"] for r in shard_results),
+            "failed": sum(r["failed"] for r in shard_results),
+            "worker_errors": [r["error"] for r in shard_results if "error" in r],
+            "failures": failures,
+            "shards": [{k: v for k, v in r.items() if k != "failures"} for r in shard_results],
+            "seconds": round(time.time() - started, 3),
+        }
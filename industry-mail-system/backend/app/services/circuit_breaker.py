@@ -0,0 +1,69 @@
+"""
+Circuit breaker for upstream providers
+
+After `failure_threshold` consecutive failures the circuit opens and callers
+skip the provider entirely. Once `cooldown_seconds` have passed, a single
+probe call is let through (half-open): success closes the circuit, failure
+opens it again for another cooldown.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown_seconds: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider right now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            # A probe that never reported back (e.g. cancelled) is retried after a cooldown
+            if self.state == HALF_OPEN and (
+                not self._probe_in_flight or time.monotonic() - self._probe_started >= self.cooldown_seconds
+            ):
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (does not claim the half-open probe)"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at < self.cooldown_seconds
+            return self.state == HALF_OPEN and self._probe_in_flight
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"Circuit {self.name}: closed after successful probe")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"Circuit {self.name}: open for {self.cooldown_seconds:.0f}s after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
@@ -0,0 +1,98 @@
+"""
+Coordination between scheduler instances
+
+Every app process (uvicorn worker or replica) starts its own scheduler, so a
+scheduled run fires once per process. Before doing a unit of work each node
+inserts a row into `scheduler_claims`; the UNIQUE(run_key, shard) constraint
+guarantees only one node wins, so each node ends up with a disjoint set of
+topics and idle nodes pick up whatever is left.
+
+Nodes agree on a run by the fire time their trigger scheduled it for, not
+by when it actually started (which jitter and misfire grace shift by
+seconds to minutes). Claim times are UTC.
+
+Blocks on the database; async callers run it in a thread.
+"""
+import os
+import socket
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.scheduler_claim import SchedulerClaim
+
+# Claims older than this are removed; they only need to outlive a single run
+CLAIM_RETENTION = timedelta(days=7)
+
+
+def node_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def scheduled_fire_time(trigger: Any, lookback: timedelta, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    The latest fire time of an APScheduler trigger at or before `now`
+
+    That is the fire time a run started now belongs to, as long as it did
+    not start more than `lookback` late. Interval triggers need a fixed
+    start_date so that every node computes the same fire times.
+    """
+    now = now or datetime.now(timezone.utc)
+    latest = None
+    fire = trigger.get_next_fire_time(None, now - lookback)
+    while fire is not None and fire <= now:
+        latest = fire
+        fire = trigger.get_next_fire_time(None, fire + timedelta(microseconds=1))
+    return latest
+
+
+def run_key(job_id: str, scheduled_at: datetime) -> str:
+    """Identify a scheduled run by its fire time; every node firing it agrees on the key"""
+    if scheduled_at.tzinfo is not None:
+        scheduled_at = scheduled_at.astimezone(timezone.utc)
+    return f"{job_id}:{scheduled_at.strftime('%Y-%m-%dT%H:%M')}"
+
+
+class SchedulerCoordinator:
+    def __init__(self, owner: Optional[str] = None, session_factory: Callable[[], Session] = SessionLocal):
+        self.owner = owner or node_id()
+        self.session_factory = session_factory
+
+    def claim(self, key: str, shard: str) -> bool:
+        """Try to claim one shard of a run; returns False if another node has it"""
+        db = self.session_factory()
+        try:
+            db.add(SchedulerClaim(run_key=key, shard=shard, owner=self.owner, claimed_at=datetime.now(timezone.utc)))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def claim_topic(self, key: str, topic_id: int) -> bool:
+        return self.claim(key, f"topic:{topic_id}")
+
+    def rotate(self, topic_ids: Iterable[int]) -> List[int]:
+        """
+        Start each node at a different offset so concurrent nodes rarely
+        race for the same topic
+        """
+        ids = list(topic_ids)
+        if not ids:
+            return ids
+        offset = zlib.crc32(self.owner.encode()) % len(ids)
+        return ids[offset:] + ids[:offset]
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        cutoff = (now or datetime.now(timezone.utc)) - CLAIM_RETENTION
+        db = self.session_factory()
+        try:
+            deleted = db.query(SchedulerClaim).filter(SchedulerClaim.claimed_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
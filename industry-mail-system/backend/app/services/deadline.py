@@ -0,0 +1,53 @@
+"""
+Deadline budgets for send runs
+
+A scheduled or manual send creates one `Deadline` and passes it down the
+pipeline. Each stage derives its upstream timeouts from the time that is
+left and degrades instead of overrunning: news fetches fall back to cached
+articles, LLM summaries to the local summarizer, and recipients not reached
+in time are deferred to the next run.
+"""
+import time
+from typing import Optional
+from app.config import settings
+
+# Share of a run's budget for fetching and summarizing news; sending gets the rest
+FETCH_SHARE = 0.5
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when a stage has no time left and nothing to degrade to"""
+
+
+class Deadline:
+    def __init__(self, seconds: float, parent: Optional["Deadline"] = None):
+        expires_at = time.monotonic() + max(0.0, seconds)
+        if parent is not None:
+            expires_at = min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for one upstream call: `cap`, shortened to the time left"""
+        return min(cap, self.remaining())
+
+
+def timeout_for(deadline: Optional[Deadline], cap: float) -> float:
+    """`cap` when there is no deadline, otherwise the deadline-bounded timeout"""
+    return cap if deadline is None else deadline.timeout(cap)
+
+
+def fetch_deadline(run: Deadline) -> Deadline:
+    """
+    Budget for fetching and summarizing news within a run
+
+    FETCH_SHARE of the send budget, not of any delivery window the run's
+    deadline also covers.
+    """
+    return Deadline(min(run.remaining(), settings.SEND_DEADLINE_SECONDS) * FETCH_SHARE, parent=run)
@@ -0,0 +1,210 @@
+"""
+Delivery tracking: bounces, retries and suppression
+
+Every SMTP failure for a recipient is classified:
+ - permanent (5xx mailbox/domain rejections, malformed addresses): the
+   address is suppressed right away and never retried
+ - transient (4xx, timeouts, dropped connections): the address is skipped
+   until an exponentially growing retry time; after MAX_TRANSIENT_FAILURES
+   in a row it is suppressed as well
+
+Subscriber selection filters with `deliverable_emails()`, so suppressed and
+backed-off addresses cost no SMTP time. A successful delivery resets the
+address's failure count.
+"""
+import smtplib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from email_validator import validate_email, EmailNotValidError
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.delivery_status import DeliveryStatus
+from app.models.subscription import Subscription
+from app.models.user import User
+
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+
+# Consecutive transient failures before an address is suppressed
+MAX_TRANSIENT_FAILURES = 5
+RETRY_BASE = timedelta(minutes=30)
+RETRY_MAX = timedelta(hours=24)
+
+# "Mailbox full" is a 5xx code but usually clears up on its own
+TRANSIENT_5XX_CODES = {552}
+
+
+class InvalidAddressError(ValueError):
+    """Raised for addresses that cannot be delivered to at all"""
+
+
+def check_address(email: str):
+    """Reject malformed addresses and special-use domains before spending SMTP time on them"""
+    try:
+        validate_email(email, check_deliverability=False)
+    except EmailNotValidError as e:
+        raise InvalidAddressError(str(e))
+
+
+def _error_code(error: Exception, email: str) -> Optional[int]:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return (error.recipients.get(email) or (None,))[0]
+    if isinstance(error, smtplib.SMTPSenderRefused):
+        # Our sender address was refused; not the recipient's fault
+        return None
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code
+    return None
+
+
+def classify_error(error: Exception, email: str) -> str:
+    """`permanent` or `transient` for a failed delivery to `email`"""
+    if isinstance(error, InvalidAddressError):
+        return PERMANENT
+    code = _error_code(error, email)
+    if code is not None and 500 <= code < 600 and code not in TRANSIENT_5XX_CODES:
+        return PERMANENT
+    return TRANSIENT
+
+
+def retry_delay(consecutive_failures: int) -> timedelta:
+    return min(RETRY_MAX, RETRY_BASE * (2 ** max(0, consecutive_failures - 1)))
+
+
+def deliverable_emails(email_column, now: Optional[datetime] = None):
+    """
+    Filter clause excluding suppressed addresses and addresses waiting for a retry
+
+    Usage: `query.filter(deliverable_emails(User.email))`
+    """
+    now = now or datetime.now()
+    blocked = select(DeliveryStatus.email).where(
+        or_(DeliveryStatus.suppressed == True, DeliveryStatus.next_retry_at > now)
+    )
+    return email_column.not_in(blocked)
+
+
+def newsletter_recipients(db: Session, topic_id: int, shard: Optional[Tuple[int, int]] = None) -> List[tuple]:
+    """
+    (subscription ID, email, time zone) for every deliverable subscriber of a topic
+
+    Active users only, without suppressed or backed-off addresses. Newsletter
+    jobs and campaign workers both select through this, so they reach the
+    same people; `shard` = (index, count) keeps one worker's partition.
+    """
+    query = (
+        db.query(Subscription.id, User.email, User.timezone)
+        .join(User, Subscription.user_id == User.id)
+        .filter(Subscription.topic_id == topic_id, User.is_active == True, deliverable_emails(User.email))
+    )
+    if shard is not None:
+        index, count = shard
+        query = query.filter(Subscription.id % count == index)
+    return query.all()
+
+
+def mark_sent(subscription_ids: Iterable[int], sent_at: Optional[datetime] = None):
+    """
+    Stamp subscriptions as sent
+
+    `sent_at` should be the start of the run that planned the send (local
+    time, like `datetime.now()`), not the moment the message left. A slot
+    late in a delivery window, or on the next calendar day for users ahead
+    of the server, then does not push the subscription's next due time
+    past the following run.
+    """
+    subscription_ids = list(subscription_ids)
+    if not subscription_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.query(Subscription).filter(Subscription.id.in_(subscription_ids)).update(
+            {Subscription.last_sent_at: sent_at or datetime.now()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class DeliveryTracker:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+
+    def record(self, delivered: Iterable[str], errors: Dict[str, Exception]):
+        """Store the outcome of a send: addresses delivered to and per-address errors"""
+        delivered = list(delivered)
+        if not delivered and not errors:
+            return
+        for attempt in range(2):
+            db = self.session_factory()
+            try:
+                self._record(db, delivered, errors, datetime.now())
+                db.commit()
+                return
+            except IntegrityError:
+                # Another worker created a row for the same address; apply on top of it
+                db.rollback()
+                if attempt:
+                    raise
+            except Exception as e:
+                db.rollback()
+                print(f"Delivery tracking failed: {e}")
+                return
+            finally:
+                db.close()
+
+    def _record(self, db: Session, delivered: List[str], errors: Dict[str, Exception], now: datetime):
+        if delivered:
+            db.query(DeliveryStatus).filter(
+                DeliveryStatus.email.in_(delivered),
+                DeliveryStatus.consecutive_failures > 0,
+            ).update(
+                {DeliveryStatus.consecutive_failures: 0, DeliveryStatus.next_retry_at: None},
+                synchronize_session=False,
+            )
+        if not errors:
+            return
+
+        existing = {
+            row.email: row
+            for row in db.query(DeliveryStatus).filter(DeliveryStatus.email.in_(list(errors)))
+        }
+        for email, error in errors.items():
+            row = existing.get(email)
+            if row is None:
+                row = DeliveryStatus(email=email, consecutive_failures=0, suppressed=False)
+                db.add(row)
+            error_class = classify_error(error, email)
+            row.consecutive_failures = (row.consecutive_failures or 0) + 1
+            row.last_error_class = error_class
+            row.last_error = f"{type(error).__name__}: {error}"[:500]
+            row.last_failure_at = now
+            if error_class == PERMANENT or row.consecutive_failures >= MAX_TRANSIENT_FAILURES:
+                row.next_retry_at = None
+                if not row.suppressed:
+                    row.suppressed = True
+                    row.suppressed_at = now
+                    print(f"Delivery: suppressing {email} after {error_class} failure: {row.last_error}")
+            else:
+                row.next_retry_at = now + retry_delay(row.consecutive_failures)
+
+    def suppressed(self, db: Session, skip: int = 0, limit: int = 100) -> List[DeliveryStatus]:
+        return (
+            db.query(DeliveryStatus)
+            .filter(DeliveryStatus.suppressed == True)
+            .order_by(DeliveryStatus.suppressed_at.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def unsuppress(self, db: Session, email: str) -> bool:
+        """Allow sends to an address again (e.g. after the user fixed their mailbox)"""
+        row = db.query(DeliveryStatus).filter(DeliveryStatus.email == email).first()
+        if row is None:
+            return False
+        db.delete(row)
+        db.commit()
+        return True
@@ -0,0 +1,188 @@
+"""
+Digest Service: combine a user's due subscriptions into a single email
+
+Instead of one email (and one SMTP transaction) per subscription, due
+subscriptions are grouped by user and each user receives one message with a
+section per topic. Articles are fetched once per (topic, look-back window)
+and shared by every user subscribed to that topic.
+
+Prepared digests are handed to the outbox (`app.services.outbox_service`)
+with their delivery slots, and the scheduler sends them when they are due.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from app.models.subscription import Subscription
+from app.models.topic import Topic
+from app.models.user import User
+from app.services.article import Article
+from app.services.deadline import Deadline
+from app.services.delivery_service import deliverable_emails
+from app.services.news_service import NewsService
+from app.services.email_service import EmailService, PreparedMessage
+from app.services.outbox_service import outbox
+from app.services.query_planner import QueryPlanner
+from app.services.quota_service import PRIORITY_SCHEDULED
+from app.services.send_planner import PlannedSend, SendPlanner
+from app.services.topic_digest_service import ARTICLE_LIMIT, topic_digests
+
+# Allow a run to fire slightly early (e.g. cron jitter) and still count as due
+DUE_SLACK = timedelta(hours=1)
+
+SectionKey = Tuple[int, int]  # (topic_id, days)
+
+# Users released together when digests are spread over a window
+DELIVERY_BATCH = 20
+
+
+def subscription_days(subscription: Subscription) -> int:
+    """Look-back window in days for a subscription's frequency"""
+    frequency = subscription.frequency
+    return int(getattr(frequency, "value", frequency) or 1)
+
+
+def is_due(subscription: Subscription, now: datetime) -> bool:
+    """A subscription is due when its frequency interval has elapsed"""
+    if subscription.last_sent_at is None:
+        return True
+    last_sent = subscription.last_sent_at.replace(tzinfo=None)
+    return now - last_sent >= timedelta(days=subscription_days(subscription)) - DUE_SLACK
+
+
+class DigestService:
+    def __init__(self, news_service: Optional[NewsService] = None, email_service: Optional[EmailService] = None):
+        self.news_service = news_service or NewsService()
+        self.email_service = email_service or EmailService()
+        self.topic_digests = topic_digests
+
+    def due_subscriptions(
+        self,
+        db: Session,
+        topic_ids: Optional[List[int]] = None,
+        now: Optional[datetime] = None,
+    ) -> List[Subscription]:
+        """
+        Select subscriptions that are due for delivery on active topics
+
+        Suppressed addresses and addresses backing off after a transient
+        failure are skipped; their subscriptions stay due. So are
+        subscriptions whose digest from an earlier run still waits in the
+        outbox.
+        """
+        now = now or datetime.now()
+        query = (
+            db.query(Subscription)
+            .join(Topic, Subscription.topic_id == Topic.id)
+            .join(User, Subscription.user_id == User.id)
+            .options(joinedload(Subscription.user), joinedload(Subscription.topic))
+            .filter(Topic.is_active == True, deliverable_emails(User.email, now))
+        )
+        if topic_ids:
+            query = query.filter(Subscription.topic_id.in_(topic_ids))
+        planned = outbox.pending_subscription_ids(db)
+        return [s for s in query.all()
+                if s.id not in planned and is_due(s, now) and s.user and s.user.is_active]
+
+    @staticmethod
+    def group_by_user(subscriptions: List[Subscription]) -> Dict[int, List[Subscription]]:
+        grouped: Dict[int, List[Subscription]] = defaultdict(list)
+        for subscription in subscriptions:
+            grouped[subscription.user_id].append(subscription)
+        return grouped
+
+    async def fetch_sections(self, subscriptions: List[Subscription], limit: int = ARTICLE_LIMIT,
+                             deadline: Optional[Deadline] = None) -> Dict[SectionKey, List[Article]]:
+        """
+        Fetch articles once per (topic, days) pair needed by the due subscriptions
+
+        Sections come from the topics' materialized digests
+        (`app.services.topic_digest_service`), so weekly and monthly sections
+        are rolled up from stored dailies where possible. All topics share
+        `deadline`; once it runs out, only stored or cached articles are
+        used and topics without them are left for the next run.
+        """
+        topics: Dict[SectionKey, Topic] = {}
+        for subscription in subscriptions:
+            topics.setdefault((subscription.topic_id, subscription_days(subscription)), subscription.topic)
+
+        # Combined NewsAPI queries per look-back window; the fetches below then read the article store
+        planner = QueryPlanner(self.news_service)
+        for window in sorted({days for _, days in topics}):
+            await planner.prefetch([t.keywords for (_, days), t in topics.items() if days == window], window,
+                                   min_articles=limit, deadline=deadline)
+
+        sections: Dict[SectionKey, List[Article]] = {}
+        for (topic_id, days), topic in topics.items():
+            try:
+                digest = await self.topic_digests.get(
+                    topic_id, topic.name, topic.keywords, days, deadline=deadline, priority=PRIORITY_SCHEDULED,
+                    description=topic.description
+                )
+            except Exception as e:
+                print(f"Digest: failed to fetch news for topic {topic.name}: {e}")
+                continue
+            if digest:
+                sections[(topic_id, days)] = digest.articles[:limit]
+        return sections
+
+    def build_digests(
+        self,
+        subscriptions: List[Subscription],
+        sections: Dict[SectionKey, List[Article]],
+    ) -> List[Tuple[str, List[Tuple[str, List[Article]]], List[Subscription]]]:
+        """
+        Build (email, sections, delivered subscriptions) for each user
+
+        Subscriptions whose topic produced no articles are left out so they
+        stay due for the next run.
+        """
+        digests = []
+        for user_subscriptions in self.group_by_user(subscriptions).values():
+            user_sections = []
+            included = []
+            for subscription in sorted(user_subscriptions, key=lambda s: s.topic.name):
+                articles = sections.get((subscription.topic_id, subscription_days(subscription)))
+                if not articles:
+                    continue
+                user_sections.append((subscription.topic.name, articles))
+                included.append(subscription)
+            if user_sections:
+                digests.append((user_subscriptions[0].user.email, user_sections, included))
+        return digests
+
+    def prepare_deliveries(
+        self,
+        digests: List[Tuple[str, List[Tuple[str, List[Article]]], List[Subscription]]],
+        planner: Optional[SendPlanner] = None,
+    ) -> List[PlannedSend]:
+        """
+        Slot and (email, prepared message, subscription IDs) per user
+
+        Users with the same set of sections share one prepared message.
+        Without a planner every user is due immediately.
+        """
+        planner = planner or SendPlanner()
+        prepared_by_sections: Dict[Tuple[SectionKey, ...], PreparedMessage] = {}
+        recipients = []
+        for email, user_sections, included in digests:
+            key = tuple((s.topic_id, subscription_days(s)) for s in included)
+            prepared = prepared_by_sections.get(key)
+            if prepared is None:
+                prepared = self.email_service.prepare_digest(user_sections)
+                prepared_by_sections[key] = prepared
+            user = included[0].user
+            recipients.append((user.id, (email, prepared, [s.id for s in included]), user.timezone))
+        return planner.plan(recipients)
+
+    def schedule(self, deliveries: List[PlannedSend], planner: SendPlanner, deadline: Deadline) -> int:
+        """
+        Put prepared digests in the outbox for delivery at their slots
+
+        Subscriptions are stamped with the planner's start once delivered.
+        Users not reached before `deadline` are dropped from the outbox;
+        their subscriptions keep their old `last_sent_at` and stay due for
+        the next run.
+        """
+        return outbox.enqueue(deliveries, run_at=planner.start, expires_at=time.time() + deadline.remaining())
@@ -2,64 +2,66 @@
 Email Service for sending newsletters
 """
 import smtplib
+import time
+from email import policy
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List, Dict, Any
+from email.utils import formatdate, make_msgid
+from typing import List, Dict, Optional, Tuple
 from app.config import settings
+from app.services.article import Article
+from app.services.deadline import Deadline, timeout_for
+from app.services.delivery_service import DeliveryTracker, check_address
+from app.services.latency_stats import SMTP_CONNECT, SMTP_MESSAGE, upstream_latency
 
-class EmailService:
-    def __init__(self):
-        self.smtp_host = settings.SMTP_HOST
-        self.smtp_port = settings.SMTP_PORT
-        self.smtp_user = settings.SMTP_USER
-        self.smtp_password = settings.SMTP_PASSWORD
-        self.email_from = settings.EMAIL_FROM
-    
-    def _create_newsletter_html(self, topic: str, articles: List[Dict[str, Any]]) -> str:
-        """
-        Create HTML newsletter from articles
-        """
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
+# Socket timeout for SMTP operations; a run deadline can only shorten it
+SMTP_TIMEOUT = 30.0
+MIN_SMTP_TIMEOUT = 1.0
+
+NEWSLETTER_STYLE = """
             <style>
-                body {{
+                body {
                     font-family: Arial, sans-serif;
                     line-height: 1.6;
                     color: #333;
                     max-width: 600px;
                     margin: 0 auto;
                     padding: 20px;
-                }}
-                .header {{
+                }
+                .header {
                     background-color: #4CAF50;
                     color: white;
                     padding: 20px;
                     text-align: center;
                     border-radius: 5px;
-                }}
-                .article {{
+                }
+                .section-title {
+                    color: #333;
+                    border-bottom: 2px solid #4CAF50;
+                    padding-bottom: 5px;
+                    margin-top: 30px;
+                }
+                .article {
                     border-bottom: 1px solid #eee;
                     padding: 20px 0;
-                }}
-                .article:last-child {{
+                }
+                .article:last-child {
                     border-bottom: none;
-                }}
-                .article h2 {{
+                }
+                .article h2 {
                     color: #4CAF50;
                     margin-top: 0;
-                }}
-                .article img {{
+                }
+                .article img {
                     max-width: 100%;
                     height: auto;
                     border-radius: 5px;
-                }}
-                .source {{
+                }
+                .source {
                     color: #666;
                     font-size: 0.9em;
-                }}
-                .read-more {{
+                }
+                .read-more {
                     display: inline-block;
                     background-color: #4CAF50;
                     color: white;
@@ -67,83 +69,364 @@ class EmailService:
                     text-decoration: none;
                     border-radius: 5px;
                     margin-top: 10px;
-                }}
-                .footer {{
+                }
+                .footer {
                     text-align: center;
                     margin-top: 40px;
                     padding-top: 20px;
                     border-top: 1px solid #eee;
                     color: #666;
                     font-size: 0.9em;
-                }}
+                }
             </style>
+"""
+
+def _fold_header(name: str, value: str) -> bytes:
+    """Encode and fold a single header line (RFC 2047 for non-ASCII values)"""
+    return policy.SMTP.fold(*policy.SMTP.header_store_parse(name, value)).encode('ascii')
+
+
+class PreparedMessage:
+    """
+    A message whose MIME body is encoded and serialized once
+
+    Only the small per-recipient header block (Subject/From/To/Date/
+    Message-ID) is generated at send time; the encoded body bytes are
+    shared by every recipient of the same content.
+    """
+
+    def __init__(self, subject: str, html_body: str):
+        self.subject = subject
+        # Kept for planned sends, which store the message until their slot (see outbox_service)
+        self.html_body = html_body
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(html_body, 'html'))
+        # Serialized with CRLF line endings; split the top-level MIME headers
+        # (MIME-Version, Content-Type with boundary) from the encoded parts
+        raw = msg.as_bytes(policy=policy.SMTP)
+        mime_headers, _, body = raw.partition(b"\r\n\r\n")
+        self.mime_headers = mime_headers + b"\r\n"
+        self.body = body
+        self.subject_header = _fold_header('Subject', subject)
+
+    def render(self, email_from: str, to_email: str) -> bytes:
+        """Combine per-recipient headers with the shared serialized body"""
+        headers = (
+            self.subject_header
+            + _fold_header('From', email_from)
+            + _fold_header('To', to_email)
+            + f"Date: {formatdate(localtime=True)}\r\n".encode('ascii')
+            # Explicit domain avoids a socket.getfqdn() lookup per message
+            + f"Message-ID: {make_msgid(domain=email_from.rsplit('@', 1)[-1])}\r\n".encode('ascii')
+        )
+        return headers + self.mime_headers + b"\r\n" + self.body
+
+
+class SMTPConnection:
+    """
+    An SMTP connection reused across batches
+
+    Opened on first use and re-opened only after the server drops it.
+    Callers sending many batches (a campaign worker) keep one open for the
+    whole run: `with email_service.connection() as conn: ...`. When opening
+    fails, the error sticks: later batches fail at once instead of each
+    waiting out another connect timeout against a server that is down.
+    """
+
+    def __init__(self, email_service: "EmailService", deadline: Optional[Deadline] = None):
+        self.email_service = email_service
+        self.deadline = deadline
+        self._server: Optional[smtplib.SMTP] = None
+        self.error: Optional[Exception] = None
+
+    def get(self) -> smtplib.SMTP:
+        if self.error is not None:
+            raise self.error
+        if self._server is None:
+            try:
+                self._server = self.email_service._connect(self.deadline)
+            except Exception as e:
+                self.error = e
+                raise
+        return self._server
+
+    def reset(self):
+        """Forget a connection the server dropped; the next `get` reconnects"""
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+            self._server = None
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self.reset()
+
+    def __enter__(self) -> "SMTPConnection":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EmailService:
+    def __init__(self, delivery_tracker: Optional[DeliveryTracker] = None):
+        self.delivery_tracker = delivery_tracker or DeliveryTracker()
+        self.smtp_host = settings.SMTP_HOST
+        self.smtp_port = settings.SMTP_PORT
+        self.smtp_user = settings.SMTP_USER
+        self.smtp_password = settings.SMTP_PASSWORD
+        self.email_from = settings.EMAIL_FROM
+
+    def _article_html(self, idx: int, article: Article) -> str:
+        """
+        Render a single article block
+        """
+        return f"""
+            <div class="article">
+                <h2>{idx}. {article.title}</h2>
+                <p class="source">Source: {article.source} | Published: {article.published_at}</p>
+                {f'<img src="{article.image_url}" alt="Article Image">' if article.image_url else ''}
+                <p class="summary">{article.summary or article.description or ''}</p>
+                <p>{article.description or ''}</p>
+                <a href="{article.url}" class="read-more" target="_blank">Read Full Article</a>
+            </div>
+            """
+
+    def _wrap_html(self, heading: str, body: str, footer_note: str) -> str:
+        """
+        Wrap rendered article blocks with the shared header, style and footer
+        """
+        return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>{NEWSLETTER_STYLE}
         </head>
         <body>
             <div class="header">
-                <h1>{topic} Industry Newsletter</h1>
+                <h1>{heading}</h1>
                 <p>Your latest industry news digest</p>
             </div>
-        """
-        
-        for idx, article in enumerate(articles, 1):
-            html += f"""
-            <div class="article">
-                <h2>{idx}. {article['title']}</h2>
-                <p class="source">Source: {article['source']} | Published: {article['published_at']}</p>
-                {f'<img src="{article["image_url"]}" alt="Article Image">' if article.get('image_url') else ''}
-                <p class="summary">{article.get('summary', article.get('description', ''))}</p>
-                <p>{article.get('description', '')}</p>
-                <a href="{article['url']}" class="read-more" target="_blank">Read Full Article</a>
-            </div>
-            """
-        
-        html += """
+            {body}
             <div class="footer">
-                <p>This newsletter was sent to you because you subscribed to {topic} updates.</p>
+                <p>{footer_note}</p>
                 <p>If you wish to unsubscribe, please contact us.</p>
             </div>
         </body>
         </html>
         """
-        
-        return html
-    
-    def send_newsletter(self, to_email: str, topic: str, articles: List[Dict[str, Any]]):
+
+    def _create_newsletter_html(self, topic: str, articles: List[Article]) -> str:
         """
-        Send newsletter email
+        Create HTML newsletter from articles
+        """
+        body = "".join(self._article_html(idx, article) for idx, article in enumerate(articles, 1))
+        return self._wrap_html(
+            f"{topic} Industry Newsletter",
+            body,
+            f"This newsletter was sent to you because you subscribed to {topic} updates.",
+        )
+
+    def _create_digest_html(self, sections: List[Tuple[str, List[Article]]]) -> str:
         """
+        Create one HTML digest with a section per subscribed topic
+
+        Args:
+            sections: (topic name, articles) pairs in display order
+        """
+        body = ""
+        for topic, articles in sections:
+            body += f'<h1 class="section-title">{topic}</h1>'
+            body += "".join(self._article_html(idx, article) for idx, article in enumerate(articles, 1))
+        topic_names = ", ".join(topic for topic, _ in sections)
+        return self._wrap_html(
+            "Your Industry News Digest",
+            body,
+            f"This digest was sent to you because you subscribed to {topic_names} updates.",
+        )
+
+    def _recipients(self, to_email: str) -> List[str]:
+        recipients = [to_email]
+        # In DEBUG mode, also BCC the configured SMTP user (useful for Ethereal testing)
+        if getattr(settings, 'DEBUG', False) and self.smtp_user not in recipients:
+            recipients.append(self.smtp_user)
+        return recipients
+
+    def _connect(self, deadline: Optional[Deadline] = None) -> smtplib.SMTP:
+        timeout = max(MIN_SMTP_TIMEOUT, timeout_for(deadline, SMTP_TIMEOUT))
+        started = time.perf_counter()
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=timeout)
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"{topic} Industry Newsletter - Top Stories"
-            msg['From'] = self.email_from
-            msg['To'] = to_email
-            
-            # Create HTML body
-            html_body = self._create_newsletter_html(topic, articles)
-            html_part = MIMEText(html_body, 'html')
-            msg.attach(html_part)
-            
-            # Send email
-            recipients = [to_email]
-            # In DEBUG mode, also BCC the configured SMTP user (useful for Ethereal testing)
-            try:
-                from app.config import settings
-                if getattr(settings, 'DEBUG', False) and self.smtp_user not in recipients:
-                    recipients.append(self.smtp_user)
-                    msg['Bcc'] = self.smtp_user
-            except Exception:
-                pass
+            server.starttls()
+            server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            # Don't leak the socket when TLS or authentication fails
+            server.close()
+            raise
+        upstream_latency.record(SMTP_CONNECT, time.perf_counter() - started)
+        return server
+
+    def _sendmail(self, server: smtplib.SMTP, to_email: str, payload: bytes):
+        started = time.perf_counter()
+        refused = server.sendmail(self.email_from, self._recipients(to_email), payload)
+        upstream_latency.record(SMTP_MESSAGE, time.perf_counter() - started)
+        # sendmail only raises when every recipient is refused; with the DEBUG BCC
+        # the subscriber can be refused alone
+        if to_email in refused:
+            raise smtplib.SMTPRecipientsRefused({to_email: refused[to_email]})
 
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg, from_addr=self.email_from, to_addrs=recipients)
-                print(f"Email sent to recipients: {recipients}")
-            
-            print(f"Newsletter sent successfully to {to_email}")
-            return True
-            
+    def _send(self, to_email: str, prepared: PreparedMessage, deadline: Optional[Deadline] = None) -> bool:
+        """
+        Deliver a prepared message to a single recipient
+        """
+        try:
+            check_address(to_email)
+            payload = prepared.render(self.email_from, to_email)
+        except Exception as e:
+            print(f"Error sending email to {to_email}: {str(e)}")
+            self.delivery_tracker.record([], {to_email: e})
+            return False
+
+        try:
+            server = self._connect(deadline)
         except Exception as e:
+            # Our SMTP server is unreachable; not counted against the recipient
             print(f"Error sending email to {to_email}: {str(e)}")
             return False
+
+        try:
+            with server:
+                self._sendmail(server, to_email, payload)
+                print(f"Email sent to recipients: {self._recipients(to_email)}")
+        except Exception as e:
+            print(f"Error sending email to {to_email}: {str(e)}")
+            self.delivery_tracker.record([], {to_email: e})
+            return False
+
+        self.delivery_tracker.record([to_email], {})
+        return True
+
+    def connection(self, deadline: Optional[Deadline] = None) -> SMTPConnection:
+        """A reusable SMTP connection for several `send_prepared_batch` calls"""
+        return SMTPConnection(self, deadline)
+
+    def send_prepared_batch(self, to_emails: List[str], prepared: PreparedMessage,
+                            deadline: Optional[Deadline] = None,
+                            connection: Optional[SMTPConnection] = None) -> Dict[str, str]:
+        """
+        Deliver a prepared message to many recipients over one SMTP connection
+
+        The connection is re-opened if the server drops it mid-batch. With a
+        `deadline`, SMTP operations time out no later than the run does;
+        callers check it between batches and defer the rest. A caller's
+        `connection` is used and left open; otherwise one is opened for
+        this batch and closed afterwards. If the SMTP server cannot be
+        reached, the rest of the batch fails with that error right away.
+
+        Returns:
+            Mapping of failed recipient -> error message
+        """
+        failures: Dict[str, str] = {}
+        # Recipient-level errors, recorded for bounce tracking
+        errors: Dict[str, Exception] = {}
+        delivered: List[str] = []
+        owned = connection is None
+        if owned:
+            connection = self.connection(deadline)
+        try:
+            for idx, to_email in enumerate(to_emails):
+                try:
+                    check_address(to_email)
+                except Exception as e:
+                    failures[to_email] = errors[to_email] = e
+                    continue
+                try:
+                    payload = prepared.render(self.email_from, to_email)
+                except Exception as e:
+                    # Our rendering failed; not counted against the recipient
+                    print(f"Error rendering email for {to_email}: {e}")
+                    failures[to_email] = e
+                    continue
+                unreachable: Optional[Exception] = None
+                for attempt in range(2):
+                    try:
+                        server = connection.get()
+                    except Exception as e:
+                        unreachable = e
+                        break
+                    try:
+                        self._sendmail(server, to_email, payload)
+                        delivered.append(to_email)
+                        break
+                    except smtplib.SMTPServerDisconnected as e:
+                        connection.reset()
+                        if attempt:
+                            failures[to_email] = errors[to_email] = e
+                    except Exception as e:
+                        failures[to_email] = errors[to_email] = e
+                        break
+                if unreachable is not None:
+                    # Our SMTP server is unreachable; the rest fail now, not counted against the recipients
+                    print(f"SMTP server unreachable, failing {len(to_emails) - idx} recipients: {unreachable}")
+                    failures.update((email, unreachable) for email in to_emails[idx:] if email not in failures)
+                    break
+        finally:
+            if owned:
+                connection.close()
+        self.delivery_tracker.record(delivered, errors)
+        return {email: str(error) for email, error in failures.items()}
+
+    def render_newsletter(self, topic: str, articles: List[Article]) -> Tuple[str, str]:
+        """
+        Subject and HTML body of a topic newsletter
+        """
+        return f"{topic} Industry Newsletter - Top Stories", self._create_newsletter_html(topic, articles)
+
+    def prepare_newsletter(self, topic: str, articles: List[Article]) -> PreparedMessage:
+        """
+        Render and serialize a topic newsletter once for all of its recipients
+        """
+        return PreparedMessage(*self.render_newsletter(topic, articles))
+
+    def prepare_digest(self, sections: List[Tuple[str, List[Article]]]) -> PreparedMessage:
+        """
+        Render and serialize a multi-topic digest once for all of its recipients
+        """
+        html_body = self._create_digest_html(sections)
+        if len(sections) == 1:
+            subject = f"{sections[0][0]} Industry Newsletter - Top Stories"
+        else:
+            subject = f"Your Industry News Digest - {len(sections)} Topics"
+        return PreparedMessage(subject, html_body)
+
+    def send_prepared(self, to_email: str, prepared: PreparedMessage, deadline: Optional[Deadline] = None):
+        """
+        Send an already prepared newsletter or digest
+        """
+        sent = self._send(to_email, prepared, deadline)
+        if sent:
+            print(f"{prepared.subject} sent successfully to {to_email}")
+        return sent
+
+    def send_newsletter(self, to_email: str, topic: str, articles: List[Article]):
+        """
+        Send newsletter email
+        """
+        return self.send_prepared(to_email, self.prepare_newsletter(topic, articles))
+
+    def send_digest(self, to_email: str, sections: List[Tuple[str, List[Article]]]):
+        """
+        Send one combined email covering several topics
+
+        Args:
+            to_email: Recipient address
+            sections: (topic name, articles) pairs, one per subscribed topic
+        """
+        if not sections:
+            return False
+        return self.send_prepared(to_email, self.prepare_digest(sections))
@@ -0,0 +1,132 @@
+"""
+Fair send queue: share SMTP capacity between topics
+
+Newsletter jobs for different topics run at the same time, and without
+coordination a topic with many subscribers keeps the SMTP workers busy
+while small topics wait behind it. Every job submits its batches here
+instead of sending directly. At most SMTP_CONCURRENCY batches are in
+flight, and the next batch is picked by weighted fair queuing
+(self-clocked): each batch gets a virtual finish tag
+
+    finish = max(virtual time, topic's previous finish) + recipients / priority
+
+and the smallest tag goes next. Topics get SMTP time in proportion to
+their priority, so a small topic's few batches slot in between a large
+topic's and it finishes quickly.
+
+Per-topic queue wait and completion latency are kept for `/api/news/send-queue`.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from app.config import settings
+
+# Finished topics kept for reporting
+RECENT_FLOWS = 50
+
+
+class FlowStats:
+    """Queueing statistics for one topic's send"""
+
+    def __init__(self, topic_id: int, priority: int):
+        self.topic_id = topic_id
+        self.priority = priority
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.batches = 0
+        self.recipients = 0
+        self.queue_wait = 0.0
+        self.finish_tag = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "topic_id": self.topic_id,
+            "priority": self.priority,
+            "batches": self.batches,
+            "recipients": self.recipients,
+            "queue_wait_seconds": round(self.queue_wait, 3),
+            "latency_seconds": round(end - self.started_at, 3),
+            "done": self.finished_at is not None,
+        }
+
+
+class FairSendQueue:
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self.virtual_time = 0.0
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._flows: Dict[int, FlowStats] = {}
+        self._recent: Deque[FlowStats] = deque(maxlen=RECENT_FLOWS)
+
+    def open_flow(self, topic_id: int, priority: int = 1) -> FlowStats:
+        """Start tracking a topic's send; call `close_flow` when it is done"""
+        flow = FlowStats(topic_id, max(1, priority or 1))
+        # Start at the current virtual time so a new topic does not get credit for idle time
+        flow.finish_tag = self.virtual_time
+        self._flows[id(flow)] = flow
+        return flow
+
+    def close_flow(self, flow: FlowStats):
+        flow.finished_at = time.time()
+        self._flows.pop(id(flow), None)
+        self._recent.append(flow)
+        print(
+            f"Send queue: topic {flow.topic_id} (priority {flow.priority}) done in "
+            f"{flow.finished_at - flow.started_at:.1f}s, {flow.queue_wait:.1f}s waiting for SMTP"
+        )
+
+    async def run(self, flow: FlowStats, recipients: int, fn: Callable[..., Any], *args) -> Any:
+        """Run a blocking send batch `fn(*args)` in a worker thread when the flow's turn comes"""
+        flow.finish_tag = max(self.virtual_time, flow.finish_tag) + recipients / flow.priority
+        loop = asyncio.get_running_loop()
+        turn = loop.create_future()
+        heapq.heappush(self._heap, (flow.finish_tag, next(self._seq), lambda: turn.set_result(None)))
+        queued_at = time.time()
+        self._dispatch()
+        try:
+            await turn
+        except asyncio.CancelledError:
+            # Give the slot back if we were granted one before being cancelled
+            if turn.done() and not turn.cancelled():
+                self._release()
+            raise
+        flow.queue_wait += time.time() - queued_at
+        try:
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            flow.batches += 1
+            flow.recipients += recipients
+            self._release()
+
+    def _dispatch(self):
+        while self._in_flight < self.concurrency and self._heap:
+            tag, _, grant = heapq.heappop(self._heap)
+            self.virtual_time = tag
+            self._in_flight += 1
+            try:
+                grant()
+            except asyncio.InvalidStateError:
+                # The waiter was cancelled while queued
+                self._in_flight -= 1
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self._in_flight,
+            "queued": len(self._heap),
+            "active": [flow.snapshot() for flow in self._flows.values()],
+            "recent": [flow.snapshot() for flow in reversed(self._recent)],
+        }
+
+
+send_queue = FairSendQueue(settings.SMTP_CONCURRENCY)
@@ -0,0 +1,235 @@
+"""
+Job Service: run newsletter sends in the background and track their progress
+
+`POST /api/news/send-newsletter` only validates the request and enqueues a
+job; fetching, summarization and delivery run as an asyncio task. Jobs are
+kept in memory by the process that created them, and watchers (the status
+endpoint and the SSE stream) read snapshots and wait for change
+notifications.
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from app.config import settings
+from app.database import SessionLocal
+from app.services.deadline import Deadline, fetch_deadline
+from app.services.delivery_service import mark_sent, newsletter_recipients
+from app.services.fair_queue import FlowStats, send_queue
+from app.services.outbox_service import outbox
+from app.services.send_planner import SendPlanner, release_batches
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+    from app.services.email_service import EmailService, PreparedMessage
+
+# Recipients per SMTP batch; progress is published after each batch
+SEND_BATCH = 20
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION_SECONDS = 3600
+
+TERMINAL_STAGES = ("completed", "failed")
+
+
+class NewsletterJob:
+    def __init__(self, topic_id: int, days: int, deadline: Optional[Deadline] = None,
+                 planner: Optional[SendPlanner] = None):
+        self.id = uuid.uuid4().hex
+        self.topic_id = topic_id
+        self.days = days
+        self.planner = planner or SendPlanner()
+        # A staggered send gets its delivery window on top of the usual budget
+        self.deadline = deadline or Deadline(settings.SEND_DEADLINE_SECONDS + self.planner.horizon())
+        self.next_release_at: Optional[float] = None
+        self.priority = 1
+        self.flow: Optional[FlowStats] = None
+        self.stage = "queued"
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.deferred = 0
+        self.articles_count = 0
+        self.message: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+        self.version = 0
+        self._stage_started = self.created_at
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.stage in TERMINAL_STAGES
+
+    def set_stage(self, stage: str):
+        now = time.time()
+        self.timings[self.stage] = round(now - self._stage_started, 3)
+        self._stage_started = now
+        self.stage = stage
+        if self.done:
+            self.finished_at = now
+        self.notify()
+
+    def notify(self):
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_change(self, version: int, timeout: float):
+        """Return once the job has moved past `version` (or on timeout)"""
+        if self.version != version:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "topic_id": self.topic_id,
+            "days": self.days,
+            "stage": self.stage,
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "articles_count": self.articles_count,
+            "message": self.message,
+            "error": self.error,
+            "priority": self.priority,
+            "queue_wait_seconds": round(self.flow.queue_wait, 3) if self.flow else 0.0,
+            "window_seconds": self.planner.window_seconds,
+            "next_release_at": datetime.fromtimestamp(self.next_release_at).isoformat() if self.next_release_at else None,
+            "timings": dict(self.timings),
+            "elapsed": round((self.finished_at or time.time()) - self.created_at, 3),
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+        }
+
+
+class JobManager:
+    def __init__(self):
+        self._jobs: Dict[str, NewsletterJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def get(self, job_id: str) -> Optional[NewsletterJob]:
+        return self._jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.finished_at and now - j.finished_at > JOB_RETENTION_SECONDS]:
+            del self._jobs[job_id]
+
+    def submit_newsletter(self, topic_id: int, days: int, deadline_seconds: Optional[float] = None,
+                          planner: Optional[SendPlanner] = None) -> NewsletterJob:
+        """
+        Start a newsletter job
+
+        `deadline_seconds` defaults to SEND_DEADLINE_SECONDS plus the
+        planner's delivery window; without a planner everyone is sent at once.
+        """
+        self._prune()
+        deadline = Deadline(deadline_seconds) if deadline_seconds is not None else None
+        job = NewsletterJob(topic_id, days, deadline, planner)
+        self._jobs[job.id] = job
+        task = asyncio.create_task(run_newsletter_job(job))
+        # Keep a reference so the task is not garbage collected mid-run
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+
+async def _deliver(job: NewsletterJob, email_service: "EmailService", prepared: "PreparedMessage", planned: List[tuple]):
+    """Release planned batches at their slots through the fair send queue"""
+    unsent = len(planned)
+    for release_at, batch in release_batches(planned, SEND_BATCH):
+        wait = release_at - time.time()
+        if wait > 0:
+            job.next_release_at = release_at
+            job.notify()
+            await asyncio.sleep(wait)
+        if job.deadline.expired:
+            # Out of time: leave the rest for the next run instead of sending late
+            job.deferred = unsent
+            print(f"Newsletter job {job.id}: deadline reached, deferring {job.deferred} recipients")
+            break
+        # smtplib blocks; the queue runs the batch in a worker thread when this topic's turn comes
+        failures = await send_queue.run(
+            job.flow, len(batch), email_service.send_prepared_batch, [email for _, email in batch], prepared, job.deadline
+        )
+        # Marked per batch, with the run's start: a staggered send can span a long window
+        await asyncio.to_thread(mark_sent, [sub_id for sub_id, email in batch if email not in failures],
+                                datetime.fromtimestamp(job.planner.start))
+        if failures:
+            # Transient failures are re-sent from the outbox once their backoff has passed
+            await asyncio.to_thread(outbox.enqueue_retries,
+                                    [(email, prepared, [sub_id]) for sub_id, email in batch if email in failures],
+                                    job.planner.start)
+        unsent -= len(batch)
+        job.sent += len(batch) - len(failures)
+        job.failed += len(failures)
+        job.notify()
+    job.next_release_at = None
+
+
+async def run_newsletter_job(job: NewsletterJob):
+    """Fetch, summarize and deliver one topic's newsletter, updating `job` as it goes"""
+    from app.models.topic import Topic
+    from app.services.email_service import EmailService
+    from app.services.topic_digest_service import topic_digests
+
+    def load_topic():
+        db = SessionLocal()
+        try:
+            topic = db.query(Topic).filter(Topic.id == job.topic_id).first()
+            if not topic:
+                raise RuntimeError("Topic not found")
+            return topic.name, topic.keywords, topic.description, topic.priority or 1, \
+                newsletter_recipients(db, job.topic_id)
+        finally:
+            db.close()
+
+    try:
+        # Sync SQLAlchemy; kept off the event loop
+        topic_name, keywords, description, job.priority, recipients = await asyncio.to_thread(load_topic)
+
+        job.total = len(recipients)
+        if not recipients:
+            job.message = "No subscribers found for this topic"
+            job.set_stage("completed")
+            return
+
+        job.set_stage("fetching")
+        # Today's stored digest when there is one; re-sends deliver the same articles
+        digest = await topic_digests.get(
+            job.topic_id, topic_name, keywords, job.days, deadline=fetch_deadline(job.deadline),
+            description=description
+        )
+        job.articles_count = len(digest.articles) if digest else 0
+        if not digest:
+            raise RuntimeError("No news articles found for the requested topic/days")
+
+        job.set_stage("sending")
+        email_service = EmailService()
+        prepared = digest.prepared()
+        planned = job.planner.plan((sub_id, (sub_id, email), tz) for sub_id, email, tz in recipients)
+        job.flow = send_queue.open_flow(job.topic_id, job.priority)
+        try:
+            await _deliver(job, email_service, prepared, planned)
+        finally:
+            send_queue.close_flow(job.flow)
+
+        job.message = f"Newsletter sent to {job.sent} of {job.total} subscribers"
+        if job.deferred:
+            job.message += f" ({job.deferred} deferred: run deadline reached)"
+        job.set_stage("completed")
+    except Exception as e:
+        print(f"Newsletter job {job.id} for topic {job.topic_id} failed: {e}")
+        job.error = str(e)
+        job.set_stage("failed")
+
+
+job_manager = JobManager()
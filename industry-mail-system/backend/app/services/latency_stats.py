@@ -0,0 +1,68 @@
+"""
+Upstream latency recording
+
+NewsAPI requests, LLM calls, SMTP connects and SMTP messages record how
+long they took. The most recent samples per upstream are kept in memory
+and feed the dry-run cost simulation (`app.services.simulation_service`)
+and `GET /api/news/latencies`. Until an upstream has been called,
+DEFAULT_LATENCIES stand in for it.
+"""
+import threading
+from collections import deque
+from statistics import median
+from typing import Any, Deque, Dict
+
+NEWSAPI = "newsapi"
+LLM = "llm"
+SMTP_CONNECT = "smtp_connect"
+SMTP_MESSAGE = "smtp_message"
+
+# Seconds; typical values for a hosted SMTP relay and the public APIs
+DEFAULT_LATENCIES = {
+    NEWSAPI: 1.0,
+    LLM: 2.0,
+    SMTP_CONNECT: 1.0,
+    SMTP_MESSAGE: 0.2,
+}
+# Samples kept per upstream
+WINDOW = 200
+
+
+class LatencyStats:
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def typical(self, name: str) -> float:
+        """Median of the recorded samples, or the default when there are none"""
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        return median(samples) if samples else DEFAULT_LATENCIES[name]
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            recorded = {name: sorted(samples) for name, samples in self._samples.items()}
+        result = {}
+        for name, default in DEFAULT_LATENCIES.items():
+            samples = recorded.get(name)
+            if not samples:
+                result[name] = {"samples": 0, "p50": default, "p95": default, "default": True}
+                continue
+            result[name] = {
+                "samples": len(samples),
+                "p50": round(median(samples), 4),
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+                "default": False,
+            }
+        return result
+
+
+upstream_latency = LatencyStats()
@@ -1,43 +1,208 @@
 """
 News Service for fetching articles from NewsAPI
 """
+import asyncio
+import time
 import httpx
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Optional, Tuple
 from app.config import settings
 from app.services.ai_service import AIService
+from app.services.article import Article
+from app.services.article_store import STORE_PAGE_SIZE, article_store, utcnow
+from app.services.deadline import Deadline, DeadlineExceeded, timeout_for
+from app.services.latency_stats import NEWSAPI, upstream_latency
+from app.services.quota_service import news_quota, QuotaExceededError, PRIORITY_INTERACTIVE
+from app.services.relevance import rerank
+
+# (query, days, limit, description) -> (stored_at, summarized articles); the description changes the ranking
+_article_cache: Dict[Tuple[str, int, int, str], Tuple[float, List[Article]]] = {}
+
+# Upper bound for one NewsAPI request
+NEWS_API_TIMEOUT = 20.0
+# NewsAPI's largest pageSize
+NEWS_API_MAX_PAGE = 100
+
+
+def _cache_get(key: Tuple[str, int, int, str], max_age: float):
+    entry = _article_cache.get(key)
+    if entry and time.time() - entry[0] <= max_age:
+        return entry[1]
+    return None
+
+
+def _cache_put(key: Tuple[str, int, int, str], articles: List[Article]):
+    now = time.time()
+    # Drop entries too old to be served even as stale data
+    for stale_key in [k for k, (stored_at, _) in _article_cache.items()
+                      if now - stored_at > settings.NEWS_CACHE_MAX_STALE_SECONDS]:
+        del _article_cache[stale_key]
+    _article_cache[key] = (now, articles)
+
+
+def _parse_keywords(keywords: str) -> Tuple[str, List[str]]:
+    """Normalize keywords: if provided comma-separated, convert to OR query for NewsAPI"""
+    q = keywords
+    parts: List[str] = []
+    if isinstance(keywords, str) and "," in keywords:
+        # remove extra spaces and replace commas with ' OR '
+        parts = [p.strip() for p in keywords.split(',') if p.strip()]
+        q = ' OR '.join(parts)
+    return q, parts
+
+
+def _pool_size(limit: int) -> int:
+    """Candidates to consider for `limit` articles when re-ranking locally"""
+    return max(limit, min(settings.NEWS_RERANK_POOL, NEWS_API_MAX_PAGE))
+
+
+def _best(articles: List[Article], parts: List[str], description: Optional[str], limit: int) -> List[Article]:
+    """The `limit` most relevant candidates, or the first `limit` with re-ranking off"""
+    if settings.NEWS_RERANK_POOL <= 0:
+        return articles[:limit]
+    return rerank(articles, parts, description, limit)
+
+
+def _merge(stored: List[Article], fetched: List[Article], limit: int) -> List[Article]:
+    """Local results first, then fetched articles they do not already include"""
+    seen = {a.url for a in stored}
+    return (stored + [a for a in fetched if a.url not in seen])[:limit]
+
 
 class NewsService:
     def __init__(self):
         self.api_key = settings.NEWS_API_KEY
         self.base_url = settings.NEWS_API_URL
-    
-    async def fetch_news(self, keywords: str, days: int = 1, limit: int = 10) -> List[Dict[str, Any]]:
+
+    def get_cached(self, keywords: str, days: int = 1, limit: int = 10, max_age: Optional[float] = None,
+                   description: Optional[str] = None) -> Optional[List[Article]]:
+        """Summarized articles from a recent fetch ranked for the same description, or None"""
+        if max_age is None:
+            max_age = settings.NEWS_CACHE_TTL_SECONDS
+        return _cache_get((_parse_keywords(keywords)[0], days, limit, description or ""), max_age)
+
+    def store(self, keywords: str, days: int, limit: int, articles: List[Article], description: Optional[str] = None):
+        """Cache summarized articles for later fetches of the same query and description"""
+        _cache_put((_parse_keywords(keywords)[0], days, limit, description or ""), articles)
+
+    async def fetch_news(self, keywords: str, days: int = 1, limit: int = 10, priority: str = PRIORITY_INTERACTIVE,
+                         deadline: Optional[Deadline] = None, description: Optional[str] = None) -> List[Article]:
         """
         Fetch news articles from NewsAPI
-        
+
+        Up to NEWS_RERANK_POOL candidates are fetched (or read from the
+        article store) and the best `limit` are kept by local BM25 relevance
+        to the keywords and description (`app.services.relevance`).
+
         Args:
             keywords: Search keywords (comma-separated)
             days: Number of days to look back (1, 7, or 30)
             limit: Maximum number of articles to return
-        
+            priority: Quota priority ('scheduled' sends may use the reserve
+                kept back from 'interactive' previews)
+            deadline: Time budget for fetching and summarizing; when it runs
+                out, cached articles and local summaries are used instead
+            description: Topic description; its terms count for relevance
+                with a lower weight than the keywords
+
         Returns:
             List of news articles
+
+        Raises:
+            QuotaExceededError: budget exhausted and nothing cached to serve
+            DeadlineExceeded: no time left and nothing cached to serve
+        """
+        cached = self.get_cached(keywords, days, limit, description=description)
+        if cached is not None:
+            return cached
+
+        q, parts = _parse_keywords(keywords)
+        query, parts = q.lower(), parts or [keywords]
+        pool = _pool_size(limit)
+        since = utcnow() - timedelta(days=days)
+        # The article store is sync SQLAlchemy; its calls run in a worker thread
+        gap = await asyncio.to_thread(article_store.coverage_gap, query, since) if settings.NEWS_LOCAL_SEARCH else since
+        if gap is None:
+            articles = _best(await asyncio.to_thread(article_store.search, parts, since, pool), parts, description, limit)
+            print(f"Article store: answered keywords={keywords} locally with {len(articles)} articles")
+        else:
+            fetched_at = utcnow()
+            try:
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded("No time left to fetch news")
+                articles = await self.search(
+                    keywords, days, max(pool, STORE_PAGE_SIZE) if settings.NEWS_LOCAL_SEARCH else pool, priority,
+                    timeout=timeout_for(deadline, NEWS_API_TIMEOUT), since=gap if gap > since else None,
+                )
+            except (QuotaExceededError, DeadlineExceeded, httpx.TimeoutException) as e:
+                stale = self.get_cached(keywords, days, limit, settings.NEWS_CACHE_MAX_STALE_SECONDS, description)
+                if stale is not None:
+                    print(f"NewsAPI unavailable ({type(e).__name__}); serving cached articles for keywords={keywords}")
+                    return stale
+                stored = await asyncio.to_thread(article_store.search, parts, since, pool) if settings.NEWS_LOCAL_SEARCH else []
+                stored = _best(stored, parts, description, limit)
+                if not stored:
+                    raise
+                print(f"NewsAPI unavailable ({type(e).__name__}); serving stored articles for keywords={keywords}")
+                return await self._summarize_missing(stored, deadline)
+
+            if settings.NEWS_LOCAL_SEARCH:
+                await asyncio.to_thread(article_store.add, query, articles, since, fetched_at)
+                if gap > since:
+                    # Only the tail was fetched; the rest of the window comes from the store
+                    articles = _merge(await asyncio.to_thread(article_store.search, parts, since, pool), articles, pool)
+            articles = _best(articles, parts, description, limit)
+
+        articles = await self._summarize_missing(articles, deadline)
+        self.store(keywords, days, limit, articles, description)
+        return articles
+
+    async def _summarize_missing(self, articles: List[Article], deadline: Optional[Deadline]) -> List[Article]:
+        """Summarize articles that have no summary yet, keeping stored summaries"""
+        missing = [a for a in articles if not a.summary]
+        if not missing:
+            return articles
+        # Summarize articles with AI service (fallback-friendly)
+        ai = AIService()
+        summarized = iter(await ai.summarize_articles(missing, max_length=200, deadline=deadline))
+        articles = [a if a.summary else next(summarized) for a in articles]
+        if settings.NEWS_LOCAL_SEARCH:
+            await asyncio.to_thread(article_store.save_summaries, articles)
+        return articles
+
+    async def search_ranked(self, keywords: str, days: int = 1, limit: int = 10,
+                            priority: str = PRIORITY_INTERACTIVE, description: Optional[str] = None) -> List[Article]:
+        """Like `search`, but over-fetches and keeps the `limit` most relevant articles"""
+        parts = _parse_keywords(keywords)[1]
+        articles = await self.search(keywords, days, _pool_size(limit), priority)
+        return _best(articles, parts or [keywords], description, limit)
+
+    async def search(self, keywords: str, days: int = 1, limit: int = 10, priority: str = PRIORITY_INTERACTIVE,
+                     timeout: float = NEWS_API_TIMEOUT, since: Optional[datetime] = None,
+                     fallback: bool = True) -> List[Article]:
+        """
+        Query NewsAPI and return articles without summaries
+
+        `timeout` bounds each upstream request. `since` (naive UTC) asks only
+        for articles published after it instead of the last `days` days.
+        With `fallback`, an empty answer to comma-separated keywords is
+        retried one keyword at a time.
+
+        Raises:
+            QuotaExceededError: the request budget does not allow a call
         """
         # Calculate date range
         to_date = datetime.now()
         from_date = to_date - timedelta(days=days)
-        
-        # Normalize keywords: if provided comma-separated, convert to OR query for NewsAPI
-        q = keywords
-        if isinstance(keywords, str) and "," in keywords:
-            # remove extra spaces and replace commas with ' OR '
-            parts = [p.strip() for p in keywords.split(',') if p.strip()]
-            q = ' OR '.join(parts)
+
+        q, parts = _parse_keywords(keywords)
 
         if not self.api_key:
             raise RuntimeError("NEWS_API_KEY is not configured")
 
+        if not await asyncio.to_thread(news_quota.try_acquire, priority):
+            raise QuotaExceededError("NewsAPI request budget exhausted; try again later")
+
         params = {
             "q": q,
             "from": from_date.strftime("%Y-%m-%d"),
@@ -46,14 +211,19 @@ class NewsService:
             "pageSize": limit,
             "language": "en"
         }
+        if since is not None:
+            params["from"] = since.strftime("%Y-%m-%dT%H:%M:%S")
+            del params["to"]
 
         headers = {
             "X-Api-Key": self.api_key
         }
-        
+
         try:
-            async with httpx.AsyncClient() as client:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                started = time.perf_counter()
                 response = await client.get(self.base_url, params=params, headers=headers)
+                upstream_latency.record(NEWSAPI, time.perf_counter() - started)
                 # Log status for debugging
                 print(f"NewsAPI request url: {response.url}")
                 print(f"NewsAPI response status: {response.status_code}")
@@ -74,51 +244,29 @@ class NewsService:
 
                 articles = []
                 for article in data.get("articles", [])[:limit]:
-                    articles.append({
-                        "title": article.get("title", ""),
-                        "description": article.get("description", ""),
-                        "url": article.get("url", ""),
-                        "source": article.get("source", {}).get("name", "Unknown"),
-                        "published_at": article.get("publishedAt", ""),
-                        "image_url": article.get("urlToImage")
-                    })
+                    articles.append(Article.from_newsapi(article))
 
                 # Log when no articles are found for visibility
                 if not articles:
                     print(f"NewsAPI returned zero articles for keywords={keywords} (q={q})")
 
                     # Fallback: if original keywords were comma-separated, try each part separately
-                    if isinstance(keywords, str) and "," in keywords:
-                        for part in parts:
-                            if not part:
-                                continue
-                            params_single = {**params, "q": part}
-                            resp2 = await client.get(self.base_url, params=params_single, headers={'X-Api-Key': self.api_key})
-                            try:
-                                resp2.raise_for_status()
-                                data2 = resp2.json()
-                                arts2 = data2.get("articles", [])[:limit]
-                                if arts2:
-                                    found = []
-                                    for article in arts2:
-                                        found.append({
-                                            "title": article.get("title", ""),
-                                            "description": article.get("description", ""),
-                                            "url": article.get("url", ""),
-                                            "source": article.get("source", {}).get("name", "Unknown"),
-                                            "published_at": article.get("publishedAt", ""),
-                                            "image_url": article.get("urlToImage")
-                                        })
-                                    print(f"NewsAPI fallback succeeded for keyword='{part}' with {len(found)} articles")
-                                    # Summarize found articles before returning
-                                    ai = AIService()
-                                    return await ai.summarize_articles(found, max_length=200)
-                            except Exception:
-                                continue
-
-                # Summarize articles with AI service (fallback-friendly)
-                ai = AIService()
-                articles = await ai.summarize_articles(articles, max_length=200)
+                    for part in (parts if fallback else []):
+                        if not await asyncio.to_thread(news_quota.try_acquire, priority):
+                            print("NewsAPI budget low; skipping per-keyword fallback queries")
+                            break
+                        params_single = {**params, "q": part}
+                        resp2 = await client.get(self.base_url, params=params_single, headers={'X-Api-Key': self.api_key})
+                        try:
+                            resp2.raise_for_status()
+                            data2 = resp2.json()
+                            arts2 = data2.get("articles", [])[:limit]
+                            if arts2:
+                                articles.extend(Article.from_newsapi(article) for article in arts2)
+                                print(f"NewsAPI fallback succeeded for keyword='{part}' with {len(articles)} articles")
+                                break
+                        except Exception:
+                            continue
 
                 return articles
 
@@ -0,0 +1,265 @@
+"""
+Outbox: deliveries planned for later, kept in the database
+
+A digest run with a delivery window (or local delivery times) slots each
+user hours ahead. Instead of a worker sleeping until then, the planned
+sends are written to `outbox_deliveries`, and the scheduler's outbox job
+sends whatever is due every OUTBOX_POLL_SECONDS. Planned sends survive
+restarts and any node may deliver them. Rows are claimed with a guarded
+UPDATE, so each is sent once. A claim older than CLAIM_TIMEOUT (its node
+died mid-send) is taken over.
+
+Each delivery carries the start time of the run that planned it, and its
+subscriptions are stamped with that time when it goes out (see
+`delivery_service.mark_sent`). Deliveries still unsent at their expiry
+are dropped, and their subscriptions stay due for the next run.
+
+Sends that fail transiently (see `app.services.delivery_service`) come
+back here as retries: the same message and subscriptions, due at the
+address's `next_retry_at`. A retry that fails again is rescheduled with
+the next backoff step until the address is suppressed or RETRY_EXPIRY has
+passed since the run that planned it.
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.delivery_status import DeliveryStatus
+from app.models.outbox import OutboxDelivery, OutboxMessage
+from app.services.delivery_service import mark_sent
+from app.services.email_service import EmailService, PreparedMessage
+from app.services.send_planner import PlannedSend
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+EXPIRED = "expired"
+# Count key in `deliver_due` results: failed deliveries queued again
+RETRY = "retry"
+
+# Deliveries claimed (and sent over one connection per message) at a time
+CLAIM_BATCH = 20
+# A claim this old belongs to a node that died mid-send
+CLAIM_TIMEOUT = timedelta(minutes=10)
+# Finished deliveries are kept this long for inspection
+RETENTION = timedelta(days=7)
+PRUNE_INTERVAL = 3600
+# Retries are dropped this long after the run that planned the send; the content is stale by then
+RETRY_EXPIRY = timedelta(hours=12)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they were stored as UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _utc(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+class Outbox:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._pruned_at = 0.0
+
+    def enqueue(self, deliveries: Iterable[PlannedSend], run_at: float, expires_at: Optional[float] = None) -> int:
+        """
+        Store planned sends
+
+        Args:
+            deliveries: (slot as epoch seconds, (email, prepared message,
+                subscription IDs)) pairs; a prepared message shared by many
+                users is stored once
+            run_at: Start of the run that planned them (epoch seconds)
+            expires_at: Deliveries not sent by then are dropped
+        """
+        db = self.session_factory()
+        try:
+            messages: Dict[int, OutboxMessage] = {}
+            rows: List[Tuple[int, OutboxDelivery]] = []
+            for send_at, (email, prepared, subscription_ids) in deliveries:
+                if id(prepared) not in messages:
+                    messages[id(prepared)] = OutboxMessage(subject=prepared.subject, html_body=prepared.html_body)
+                rows.append((id(prepared), OutboxDelivery(
+                    email=email,
+                    subscription_ids=json.dumps(list(subscription_ids)),
+                    send_at=_utc(send_at),
+                    expires_at=_utc(expires_at) if expires_at is not None else None,
+                    run_at=_utc(run_at),
+                    status=PENDING,
+                )))
+            db.add_all(messages.values())
+            db.flush()
+            for key, row in rows:
+                row.message_id = messages[key].id
+            db.add_all(row for _, row in rows)
+            db.commit()
+            return len(rows)
+        finally:
+            db.close()
+
+    def enqueue_retries(self, failed: Iterable[Tuple[str, PreparedMessage, Iterable[int]]], run_at: float) -> int:
+        """
+        Re-send to addresses deferred after a transient failure
+
+        Each (email, prepared message, subscription IDs) is queued for the
+        address's `next_retry_at`. Addresses without one (suppressed, or the
+        failure was our SMTP server's) are not retried.
+
+        Args:
+            failed: Failed sends of one run
+            run_at: Start of the run that planned them (epoch seconds)
+        """
+        failed = list(failed)
+        if not failed:
+            return 0
+        db = self.session_factory()
+        try:
+            retry_at = self._retry_times(db, [email for email, _, _ in failed])
+        finally:
+            db.close()
+        deliveries = [(retry_at[email].timestamp(), (email, prepared, subscription_ids))
+                      for email, prepared, subscription_ids in failed if email in retry_at]
+        if not deliveries:
+            return 0
+        count = self.enqueue(deliveries, run_at, expires_at=run_at + RETRY_EXPIRY.total_seconds())
+        print(f"Outbox: {count} transient failures queued for retry")
+        return count
+
+    def _retry_times(self, db: Session, emails: List[str]) -> Dict[str, datetime]:
+        """UTC retry time of each address backing off after a transient failure"""
+        # Delivery tracking keeps local naive times, like last_sent_at
+        now = datetime.now()
+        rows = db.query(DeliveryStatus.email, DeliveryStatus.next_retry_at).filter(
+            DeliveryStatus.email.in_(emails),
+            DeliveryStatus.suppressed == False,
+            DeliveryStatus.next_retry_at > now,
+        )
+        return {email: retry_at.astimezone(timezone.utc) for email, retry_at in rows}
+
+    def pending_subscription_ids(self, db: Session) -> Set[int]:
+        """Subscriptions with a delivery still waiting in the outbox; not due again until it is sent"""
+        pending: Set[int] = set()
+        for (ids,) in db.query(OutboxDelivery.subscription_ids).filter(OutboxDelivery.status.in_([PENDING, SENDING])):
+            pending.update(json.loads(ids))
+        return pending
+
+    def _claim(self, db: Session, now: datetime) -> List[OutboxDelivery]:
+        claimable = and_(
+            OutboxDelivery.send_at <= now,
+            or_(
+                OutboxDelivery.status == PENDING,
+                and_(OutboxDelivery.status == SENDING, OutboxDelivery.claimed_at < now - CLAIM_TIMEOUT),
+            ),
+        )
+        ids = [row_id for (row_id,) in db.query(OutboxDelivery.id).filter(claimable)
+               .order_by(OutboxDelivery.send_at).limit(CLAIM_BATCH)]
+        if not ids:
+            return []
+        # Re-checked in the UPDATE, so a row another node claimed meanwhile is left alone
+        token = uuid.uuid4().hex
+        db.query(OutboxDelivery).filter(OutboxDelivery.id.in_(ids), claimable).update(
+            {OutboxDelivery.status: SENDING, OutboxDelivery.owner: token, OutboxDelivery.claimed_at: now},
+            synchronize_session=False,
+        )
+        db.commit()
+        return db.query(OutboxDelivery).filter(OutboxDelivery.owner == token,
+                                               OutboxDelivery.status == SENDING).all()
+
+    def _expire(self, db: Session, now: datetime) -> int:
+        expired = db.query(OutboxDelivery).filter(
+            OutboxDelivery.status == PENDING, OutboxDelivery.expires_at < now
+        ).update({OutboxDelivery.status: EXPIRED}, synchronize_session=False)
+        db.commit()
+        if expired:
+            print(f"Outbox: {expired} deliveries expired unsent; their subscriptions stay due")
+        return expired
+
+    def deliver_due(self, email_service: Optional[EmailService] = None) -> Dict[str, int]:
+        """
+        Send every delivery that is due now; returns counts by outcome
+
+        Blocks on SMTP; async callers run it in a thread.
+        """
+        email_service = email_service or EmailService()
+        counts = {SENT: 0, FAILED: 0, EXPIRED: 0, RETRY: 0}
+        db = self.session_factory()
+        try:
+            counts[EXPIRED] = self._expire(db, utcnow())
+            while True:
+                claimed = self._claim(db, utcnow())
+                if not claimed:
+                    break
+                by_message: Dict[int, List[OutboxDelivery]] = {}
+                for row in claimed:
+                    by_message.setdefault(row.message_id, []).append(row)
+                for message_id, rows in by_message.items():
+                    message = db.get(OutboxMessage, message_id)
+                    prepared = PreparedMessage(message.subject, message.html_body)
+                    failures = email_service.send_prepared_batch([row.email for row in rows], prepared)
+                    # Subscriptions count as sent at the run that planned them (local time, like last_sent_at)
+                    sent_by_run: Dict[datetime, List[int]] = {}
+                    for row in rows:
+                        row.status = FAILED if row.email in failures else SENT
+                        row.error = failures.get(row.email)
+                        counts[row.status] += 1
+                        if row.status == SENT:
+                            run_at = _as_utc(row.run_at).astimezone().replace(tzinfo=None)
+                            sent_by_run.setdefault(run_at, []).extend(json.loads(row.subscription_ids))
+                    counts[RETRY] += self._reschedule(db, [row for row in rows if row.status == FAILED])
+                    db.commit()
+                    for run_at, subscription_ids in sent_by_run.items():
+                        mark_sent(subscription_ids, run_at)
+            self._prune(db)
+        finally:
+            db.close()
+        if counts[SENT] or counts[FAILED]:
+            print(f"Outbox: sent {counts[SENT]}, failed {counts[FAILED]} ({counts[RETRY]} to be retried)")
+        return counts
+
+    def _reschedule(self, db: Session, failed: List[OutboxDelivery]) -> int:
+        """Queue failed deliveries again at their addresses' retry times, within the retry expiry"""
+        if not failed:
+            return 0
+        retry_at = self._retry_times(db, [row.email for row in failed])
+        count = 0
+        for row in failed:
+            send_at = retry_at.get(row.email)
+            expires_at = _as_utc(row.run_at) + RETRY_EXPIRY
+            if send_at is None or send_at >= expires_at:
+                continue
+            db.add(OutboxDelivery(
+                message_id=row.message_id,
+                email=row.email,
+                subscription_ids=row.subscription_ids,
+                send_at=send_at,
+                expires_at=expires_at,
+                run_at=row.run_at,
+                status=PENDING,
+            ))
+            count += 1
+        return count
+
+    def _prune(self, db: Session):
+        if time.time() - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = time.time()
+        cutoff = utcnow() - RETENTION
+        db.query(OutboxDelivery).filter(
+            OutboxDelivery.status.in_([SENT, FAILED, EXPIRED]), OutboxDelivery.send_at < cutoff
+        ).delete(synchronize_session=False)
+        in_use = db.query(OutboxDelivery.message_id)
+        db.query(OutboxMessage).filter(OutboxMessage.id.not_in(in_use)).delete(synchronize_session=False)
+        db.commit()
+
+
+outbox = Outbox()
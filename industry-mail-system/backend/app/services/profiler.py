@@ -0,0 +1,265 @@
+"""
+Opt-in sampling profiler for requests and scheduler runs
+
+Off by default. PROFILE_SAMPLE_RATE profiles that fraction of API requests,
+PROFILE_SCHEDULER_RATE that fraction of scheduler runs. When PROFILE_TOKEN
+is set, a request sent with `X-Profile: <token>` is always profiled and its
+response carries `X-Profile-Id`.
+
+A profile is a wall-clock stack sample every PROFILE_INTERVAL_MS. Sync
+routes run in worker threads and scheduler runs call the API over HTTP,
+so every thread executing app code is sampled, not just the one that
+started the profile. Requests running at the same time as a profiled one
+show up in its profile too. Only one profile runs at a time per process.
+Scheduler runs spend most of their send window waiting between batches, so
+their profiles stop after PROFILE_SCHEDULER_MAX_SECONDS and free the slot
+for requests; the rest of the run goes unprofiled.
+
+Each profile is written to PROFILE_DIR as
+    <id>_<route>_<ms>ms.collapsed   folded stacks for flamegraph.pl or speedscope
+    <id>_<route>_<ms>ms.json        route, duration, timestamp and hottest functions
+
+With both rates at 0 and no token, the middleware costs one comparison
+per request.
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.config import settings
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.dirname(APP_DIR)
+# Long requests stop sampling after this long; the profile is marked truncated
+MAX_PROFILE_SECONDS = 600
+TOP_FUNCTIONS = 25
+PROFILE_HEADER = b"x-profile"
+
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _frame_name(code) -> str:
+    path = code.co_filename
+    if "site-packages" + os.sep in path:
+        path = path.rsplit("site-packages" + os.sep, 1)[1]
+    elif path.startswith(BACKEND_DIR):
+        path = os.path.relpath(path, BACKEND_DIR)
+    else:
+        path = os.path.basename(path)
+    name = f"{path}:{getattr(code, 'co_qualname', code.co_name)}"
+    return name.replace(";", ",").replace(" ", "_")
+
+
+class StackSampler:
+    """Samples the stacks of all threads running app code from a background thread"""
+
+    def __init__(self, interval: float, max_seconds: float, on_limit: Optional[Callable[[], Any]] = None):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.on_limit = on_limit
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.truncated = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        stop_at = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > stop_at:
+                self.truncated = True
+                if self.on_limit is not None:
+                    self.on_limit()
+                return
+            names = {t.ident: t.name for t in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = self._stack(frame)
+                if stack:
+                    self.stacks[(names.get(ident, str(ident)),) + stack] += 1
+
+    @staticmethod
+    def _stack(frame) -> Optional[Tuple[str, ...]]:
+        names = []
+        in_app = False
+        while frame is not None:
+            code = frame.f_code
+            in_app = in_app or code.co_filename.startswith(APP_DIR)
+            names.append(_frame_name(code))
+            frame = frame.f_back
+        if not in_app:
+            # Idle workers, the event loop waiting on sockets, etc.
+            return None
+        names.reverse()
+        return tuple(names)
+
+
+class ProfileRun:
+    def __init__(self, profiler: "Profiler", kind: str, forced: bool, label: str, max_seconds: float):
+        self.profiler = profiler
+        self.kind = kind
+        self.forced = forced
+        self.label = label
+        self.id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._finished = False
+        self._finish_lock = threading.Lock()
+        self.sampler = StackSampler(profiler.interval, max_seconds, on_limit=self.finish)
+        self.sampler.start()
+
+    def finish(self, label: Optional[str] = None, **meta: Any) -> Optional[str]:
+        """
+        Stop sampling and write the profile; returns the path of the JSON file
+
+        Writes files, so async callers run it in a thread. Called by the
+        sampler itself when the run outlives its limit; the run's own call
+        is then a no-op.
+        """
+        with self._finish_lock:
+            if self._finished:
+                return None
+            self._finished = True
+        duration = time.perf_counter() - self._start
+        try:
+            stacks = self.sampler.stop()
+            return self.profiler.write(self, label or self.label, duration, stacks, meta)
+        except Exception as e:
+            print(f"Profiler: failed to write profile {self.id}: {e}")
+            return None
+        finally:
+            self.profiler.release()
+
+
+class Profiler:
+    def __init__(self):
+        self.directory = settings.PROFILE_DIR
+        self.request_rate = settings.PROFILE_SAMPLE_RATE
+        self.scheduler_rate = settings.PROFILE_SCHEDULER_RATE
+        self.scheduler_max_seconds = settings.PROFILE_SCHEDULER_MAX_SECONDS
+        self.token = settings.PROFILE_TOKEN.encode()
+        self.interval = max(1, settings.PROFILE_INTERVAL_MS) / 1000
+        self.requests_enabled = self.request_rate > 0 or bool(self.token)
+        self._lock = threading.Lock()
+
+    def forced(self, headers) -> bool:
+        """True when the request carries the profiling token"""
+        if not self.token:
+            return False
+        return any(name == PROFILE_HEADER and hmac.compare_digest(value, self.token) for name, value in headers)
+
+    def start(self, kind: str, rate: float, forced: bool = False, label: Optional[str] = None,
+              max_seconds: float = MAX_PROFILE_SECONDS) -> Optional[ProfileRun]:
+        """
+        Begin a profile if forced or sampled at `rate`; None when skipped or one is already running
+
+        Sampling stops after `max_seconds`; the profile is then written
+        under `label` (default `kind`) and the slot is freed.
+        """
+        if not forced and (rate <= 0 or random.random() >= rate):
+            return None
+        if not self._lock.acquire(blocking=False):
+            if forced:
+                print("Profiler: another profile is running; forced profile skipped")
+            return None
+        try:
+            return ProfileRun(self, kind, forced, label or kind, max_seconds)
+        except Exception:
+            self._lock.release()
+            raise
+
+    def release(self):
+        self._lock.release()
+
+    def write(self, run: ProfileRun, label: str, duration: float,
+              stacks: Counter, meta: Dict[str, Any]) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = _SAFE.sub("_", label).strip("_")[:80] or run.kind
+        stem = os.path.join(self.directory, f"{run.id}_{slug}_{round(duration * 1000)}ms")
+
+        with open(stem + ".collapsed", "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        for stack, count in stacks.items():
+            self_samples[stack[-1]] += count
+            for name in set(stack[1:]):
+                total_samples[name] += count
+
+        summary = {
+            "id": run.id,
+            "kind": run.kind,
+            "route": label,
+            "duration_ms": round(duration * 1000, 1),
+            "started_at": run.started_at.isoformat(),
+            "forced": run.forced,
+            "interval_ms": self.interval * 1000,
+            "samples": run.sampler.samples,
+            "truncated": run.sampler.truncated,
+            **meta,
+            "top_self": [{"function": n, "samples": c} for n, c in self_samples.most_common(TOP_FUNCTIONS)],
+            "top_total": [{"function": n, "samples": c} for n, c in total_samples.most_common(TOP_FUNCTIONS)],
+        }
+        with open(stem + ".json", "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Profiler: {label} took {duration * 1000:.0f}ms, profile written to {stem}.json")
+        return stem + ".json"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling a sampled fraction of requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.requests_enabled:
+            return await self.app(scope, receive, send)
+
+        run = profiler.start("request", profiler.request_rate, profiler.forced(scope["headers"]))
+        if run is None:
+            return await self.app(scope, receive, send)
+
+        status = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", run.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            # The matched route's template ("/api/users/{user_id}") groups profiles better than the raw path
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            await asyncio.to_thread(run.finish, f"{scope['method']} {path}", path=scope["path"],
+                                    status=status.get("code"))
+
+
+profiler = Profiler()
@@ -0,0 +1,216 @@
+"""
+Cross-topic query planner
+
+Scheduled runs used to ask NewsAPI at least once per topic. The planner
+packs the keywords of many topics into as few combined OR queries as the
+NewsAPI query length (NEWS_QUERY_MAX_CHARS) allows. Keywords shared by
+several topics appear only once. Each article returned is routed back to
+the topics it matches by a single Aho-Corasick scan over its title and
+description. The routed articles go into the article store
+(`app.services.article_store`), so each topic's own `fetch_news` is then
+answered locally.
+
+A topic only counts as covered when at least `min_articles` articles were
+routed to it. A combined query returns at most STORE_PAGE_SIZE articles, so
+a topic with few matches would otherwise get a thin newsletter. Topics left
+uncovered keep their stored articles and fall back to their own query.
+Planning needs NEWS_LOCAL_SEARCH.
+"""
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+import httpx
+from app.config import settings
+from app.services.article import Article
+from app.services.article_store import STORE_PAGE_SIZE, ArticleStore, article_store, query_terms, utcnow
+from app.services.deadline import Deadline, DeadlineExceeded, timeout_for
+from app.services.news_service import NEWS_API_TIMEOUT, NewsService, _parse_keywords
+from app.services.quota_service import PRIORITY_SCHEDULED, QuotaExceededError
+
+_SEPARATOR = " OR "
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over lowercased words; reports whole-word matches"""
+
+    def __init__(self, words: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for word in {w.lower() for w in words if w}:
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = self._goto[state][ch] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(word)
+
+        # Breadth-first, so every failure link points at an already finished state;
+        # states one character deep fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Set[str]:
+        """Words occurring in `text` as whole words, in one pass"""
+        text = text.lower()
+        found: Set[str] = set()
+        state = 0
+        for idx, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for word in self._out[state]:
+                start = idx - len(word) + 1
+                if (start == 0 or not _is_word_char(text[start - 1])) and \
+                        (idx + 1 == len(text) or not _is_word_char(text[idx + 1])):
+                    found.add(word)
+        return found
+
+
+class TopicQuery:
+    """One topic's keywords: NewsAPI clauses, coverage key and routing terms"""
+
+    def __init__(self, keywords: str):
+        q, parts = _parse_keywords(keywords)
+        self.keywords = keywords
+        self.query = q.lower()
+        # Multi-word keywords are grouped so they keep their meaning inside a larger OR
+        self.clauses = [f"({p})" if " " in p.strip() else p.strip() for p in (parts or [keywords])]
+        self.groups = [[w.lower() for w in words] for words in query_terms(parts or [keywords])]
+
+    def matches(self, words: Set[str]) -> bool:
+        return any(all(w in words for w in group) for group in self.groups)
+
+
+class PlannedQuery:
+    """A combined NewsAPI query and the topics it serves"""
+
+    def __init__(self):
+        self.topics: List[TopicQuery] = []
+        self.clauses: List[str] = []
+
+    def length_with(self, topic: TopicQuery) -> int:
+        clauses = self.clauses + [c for c in topic.clauses if c not in self.clauses]
+        return len(_SEPARATOR.join(clauses))
+
+    def add(self, topic: TopicQuery):
+        self.topics.append(topic)
+        self.clauses.extend(c for c in topic.clauses if c not in self.clauses)
+
+    @property
+    def keywords(self) -> str:
+        """Comma-separated, as `NewsService.search` expects"""
+        return ",".join(self.clauses)
+
+
+class QueryPlanner:
+    def __init__(self, news_service: Optional[NewsService] = None, store: ArticleStore = article_store,
+                 max_chars: Optional[int] = None):
+        self.news_service = news_service or NewsService()
+        self.store = store
+        self.max_chars = settings.NEWS_QUERY_MAX_CHARS if max_chars is None else max_chars
+
+    def plan(self, topics: Iterable[TopicQuery]) -> List[PlannedQuery]:
+        """
+        First-fit decreasing: the longest topics are placed first, each into
+        the first query it still fits. A topic too long for any combined
+        query gets a query of its own.
+        """
+        planned: List[PlannedQuery] = []
+        for topic in sorted(topics, key=lambda t: -len(_SEPARATOR.join(t.clauses))):
+            target = next((p for p in planned if p.length_with(topic) <= self.max_chars), None)
+            if target is None:
+                target = PlannedQuery()
+                planned.append(target)
+            target.add(topic)
+        return planned
+
+    def route(self, topics: List[TopicQuery], articles: List[Article]) -> Dict[str, List[Article]]:
+        """Articles per topic coverage key, by whole-word matches in title and description"""
+        matcher = KeywordMatcher(w for t in topics for group in t.groups for w in group)
+        routed: Dict[str, List[Article]] = {t.query: [] for t in topics}
+        for article in articles:
+            words = matcher.find(f"{article.title or ''}\n{article.description or ''}")
+            if not words:
+                continue
+            for topic in topics:
+                if topic.matches(words):
+                    routed[topic.query].append(article)
+        return routed
+
+    async def prefetch(self, keyword_sets: Iterable[str], days: int, min_articles: int = 10,
+                       priority: str = PRIORITY_SCHEDULED, deadline: Optional[Deadline] = None) -> Dict[str, int]:
+        """
+        Fetch the topics' articles with combined queries ahead of a run
+
+        Topics whose search the store already covers are skipped. Returns
+        counts of queries made and topics covered.
+        """
+        stats = {"topics": 0, "queries": 0, "covered": 0}
+        if not settings.NEWS_LOCAL_SEARCH or self.max_chars <= 0:
+            return stats
+        since = utcnow() - timedelta(days=days)
+        pending: Dict[str, TopicQuery] = {}
+        gaps: Dict[str, datetime] = {}
+        for keywords in keyword_sets:
+            topic = TopicQuery(keywords)
+            if topic.query in pending or not topic.groups:
+                continue
+            gap = await asyncio.to_thread(self.store.coverage_gap, topic.query, since)
+            if gap is not None:
+                pending[topic.query] = topic
+                gaps[topic.query] = gap
+        stats["topics"] = len(pending)
+
+        for planned in self.plan(pending.values()):
+            # A query serving one topic gains nothing; that topic's own fetch handles it
+            if len(planned.topics) < 2:
+                continue
+            start = min(gaps[t.query] for t in planned.topics)
+            fetched_at = utcnow()
+            try:
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded("No time left to prefetch news")
+                articles = await self.news_service.search(
+                    planned.keywords, days, STORE_PAGE_SIZE, priority,
+                    timeout=timeout_for(deadline, NEWS_API_TIMEOUT),
+                    since=start if start > since else None, fallback=False,
+                )
+            except (QuotaExceededError, DeadlineExceeded) as e:
+                print(f"Query planner: stopping early ({type(e).__name__}); remaining topics fetch on their own")
+                break
+            except (httpx.HTTPError, RuntimeError) as e:
+                print(f"Query planner: combined query for {len(planned.topics)} topics failed: {e}")
+                continue
+            stats["queries"] += 1
+
+            routed_by_topic = self.route(planned.topics, articles)
+            for topic in planned.topics:
+                routed = routed_by_topic[topic.query]
+                covered = len(routed) >= min_articles
+                await asyncio.to_thread(self.store.add, topic.query, routed, since if covered else None, fetched_at)
+                stats["covered"] += covered
+
+        print(f"Query planner: {stats['queries']} combined NewsAPI queries covered "
+              f"{stats['covered']}/{stats['topics']} topics")
+        return stats
+
+
+query_planner = QueryPlanner()
@@ -0,0 +1,147 @@
+"""
+NewsAPI quota budgeting
+
+Tracks upstream requests in a rolling window and decides whether a request
+may spend budget. Scheduled sends may use the whole budget; interactive
+previews stop once only the reserve for scheduled sends is left, and callers
+then degrade to cached data.
+
+The NewsAPI key's budget is shared by every worker process and node, so
+the count lives in the database: `news_api_quota_slots` holds one row per
+request in the budget. A request takes a slot last used before the window
+with a guarded UPDATE (like scheduler claims), so concurrent processes can
+never spend more than NEWS_API_QUOTA between them, and restarts do not
+reset the count. The interactive reserve is checked against a count taken
+just before, so concurrent previews may dip into it by a request or two.
+
+Blocks on the database; async callers run it in a thread.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.quota_slot import NewsApiQuotaSlot
+
+PRIORITY_SCHEDULED = "scheduled"
+PRIORITY_INTERACTIVE = "interactive"
+
+# Tries to take a free slot before giving up when other processes keep winning the race
+CLAIM_ATTEMPTS = 5
+
+
+class QuotaExceededError(RuntimeError):
+    """Raised when no budget is left and no cached data can be served"""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they were stored as UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class NewsApiQuota:
+    def __init__(self, limit: int, window_seconds: int, interactive_reserve: int,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.interactive_reserve = min(interactive_reserve, limit)
+        self.session_factory = session_factory
+        self._seeded = False
+
+    def _ensure_slots(self, db: Session):
+        """Create the slot rows for the configured limit, once per process"""
+        if self._seeded:
+            return
+        existing = {slot_id for (slot_id,) in db.query(NewsApiQuotaSlot.id).filter(NewsApiQuotaSlot.id <= self.limit)}
+        missing = [slot_id for slot_id in range(1, self.limit + 1) if slot_id not in existing]
+        if missing:
+            db.bulk_insert_mappings(NewsApiQuotaSlot, [{"id": slot_id} for slot_id in missing])
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another process seeded them first
+                db.rollback()
+        self._seeded = True
+
+    def _free(self, now: datetime):
+        """Slots of the budget not used within the window"""
+        cutoff = now - timedelta(seconds=self.window_seconds)
+        return (NewsApiQuotaSlot.id <= self.limit,
+                or_(NewsApiQuotaSlot.used_at.is_(None), NewsApiQuotaSlot.used_at <= cutoff))
+
+    def _floor(self, priority: str) -> int:
+        """Budget that must remain untouched for this priority"""
+        return 0 if priority == PRIORITY_SCHEDULED else self.interactive_reserve
+
+    def remaining(self) -> int:
+        db = self.session_factory()
+        try:
+            self._ensure_slots(db)
+            return db.query(func.count(NewsApiQuotaSlot.id)).filter(*self._free(utcnow())).scalar()
+        finally:
+            db.close()
+
+    def try_acquire(self, priority: str = PRIORITY_INTERACTIVE) -> bool:
+        """Record one upstream request if the budget allows it"""
+        db = self.session_factory()
+        try:
+            self._ensure_slots(db)
+            for _ in range(CLAIM_ATTEMPTS):
+                now = utcnow()
+                free = self._free(now)
+                available = db.query(func.count(NewsApiQuotaSlot.id)).filter(*free).scalar()
+                if available <= self._floor(priority):
+                    return False
+                # A random free slot, so concurrent processes rarely reach for the same one
+                slot_id = (db.query(NewsApiQuotaSlot.id).filter(*free).order_by(NewsApiQuotaSlot.id)
+                           .offset(random.randrange(available)).limit(1).scalar())
+                if slot_id is None:
+                    continue
+                # Re-checked in the UPDATE, so a slot another process took meanwhile is left alone
+                taken = db.query(NewsApiQuotaSlot).filter(NewsApiQuotaSlot.id == slot_id, *free).update(
+                    {NewsApiQuotaSlot.used_at: now, NewsApiQuotaSlot.priority: priority},
+                    synchronize_session=False,
+                )
+                db.commit()
+                if taken:
+                    return True
+            return False
+        finally:
+            db.close()
+
+    def status(self) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            self._ensure_slots(db)
+            now = utcnow()
+            cutoff = now - timedelta(seconds=self.window_seconds)
+            used, oldest = db.query(func.count(NewsApiQuotaSlot.id), func.min(NewsApiQuotaSlot.used_at)).filter(
+                NewsApiQuotaSlot.id <= self.limit, NewsApiQuotaSlot.used_at > cutoff
+            ).one()
+        finally:
+            db.close()
+        resets_in = int((_as_utc(oldest) - cutoff).total_seconds()) if oldest else 0
+        remaining = max(self.limit - used, 0)
+        return {
+            "limit": self.limit,
+            "used": used,
+            "remaining": remaining,
+            "interactive_remaining": max(remaining - self.interactive_reserve, 0),
+            "reserved_for_scheduled": self.interactive_reserve,
+            "window_seconds": self.window_seconds,
+            "next_release_seconds": max(resets_in, 0),
+        }
+
+
+news_quota = NewsApiQuota(
+    settings.NEWS_API_QUOTA,
+    settings.NEWS_API_QUOTA_WINDOW_HOURS * 3600,
+    settings.NEWS_API_INTERACTIVE_RESERVE,
+)
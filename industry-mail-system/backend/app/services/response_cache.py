@@ -0,0 +1,130 @@
+"""
+Conditional GET and response caching for read endpoints
+
+Each read endpoint names the tables its body depends on. Their change
+counters (`app.models.table_version`) give the response's ETag, and the
+newest `changed_at` gives Last-Modified. A request whose If-None-Match (or
+If-Modified-Since) still matches gets a 304 after a single lookup of the
+version rows. The ORM query and serialization are skipped.
+
+The ETag is authoritative. HTTP dates have whole seconds, so Last-Modified
+is the end of the second the last change fell in, and it is only sent once
+that second is over: every later write is stamped at or after it, and a
+client's If-Modified-Since cannot match a body that changed since.
+
+Hot lists can also keep their serialized JSON in a small LRU cache keyed
+by path, query string and ETag, so polls that do not revalidate reuse the
+same bytes until a write changes the version. RESPONSE_CACHE_ENTRIES caps
+the cache; 0 turns it off.
+
+Responses carry `Cache-Control: no-cache`: browsers keep them but
+revalidate on every poll, which is where the 304s come from.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Optional, Sequence, Tuple
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.table_version import TableVersion
+
+
+def table_versions(db: Session, tables: Sequence[str]) -> Tuple[str, Optional[datetime]]:
+    """ETag and last change time of `tables`, without loading any ORM objects"""
+    table = TableVersion.__table__
+    rows = db.execute(
+        select(table.c.table_name, table.c.version, table.c.changed_at).where(table.c.table_name.in_(tables))
+    ).all()
+    found = {name: (version, changed_at) for name, version, changed_at in rows}
+    tag = "+".join(f"{name}.{found.get(name, (0,))[0]}" for name in tables)
+    changed = [changed_at for _, changed_at in found.values() if changed_at is not None]
+    last_modified = max(changed) if changed else None
+    if last_modified is not None and last_modified.tzinfo is None:
+        # SQLite hands back naive datetimes; they were stored as UTC
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return f'W/"{tag}"', last_modified
+
+
+def http_last_modified(last_modified: Optional[datetime], now: datetime) -> Optional[datetime]:
+    """Whole-second Last-Modified for a change at `last_modified`, or None while that second lasts"""
+    if last_modified is None:
+        return None
+    ceiling = last_modified.replace(microsecond=0) + timedelta(seconds=1)
+    return ceiling if ceiling <= now else None
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since. "*" is not matched: it only holds when the
+        # resource exists, which is not known before `load()` runs, so a missing id still gets its 404
+        candidates = [c.strip() for c in if_none_match.split(",")]
+        return etag in candidates or etag[2:] in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # Strictly older: a header from `http_last_modified` lies after the change it stands for
+        return since.tzinfo is not None and last_modified < since
+    return False
+
+
+class ResponseCache:
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = settings.RESPONSE_CACHE_ENTRIES if max_entries is None else max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: Tuple[str, str], etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key: Tuple[str, str], etag: str, body: bytes):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def respond(self, request: Request, db: Session, tables: Sequence[str], adapter: TypeAdapter,
+                load: Callable[[], Any], cache: bool = False) -> Response:
+        """
+        JSON response for `load()`, or 304 when the client's copy is current
+
+        Args:
+            tables: Tables the body is built from; any write to one of them
+                changes the ETag
+            adapter: Serializes what `load` returns (ORM objects are read by attribute)
+            load: Runs the query; only called when the body is needed.
+                HTTPExceptions it raises (e.g. 404) pass through uncached
+            cache: Keep the serialized body for the next request to this URL
+        """
+        etag, last_modified = table_versions(db, tables)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        header_date = http_last_modified(last_modified, datetime.now(timezone.utc))
+        if header_date is not None:
+            headers["Last-Modified"] = format_datetime(header_date.astimezone(timezone.utc), usegmt=True)
+        if _not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
+
+        key = (request.url.path, request.url.query)
+        use_cache = cache and self.max_entries > 0
+        body = self._get(key, etag) if use_cache else None
+        if body is None:
+            body = adapter.dump_json(adapter.validate_python(load(), from_attributes=True))
+            if use_cache:
+                self._put(key, etag, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache()
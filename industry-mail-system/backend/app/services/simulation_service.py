@@ -0,0 +1,283 @@
+"""
+Dry-run cost simulation for scheduler runs
+
+Runs a send run's selection and planning against the real database
+without calling NewsAPI, the LLM or SMTP. Selection covers topics,
+deliverable subscribers and due digest subscriptions. Planning covers
+delivery windows and release batches. Each upstream call the run would
+make is counted instead, and its duration comes from the latencies
+recorded in this process (`app.services.latency_stats`).
+
+Estimates, not guarantees:
+ - a topic with a materialized digest for today, fresh cached articles,
+   or a search the article store covers costs no NewsAPI calls; nor does
+   a weekly/monthly digest its stored dailies can roll up
+ - topics the query planner merges share one NewsAPI call per combined
+   query, charged to the first of them (`combined_query`)
+ - NewsAPI may need one extra query per keyword when the combined query
+   finds nothing (`newsapi_calls_max`)
+ - every fetched topic is assumed to return `limit` articles, each one
+   LLM call while the provider's circuit is closed
+ - topics send in parallel through the fair send queue, so the run takes
+   at least its total SMTP time divided by SMTP_CONCURRENCY
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.topic import Topic
+from app.services.ai_service import AIService
+from app.services.article_store import article_store, utcnow
+from app.services.latency_stats import LLM, NEWSAPI, SMTP_CONNECT, SMTP_MESSAGE, LatencyStats, upstream_latency
+from app.services.news_service import NewsService, _parse_keywords
+from app.services.query_planner import QueryPlanner, TopicQuery
+from app.services.quota_service import news_quota
+from app.services.send_planner import SendPlanner, release_batches
+from app.services.topic_digest_service import ARTICLE_LIMIT, topic_digests
+
+MODES = ("newsletter", "digest")
+
+
+class RunSimulator:
+    def __init__(self, news_service: Optional[NewsService] = None, ai_service: Optional[AIService] = None,
+                 latencies: LatencyStats = upstream_latency):
+        self.news_service = news_service or NewsService()
+        self.ai_service = ai_service or AIService()
+        self.topic_digests = topic_digests
+        self.latencies = latencies
+
+    def simulate(self, db: Session, mode: str = "newsletter", topic_ids: Optional[List[int]] = None,
+                 days: int = 1, planner: Optional[SendPlanner] = None) -> Dict[str, Any]:
+        """
+        Predicted upstream calls, messages and duration of one run
+
+        Args:
+            mode: "newsletter" (one email per topic subscription, like the
+                default scheduler run) or "digest" (one email per user)
+            topic_ids: Limit the run to these topics; all active topics by default
+            days: Look-back window of newsletter runs
+            planner: Delivery window the run would use
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        planner = planner or SendPlanner()
+        latency = {name: self.latencies.typical(name) for name in (NEWSAPI, LLM, SMTP_CONNECT, SMTP_MESSAGE)}
+        if mode == "digest":
+            topics, duration = self._digest(db, topic_ids, planner, latency)
+        else:
+            topics, duration = self._newsletter(db, topic_ids, days, planner, latency)
+
+        newsapi_calls = sum(t["newsapi_calls"] for t in topics)
+        deadline_seconds = settings.SEND_DEADLINE_SECONDS + planner.horizon()
+        quota_remaining = news_quota.remaining()
+        return {
+            "mode": mode,
+            "dry_run": True,
+            "generated_at": datetime.now().isoformat(),
+            "window_seconds": planner.window_seconds,
+            "latencies": self.latencies.status(),
+            "topics": topics,
+            "totals": {
+                "topics": len(topics),
+                "newsapi_calls": newsapi_calls,
+                "newsapi_calls_max": sum(t["newsapi_calls_max"] for t in topics),
+                "llm_calls": sum(t["llm_calls"] for t in topics),
+                "messages": sum(t["messages"] for t in topics),
+                "smtp_connections": sum(t["smtp_connections"] for t in topics),
+                "smtp_seconds": round(sum(t["send_seconds"] for t in topics), 1),
+                "estimated_seconds": round(duration, 1),
+                "deadline_seconds": deadline_seconds,
+                "within_deadline": duration <= deadline_seconds,
+                "newsapi_quota_remaining": quota_remaining,
+                "within_quota": newsapi_calls <= quota_remaining,
+            },
+        }
+
+    def _fetch_cost(self, topic_id: int, keywords: str, days: int, latency: Dict[str, float],
+                    description: Optional[str] = None) -> Dict[str, Any]:
+        """Upstream calls and seconds to fetch and summarize one topic"""
+        materialized = self.topic_digests.stored(topic_id, keywords, days) is not None or \
+            (days > 1 and self.topic_digests.rollup(topic_id, keywords, days) is not None)
+        if materialized or self.news_service.get_cached(keywords, days, ARTICLE_LIMIT, description=description) is not None:
+            return {"cached": True, "newsapi_calls": 0, "newsapi_calls_max": 0, "llm_calls": 0, "fetch_seconds": 0.0}
+        q, parts = _parse_keywords(keywords)
+        if settings.NEWS_LOCAL_SEARCH and article_store.coverage_gap(q.lower(), utcnow() - timedelta(days=days)) is None:
+            # Stored articles keep their summaries, so at most a few new ones need the LLM
+            return {"cached": True, "newsapi_calls": 0, "newsapi_calls_max": 0, "llm_calls": 0, "fetch_seconds": 0.0}
+        llm_calls = ARTICLE_LIMIT if self.ai_service._llm_available() else 0
+        return {
+            "cached": False,
+            "newsapi_calls": 1,
+            "newsapi_calls_max": 1 + len(parts),
+            "llm_calls": llm_calls,
+            # Summaries are requested one article at a time
+            "fetch_seconds": round(latency[NEWSAPI] + llm_calls * latency[LLM], 2),
+        }
+
+    def _newsletter(self, db: Session, topic_ids: Optional[List[int]], days: int,
+                    planner: SendPlanner, latency: Dict[str, float]):
+        # Imported lazily: job_service and the scheduler pull in the send path
+        from app.scheduler import TOPIC_START_SHARE
+        from app.services.delivery_service import newsletter_recipients
+        from app.services.job_service import SEND_BATCH
+
+        query = db.query(Topic).filter(Topic.is_active == True)
+        if topic_ids:
+            query = query.filter(Topic.id.in_(topic_ids))
+        # The scheduler starts higher-priority topics first
+        topics = sorted(query.all(), key=lambda t: -(t.priority or 1))
+        start_interval = planner.window_seconds * TOPIC_START_SHARE / max(1, len(topics))
+
+        results = []
+        fetches = []
+        for idx, topic in enumerate(topics):
+            start_offset = idx * start_interval
+            recipients = newsletter_recipients(db, topic.id)
+            estimate = {
+                "topic_id": topic.id,
+                "name": topic.name,
+                "priority": topic.priority or 1,
+                "recipients": len(recipients),
+                "start_offset_seconds": round(start_offset, 1),
+            }
+            if not recipients:
+                # The job stops before fetching when nobody is subscribed
+                estimate.update(cached=False, newsapi_calls=0, newsapi_calls_max=0, llm_calls=0, fetch_seconds=0.0,
+                                messages=0, smtp_connections=0, send_seconds=0.0, finish_seconds=round(start_offset, 1))
+                results.append(estimate)
+                continue
+            estimate.update(self._fetch_cost(topic.id, topic.keywords, days, latency, topic.description))
+            fetches.append((estimate, topic.keywords))
+
+            # Later topics spread their subscribers over what is left of the window
+            topic_planner = SendPlanner(max(0.0, planner.window_seconds - start_offset), planner.local_time,
+                                        start=planner.start + start_offset)
+            planned = topic_planner.plan((sub_id, sub_id, tz) for sub_id, _, tz in recipients)
+            batches = release_batches(planned, SEND_BATCH)
+            # One SMTP connection per batch
+            batch_seconds = [latency[SMTP_CONNECT] + len(batch) * latency[SMTP_MESSAGE] for _, batch in batches]
+            finish = self._timeline(planner.start, start_offset + estimate["fetch_seconds"], batches, batch_seconds)
+            estimate.update(
+                messages=len(recipients),
+                smtp_connections=len(batches),
+                send_seconds=round(sum(batch_seconds), 1),
+                finish_seconds=round(finish, 1),
+            )
+            results.append(estimate)
+
+        self._apply_plan(fetches, latency)
+        # Topics share SMTP_CONCURRENCY workers, so total SMTP time bounds the run as well
+        first_send = min((t["start_offset_seconds"] + t["fetch_seconds"] for t in results if t["messages"]), default=0.0)
+        smtp_bound = first_send + sum(t["send_seconds"] for t in results) / max(1, settings.SMTP_CONCURRENCY)
+        duration = max([smtp_bound] + [t["finish_seconds"] for t in results])
+        return results, duration
+
+    def _digest(self, db: Session, topic_ids: Optional[List[int]], planner: SendPlanner,
+                latency: Dict[str, float]):
+        from app.services.digest_service import DELIVERY_BATCH, DigestService, subscription_days
+
+        digest_service = DigestService(news_service=self.news_service)
+        subscriptions = digest_service.due_subscriptions(db, topic_ids)
+        by_user = digest_service.group_by_user(subscriptions)
+
+        # Sections are fetched once per (topic, days), one after another
+        results = []
+        sections: Dict[tuple, Dict[str, Any]] = {}
+        keywords: Dict[tuple, str] = {}
+        for subscription in subscriptions:
+            key = (subscription.topic_id, subscription_days(subscription))
+            estimate = sections.get(key)
+            if estimate is None:
+                topic = subscription.topic
+                keywords[key] = topic.keywords
+                estimate = sections[key] = {
+                    "topic_id": topic.id,
+                    "name": topic.name,
+                    "days": key[1],
+                    "subscriptions": 0,
+                    **self._fetch_cost(topic.id, topic.keywords, key[1], latency, topic.description),
+                }
+                results.append(estimate)
+            estimate["subscriptions"] += 1
+        # The planner merges topics per look-back window
+        for window in sorted({days for _, days in sections}):
+            self._apply_plan([(estimate, keywords[key]) for key, estimate in sections.items() if key[1] == window],
+                             latency)
+        fetch_seconds = sum(t["fetch_seconds"] for t in results)
+
+        planned = planner.plan(
+            (user_id, user_id, subs[0].user.timezone) for user_id, subs in by_user.items()
+        )
+        batches = release_batches(planned, DELIVERY_BATCH)
+        # Digests are sent one connection per user from a single background task
+        per_message = latency[SMTP_CONNECT] + latency[SMTP_MESSAGE]
+        batch_seconds = [len(batch) * per_message for _, batch in batches]
+        duration = self._timeline(planner.start, fetch_seconds, batches, batch_seconds)
+
+        # Messages and SMTP time are attributed to each user's first section
+        for subs in by_user.values():
+            first = sections[(subs[0].topic_id, subscription_days(subs[0]))]
+            first["messages"] = first.get("messages", 0) + 1
+        for estimate in results:
+            estimate.setdefault("messages", 0)
+            estimate["smtp_connections"] = estimate["messages"]
+            estimate["send_seconds"] = round(estimate["messages"] * per_message, 1)
+        return results, duration
+
+    def _apply_plan(self, estimates: List[tuple], latency: Dict[str, float]):
+        """Charge one NewsAPI call per combined query to topics the planner would merge"""
+        if not settings.NEWS_LOCAL_SEARCH or settings.NEWS_QUERY_MAX_CHARS <= 0:
+            return
+        topics: Dict[str, TopicQuery] = {}
+        by_query: Dict[str, List[Dict[str, Any]]] = {}
+        for estimate, keywords in estimates:
+            if estimate["cached"] or not estimate["newsapi_calls"]:
+                continue
+            topic = TopicQuery(keywords)
+            topics.setdefault(topic.query, topic)
+            by_query.setdefault(topic.query, []).append(estimate)
+        for planned in QueryPlanner(self.news_service).plan(topics.values()):
+            if len(planned.topics) < 2:
+                continue
+            for idx, topic in enumerate(planned.topics):
+                for estimate in by_query[topic.query]:
+                    # A topic with too few routed articles still fetches on its own
+                    estimate.update(combined_query=True, newsapi_calls=int(idx == 0),
+                                    newsapi_calls_max=estimate["newsapi_calls_max"] + int(idx == 0))
+                    if idx:
+                        estimate["fetch_seconds"] = round(estimate["fetch_seconds"] - latency[NEWSAPI], 2)
+
+    @staticmethod
+    def _timeline(start: float, ready: float, batches: List[tuple], batch_seconds: List[float]) -> float:
+        """Seconds after `start` at which the last batch finishes when sent in order"""
+        clock = ready
+        for (release_at, _), seconds in zip(batches, batch_seconds):
+            clock = max(clock, release_at - start) + seconds
+        return clock
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Plain-text table of a simulation report, as printed by the scheduler and the CLI"""
+    lines = [f"Dry run ({report['mode']}, window {report['window_seconds'] / 60:.0f} min):"]
+    lines.append(f"  {'topic':<28} {'msgs':>7} {'news':>6} {'llm':>5} {'smtp conn':>9} {'fetch s':>8} {'send s':>8}")
+    for t in report["topics"]:
+        news = "cached" if t["cached"] else str(t["newsapi_calls"])
+        # Digest sections are per (topic, look-back window)
+        name = f"{t['name'][:23]} ({t['days']}d)" if "days" in t else t["name"][:28]
+        lines.append(
+            f"  {name:<28} {t['messages']:>7} {news:>6} {t['llm_calls']:>5} "
+            f"{t['smtp_connections']:>9} {t['fetch_seconds']:>8.1f} {t['send_seconds']:>8.1f}"
+        )
+    totals = report["totals"]
+    lines.append(
+        f"  total: {totals['messages']} messages, {totals['newsapi_calls']} NewsAPI calls "
+        f"(up to {totals['newsapi_calls_max']}, {totals['newsapi_quota_remaining']} left in quota), "
+        f"{totals['llm_calls']} LLM calls, {totals['smtp_connections']} SMTP connections"
+    )
+    lines.append(
+        f"  estimated duration {totals['estimated_seconds'] / 60:.1f} min "
+        f"(deadline {totals['deadline_seconds'] / 60:.1f} min"
+        f"{'' if totals['within_deadline'] else ', EXCEEDED'})"
+        f"{'' if totals['within_quota'] else '; NewsAPI quota EXCEEDED'}"
+    )
+    return "\n".join(lines)
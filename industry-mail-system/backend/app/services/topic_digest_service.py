@@ -0,0 +1,247 @@
+"""
+Materialized topic digests
+
+For a given topic and day, the fetched, deduplicated and summarized
+articles are the same for the preview, the scheduled send, re-sends and
+the weekly/monthly rollups. The first caller of the day builds them, and
+the article set and rendered newsletter are stored in `topic_digests`,
+keyed by (topic, look-back days, UTC day). Everyone else reads the stored
+copy. Re-sends of the day deliver exactly what the first send did.
+
+Weekly and monthly digests (7 and 30 days) are rolled up from the stored
+dailies of that period instead of asking NewsAPI again. They interleave
+the days newest first, so every day gets its top stories in. When too few
+dailies exist (fewer than ROLLUP_MIN_COVERAGE of the days, or not enough
+articles), the digest is fetched with one ranged query like before; a
+rollup never builds a missing daily on its own.
+
+A digest built from older keywords is rebuilt once the topic's keywords
+change. Digests are kept for RETENTION_DAYS.
+"""
+import asyncio
+import json
+import math
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import case, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.topic import Topic
+from app.models.topic_digest import TopicDigest
+from app.services.article import Article
+from app.services.deadline import Deadline
+from app.services.email_service import EmailService, PreparedMessage
+from app.services.news_service import NewsService
+from app.services.quota_service import PRIORITY_SCHEDULED
+
+# Articles per materialized digest (what scheduled sends use)
+ARTICLE_LIMIT = 10
+# Share of a rollup's days that need a stored daily digest
+ROLLUP_MIN_COVERAGE = 0.5
+# Dailies must outlive the longest rollup
+RETENTION_DAYS = 35
+PRUNE_INTERVAL = 3600
+
+FETCHED = "fetched"
+ROLLUP = "rollup"
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def dedupe(articles: List[Article]) -> List[Article]:
+    """Drop repeats of a URL or of a title (syndicated copies of one story)"""
+    seen = set()
+    unique = []
+    for article in articles:
+        keys = {article.url, (article.title or "").strip().lower()} - {"", None}
+        if keys & seen:
+            continue
+        seen |= keys
+        unique.append(article)
+    return unique
+
+
+class MaterializedDigest:
+    """A stored topic digest; the MIME message is encoded on first use"""
+
+    def __init__(self, row: TopicDigest):
+        self.topic_id = row.topic_id
+        self.days = row.days
+        self.period = row.period
+        self.source = row.source
+        self.subject = row.subject
+        self.html_body = row.html_body
+        self.articles = [Article(**a) for a in json.loads(row.articles)]
+        self._prepared: Optional[PreparedMessage] = None
+
+    def prepared(self) -> PreparedMessage:
+        if self._prepared is None:
+            self._prepared = PreparedMessage(self.subject, self.html_body)
+        return self._prepared
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "topic_id": self.topic_id,
+            "days": self.days,
+            "period": self.period.isoformat(),
+            "source": self.source,
+            "subject": self.subject,
+            "articles": [a.to_dict() for a in self.articles],
+            "total_results": len(self.articles),
+        }
+
+
+class TopicDigestService:
+    def __init__(self, news_service: Optional[NewsService] = None, email_service: Optional[EmailService] = None,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.news_service = news_service or NewsService()
+        self.email_service = email_service or EmailService()
+        self.session_factory = session_factory
+        self._building: Dict[Tuple[int, int], asyncio.Lock] = {}
+        self._pruned_at = 0.0
+
+    def stored(self, topic_id: int, keywords: str, days: int = 1,
+               period: Optional[date] = None) -> Optional[MaterializedDigest]:
+        """Today's digest for the topic, if built from its current keywords"""
+        db = self.session_factory()
+        try:
+            row = db.query(TopicDigest).filter(
+                TopicDigest.topic_id == topic_id, TopicDigest.days == days,
+                TopicDigest.period == (period or utc_today()), TopicDigest.keywords == keywords,
+            ).first()
+            return MaterializedDigest(row) if row else None
+        finally:
+            db.close()
+
+    def find_topic(self, query: str) -> Optional[Tuple[int, str, str, Optional[str]]]:
+        """(id, name, keywords, description) of the active topic a preview query names, by name or keywords"""
+        normalized = query.strip().lower()
+        if not normalized:
+            return None
+        db = self.session_factory()
+        try:
+            topic = (
+                db.query(Topic.id, Topic.name, Topic.keywords, Topic.description)
+                .filter(Topic.is_active == True,
+                        or_(func.lower(Topic.name) == normalized, func.lower(Topic.keywords) == normalized))
+                # A name match wins over a keyword match
+                .order_by(case((func.lower(Topic.name) == normalized, 0), else_=1))
+                .first()
+            )
+            return tuple(topic) if topic else None
+        finally:
+            db.close()
+
+    async def get(self, topic_id: int, name: str, keywords: str, days: int = 1,
+                  deadline: Optional[Deadline] = None, priority: str = PRIORITY_SCHEDULED,
+                  rebuild: bool = False, description: Optional[str] = None) -> Optional[MaterializedDigest]:
+        """
+        The topic's digest for today, built and stored on first use
+
+        `description` is the topic's description, used to rank fetched
+        articles. Returns None when no articles were found; nothing is stored then, so
+        a later call tries again. Fetch errors (quota, deadline) propagate
+        like `NewsService.fetch_news`.
+        """
+        # Reads and writes are sync SQLAlchemy; they run in a worker thread
+        if not rebuild:
+            digest = await asyncio.to_thread(self.stored, topic_id, keywords, days)
+            if digest is not None:
+                return digest
+
+        # One build per digest at a time; concurrent callers wait and read the result
+        lock = self._building.setdefault((topic_id, days), asyncio.Lock())
+        async with lock:
+            if not rebuild:
+                digest = await asyncio.to_thread(self.stored, topic_id, keywords, days)
+                if digest is not None:
+                    return digest
+            articles, source = None, ROLLUP
+            if days > 1:
+                articles = await asyncio.to_thread(self.rollup, topic_id, keywords, days)
+            if articles is None:
+                articles = dedupe(await self.news_service.fetch_news(
+                    keywords, days, ARTICLE_LIMIT, priority=priority, deadline=deadline, description=description
+                ))[:ARTICLE_LIMIT]
+                source = FETCHED
+            if not articles:
+                return None
+            return await asyncio.to_thread(self._save, topic_id, name, keywords, days, source, articles)
+
+    def rollup(self, topic_id: int, keywords: str, days: int,
+               period: Optional[date] = None) -> Optional[List[Article]]:
+        """Top articles of the period's stored dailies, or None when they cover too little of it"""
+        period = period or utc_today()
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(TopicDigest.articles)
+                .filter(TopicDigest.topic_id == topic_id, TopicDigest.days == 1, TopicDigest.keywords == keywords,
+                        TopicDigest.period > period - timedelta(days=days), TopicDigest.period <= period)
+                .order_by(TopicDigest.period.desc())
+                .all()
+            )
+        finally:
+            db.close()
+        if len(rows) < math.ceil(days * ROLLUP_MIN_COVERAGE):
+            return None
+
+        dailies = [[Article(**a) for a in json.loads(articles)] for (articles,) in rows]
+        # Round-robin over the days, newest first: each day's best story before any day's second
+        interleaved = [daily[rank] for rank in range(max(map(len, dailies)))
+                       for daily in dailies if rank < len(daily)]
+        articles = dedupe(interleaved)[:ARTICLE_LIMIT]
+        return articles if len(articles) >= ARTICLE_LIMIT else None
+
+    def _save(self, topic_id: int, name: str, keywords: str, days: int, source: str,
+              articles: List[Article]) -> MaterializedDigest:
+        subject, html_body = self.email_service.render_newsletter(name, articles)
+        fields = {
+            "keywords": keywords,
+            "source": source,
+            "articles": json.dumps([a.to_dict() for a in articles]),
+            "subject": subject,
+            "html_body": html_body,
+        }
+        period = utc_today()
+        db = self.session_factory()
+        try:
+            row = db.query(TopicDigest).filter(
+                TopicDigest.topic_id == topic_id, TopicDigest.days == days, TopicDigest.period == period
+            ).first()
+            if row is None:
+                row = TopicDigest(topic_id=topic_id, days=days, period=period, **fields)
+                db.add(row)
+            else:
+                # Rebuilt, or the topic's keywords changed since the morning
+                for key, value in fields.items():
+                    setattr(row, key, value)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another process stored the same digest first; theirs wins
+                db.rollback()
+                row = db.query(TopicDigest).filter(
+                    TopicDigest.topic_id == topic_id, TopicDigest.days == days, TopicDigest.period == period
+                ).one()
+            digest = MaterializedDigest(row)
+            self._prune(db)
+        finally:
+            db.close()
+        print(f"Topic digest: stored {source} {days}d digest for topic {topic_id} with {len(articles)} articles")
+        return digest
+
+    def _prune(self, db: Session):
+        if time.time() - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = time.time()
+        cutoff = utc_today() - timedelta(days=RETENTION_DAYS)
+        db.query(TopicDigest).filter(TopicDigest.period < cutoff).delete(synchronize_session=False)
+        db.commit()
+
+
+topic_digests = TopicDigestService()
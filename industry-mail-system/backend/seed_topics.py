@@ -14,7 +14,7 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parent
 sys.path.insert(0, str(ROOT))
 
-from app.database import SessionLocal
+from app.database import SessionLocal, init_db
 from app.models.topic import Topic
 
 DEFAULT_TOPICS = [
@@ -52,6 +52,7 @@ DEFAULT_TOPICS = [
 
 
 def seed():
+    init_db()
     db = SessionLocal()
     try:
         created = 0
@@ -22,6 +22,7 @@ const NewsCard = ({ article }) => {
                 <p className="news-source">
                     {article.source} • {formatDate(article.published_at)}
                 </p>
+                {article.summary && <p className="news-summary">{article.summary}</p>}
                 <p className="news-description">{article.description}</p>
                 <a
                     href={article.url}
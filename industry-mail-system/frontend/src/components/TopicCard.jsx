@@ -4,6 +4,7 @@ import api from '../services/api'
 
 const TopicCard = ({ topic, onSubscribe, isSubscribed = false }) => {
     const [sending, setSending] = useState(false)
+    const [progress, setProgress] = useState('')
 
     const handleSendNow = async (e, days) => {
         e.stopPropagation()
@@ -11,10 +12,24 @@ const TopicCard = ({ topic, onSubscribe, isSubscribed = false }) => {
         try {
             setSending(true)
             const res = await api.sendNewsletter(topic.id, days)
-            alert(res.message || 'Scheduled newsletter send')
+            if (!res.job_id) {
+                alert(res.message || 'Scheduled newsletter send')
+                setSending(false)
+                return
+            }
+            api.watchJob(res.job_id, (job) => {
+                if (job.stage === 'sending') {
+                    setProgress(`Sending ${job.sent + job.failed}/${job.total}…`)
+                } else if (job.stage === 'completed' || job.stage === 'failed') {
+                    setSending(false)
+                    setProgress('')
+                    alert(job.error || job.message || 'Newsletter sent')
+                } else {
+                    setProgress(`${job.stage.charAt(0).toUpperCase()}${job.stage.slice(1)}…`)
+                }
+            })
         } catch (err) {
             alert(err.response?.data?.detail || 'Failed to trigger newsletter')
-        } finally {
             setSending(false)
         }
     }
@@ -45,7 +60,7 @@ const TopicCard = ({ topic, onSubscribe, isSubscribed = false }) => {
                     onClick={(e) => handleSendNow(e, 1)}
                     disabled={sending}
                 >
-                    {sending ? 'Sending…' : 'Send Now (1d)'}
+                    {sending ? (progress || 'Sending…') : 'Send Now (1d)'}
                 </button>
 
                 <button
@@ -53,7 +68,7 @@ const TopicCard = ({ topic, onSubscribe, isSubscribed = false }) => {
                     onClick={(e) => handleSendNow(e, 7)}
                     disabled={sending}
                 >
-                    {sending ? 'Sending…' : 'Send Now (7d)'}
+                    {sending ? (progress || 'Sending…') : 'Send Now (7d)'}
                 </button>
             </div>
         </div>
@@ -21,9 +21,26 @@ const Dashboard = () => {
         setError('')
         setLoading(true)
 
+        setArticles([])
+
         try {
-            const data = await api.fetchNews(searchParams.topic, searchParams.days)
-            setArticles(data.articles)
+            await api.streamNews(searchParams.topic, searchParams.days, (event) => {
+                if (event.type === 'article') {
+                    // First article ends the spinner; the rest stream in below it
+                    setLoading(false)
+                    setArticles((prev) => {
+                        const next = [...prev]
+                        next[event.index] = event.article
+                        return next
+                    })
+                } else if (event.type === 'summary') {
+                    setArticles((prev) => prev.map((article, idx) => (
+                        idx === event.index ? { ...article, summary: event.summary } : article
+                    )))
+                } else if (event.type === 'error') {
+                    setError(event.detail || 'Failed to fetch news articles')
+                }
+            })
         } catch (err) {
             setError('Failed to fetch news articles')
             setArticles([])
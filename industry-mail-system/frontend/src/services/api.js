@@ -59,12 +59,55 @@ const api = {
         return response.data
     },
 
+    // Stream articles as NDJSON: articles arrive with a quick summary that is
+    // replaced when the LLM summary completes. Calls onEvent for every line.
+    streamNews: async (topic, days = 1, onEvent) => {
+        const params = new URLSearchParams({ topic, days, limit: 10 })
+        const response = await fetch(`${API_BASE_URL}/news/fetch/stream?${params}`)
+        if (!response.ok) {
+            const body = await response.json().catch(() => ({}))
+            throw new Error(body.detail || `Request failed with status ${response.status}`)
+        }
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ''
+        for (;;) {
+            const { value, done } = await reader.read()
+            if (done) break
+            buffer += decoder.decode(value, { stream: true })
+            const lines = buffer.split('\n')
+            buffer = lines.pop()
+            lines.filter(Boolean).forEach((line) => onEvent(JSON.parse(line)))
+        }
+        if (buffer.trim()) onEvent(JSON.parse(buffer))
+    },
+
     sendNewsletter: async (topicId, days) => {
         const response = await axios.post(`${API_BASE_URL}/news/send-newsletter`, {
             topic_id: topicId,
             days: days
         })
         return response.data
+    },
+
+    getJob: async (jobId) => {
+        const response = await axios.get(`${API_BASE_URL}/news/jobs/${jobId}`)
+        return response.data
+    },
+
+    // Stream job progress via server-sent events; returns a function that stops watching
+    watchJob: (jobId, onUpdate) => {
+        const source = new EventSource(`${API_BASE_URL}/news/jobs/${jobId}/events`)
+        source.addEventListener('progress', (event) => {
+            const job = JSON.parse(event.data)
+            onUpdate(job)
+            if (job.stage === 'completed' || job.stage === 'failed') source.close()
+        })
+        source.onerror = () => {
+            source.close()
+            onUpdate({ stage: 'failed', error: 'Lost connection to job progress stream' })
+        }
+        return () => source.close()
     }
 
 }